@@ -4,13 +4,21 @@ Monitoring Validation Test
 验证监控系统是否正常工作的测试脚本
 """
 
+import argparse
+import asyncio
+import os
 import requests
 import time
 import json
 import sys
-from concurrent.futures import ThreadPoolExecutor
 import threading
 
+# 压测引擎位于 src/bench_test
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "bench_test"))
+from load_engine import LoadEngine, print_result
+import metrics_exporter
+import prom_report
+
 # 配置
 BASE_URL = "http://localhost:10086"
 PROMETHEUS_URL = "http://localhost:9090"
@@ -21,7 +29,7 @@ stats = {
     'requests_sent': 0,
     'successful_requests': 0,
     'failed_requests': 0,
-    'created_urls': []
+    'created': 0
 }
 stats_lock = threading.Lock()
 
@@ -42,7 +50,7 @@ def test_create_url(url, test_id):
             alias = data.get('alias')
             with stats_lock:
                 stats['successful_requests'] += 1
-                stats['created_urls'].append(alias)
+                stats['created'] += 1
             print(f"✓ Test {test_id}: Created alias '{alias}' for {url}")
             return alias
         else:
@@ -125,8 +133,8 @@ def check_grafana():
         print(f"✗ Grafana: Connection failed - {e}")
         return False
 
-def run_load_test(duration_seconds=30, concurrent_users=5):
-    """运行负载测试"""
+def run_load_test(duration_seconds=30, concurrent_users=1000, connections=0, metrics=None):
+    """运行负载测试：asyncio 引擎 + keep-alive 连接池，流程仍为 创建 -> 跳转"""
     print(f"\n🚀 Starting load test...")
     print(f"Duration: {duration_seconds} seconds")
     print(f"Concurrent users: {concurrent_users}")
@@ -140,39 +148,27 @@ def run_load_test(duration_seconds=30, concurrent_users=5):
         "https://www.python.org"
     ]
     
-    start_time = time.time()
-    test_id_counter = 0
-    
-    def worker():
-        nonlocal test_id_counter
-        while time.time() - start_time < duration_seconds:
-            test_id_counter += 1
-            current_test_id = test_id_counter
-            
-            # 创建短链接
-            url = test_urls[current_test_id % len(test_urls)]
-            alias = test_create_url(url, current_test_id)
-            
-            if alias:
-                # 等待一下再测试重定向
-                time.sleep(0.1)
-                test_redirect_url(alias, current_test_id)
-            
-            # 控制请求频率
-            time.sleep(0.5)
-    
-    # 启动并发测试
-    with ThreadPoolExecutor(max_workers=concurrent_users) as executor:
-        futures = [executor.submit(worker) for _ in range(concurrent_users)]
-        
-        # 等待所有任务完成或超时
-        for future in futures:
-            try:
-                future.result(timeout=duration_seconds + 10)
-            except Exception as e:
-                print(f"Worker exception: {e}")
+    # 与基本功能测试共用同一个 stats，结束时统一输出
+    engine = LoadEngine(BASE_URL, concurrent_users, duration_seconds, connections,
+                        urls=test_urls, stats=stats, metrics=metrics)
+    elapsed = engine.run_sync()
+    print_result(engine, elapsed)
+    return engine
 
 def main():
+    global BASE_URL, PROMETHEUS_URL, GRAFANA_URL
+    parser = argparse.ArgumentParser(description="监控系统验证测试")
+    parser.add_argument("--base-url", default=BASE_URL, help="服务基础URL")
+    parser.add_argument("--prometheus-url", default=PROMETHEUS_URL)
+    parser.add_argument("--grafana-url", default=GRAFANA_URL)
+    parser.add_argument("--duration", type=int, default=30, help="负载测试持续时间（秒）")
+    parser.add_argument("--concurrency", type=int, default=1000, help="负载测试并发数")
+    parser.add_argument("--connections", type=int, default=0, help="连接池上限，默认等于并发数")
+    parser.add_argument("--report-dir", default="", help="服务端指标对照报告目录，默认 report/validate_<时间戳>")
+    metrics_exporter.add_arguments(parser)
+    args = parser.parse_args()
+    BASE_URL, PROMETHEUS_URL, GRAFANA_URL = args.base_url, args.prometheus_url, args.grafana_url
+
     print("=" * 60)
     print("     URL Shortener Monitoring Validation Test")
     print("=" * 60)
@@ -226,10 +222,10 @@ def main():
     # 3. 运行负载测试
     print("\n📋 Step 3: Load test for monitoring validation...")
     
-    duration = 30  # 测试持续时间（秒）
-    concurrent_users = 3  # 并发用户数
-    
-    run_load_test(duration, concurrent_users)
+    load_start = time.time()
+    engine = run_load_test(args.duration, args.concurrency, args.connections,
+                           metrics_exporter.exporter_from_args(args, "validate_monitoring"))
+    load_end = time.time()
     
     # 4. 等待指标收集
     print("\n📋 Step 4: Waiting for metrics collection...")
@@ -258,6 +254,17 @@ def main():
             print("✗ Prometheus: Query failed")
     except Exception as e:
         print(f"✗ Prometheus: Metrics validation failed - {e}")
+
+    # 服务端指标与客户端延迟对照
+    report_dir = args.report_dir or os.path.join("report", time.strftime("validate_%Y%m%d_%H%M%S"))
+    try:
+        report, timeseries = asyncio.run(prom_report.build_report(PROMETHEUS_URL, load_start, load_end,
+                                                                  engine.histograms))
+        prom_report.write_report(report, timeseries, report_dir)
+        prom_report.print_report(report)
+        print(f"✓ Server-side report written to {report_dir}")
+    except Exception as e:
+        print(f"✗ Prometheus: Correlated report failed - {e}")
     
     # 6. 测试结果
     print("\n" + "=" * 60)
@@ -269,7 +276,7 @@ def main():
     print(f"   Successful requests: {stats['successful_requests']}")
     print(f"   Failed requests: {stats['failed_requests']}")
     print(f"   Success rate: {(stats['successful_requests']/stats['requests_sent']*100):.1f}%")
-    print(f"   URLs created: {len(stats['created_urls'])}")
+    print(f"   URLs created: {stats['created']}")
     
     print(f"\n🔗 Access Points:")
     print(f"   Application: {BASE_URL}")
@@ -0,0 +1,190 @@
+"""
+紧凑的定长二进制 alias 存储
+
+每条 alias 占 RECORD_SIZE 字节（不足补 \\0），文件本身没有头部，
+记录数 = 文件大小 / RECORD_SIZE。
+
+读取端：每个 worker 进程只 mmap 一次（get_shared_store），所有用户共享同一个视图，
+按下标取 alias，不再把整个文件读成 Python 列表；maybe_refresh 每秒最多检查一次文件大小，
+运行中本进程和其他 worker 追加的 alias 也会逐渐可见。
+写入端：AliasWriter 在进程内缓冲，攒够一批后以 O_APPEND 整块写入，
+多个 worker 进程同时追加也不需要加锁（整条记录一次写入，不会交错）。
+
+# 旧的文本文件转换为二进制格式
+# python alias_store.py import created_aliases.txt
+# 查看记录数 / 导出前 10 条
+# python alias_store.py count
+# python alias_store.py dump -n 10
+"""
+
+import argparse
+import atexit
+import mmap
+import os
+import random
+import time
+
+ALIAS_STORE_FILE = "created_aliases.bin"
+RECORD_SIZE = 16  # v3 的 alias 固定 12 位，留一点余量给 v1/v2
+REFRESH_INTERVAL = 1.0  # maybe_refresh 的最小间隔（秒）
+
+
+def encode_record(alias):
+    """alias -> 定长记录"""
+    data = alias.encode("ascii")
+    if len(data) > RECORD_SIZE:
+        raise ValueError(f"alias 超过 {RECORD_SIZE} 字节: {alias}")
+    return data.ljust(RECORD_SIZE, b"\0")
+
+
+class AliasStore:
+    """alias 文件的只读 mmap 视图，按下标取值，不做整表拷贝"""
+
+    def __init__(self, path=ALIAS_STORE_FILE):
+        self.path = path
+        self._mm = None
+        self._count = 0
+        self._checked_at = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """重新映射文件，使其他进程追加的新记录可见"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        count = size // RECORD_SIZE
+        if count == self._count:
+            return
+        self.close()
+        if count > 0:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), count * RECORD_SIZE, access=mmap.ACCESS_READ)
+        self._count = count
+
+    def maybe_refresh(self, interval=REFRESH_INTERVAL):
+        """最多每 interval 秒检查一次文件大小，供请求路径上调用"""
+        now = time.monotonic()
+        if now - self._checked_at >= interval:
+            self._checked_at = now
+            self.refresh()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        offset = index * RECORD_SIZE
+        return self._mm[offset:offset + RECORD_SIZE].rstrip(b"\0").decode("ascii")
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def random_alias(self, rng=random):
+        """随机取一个 alias，空文件返回 None"""
+        if self._count == 0:
+            return None
+        return self[rng.randrange(self._count)]
+
+
+class AliasWriter:
+    """缓冲追加写入，攒满 buffer_records 条才真正落盘一次"""
+
+    def __init__(self, path=ALIAS_STORE_FILE, buffer_records=1024):
+        self.path = path
+        self.buffer_records = buffer_records
+        self._buf = bytearray()
+        self._fd = None
+
+    def append(self, alias):
+        self._buf += encode_record(alias)
+        if len(self._buf) >= self.buffer_records * RECORD_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._buf:
+            return
+        data, self._buf = bytes(self._buf), bytearray()
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# 进程级共享实例：同一个 worker 进程里的所有用户共用
+_stores = {}
+_writers = {}
+
+
+def get_shared_store(path=ALIAS_STORE_FILE):
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = AliasStore(path)
+    return store
+
+
+def get_shared_writer(path=ALIAS_STORE_FILE):
+    writer = _writers.get(path)
+    if writer is None:
+        writer = _writers[path] = AliasWriter(path)
+    return writer
+
+
+def flush_shared_writers():
+    for writer in _writers.values():
+        writer.flush()
+
+
+atexit.register(flush_shared_writers)
+
+
+def import_text_file(text_path, path=ALIAS_STORE_FILE):
+    """把旧的每行一个 alias 的文本文件追加到二进制存储中"""
+    writer = AliasWriter(path, buffer_records=65536)
+    count = 0
+    with open(text_path, "r", encoding="utf-8") as f:
+        for line in f:
+            alias = line.strip()
+            if alias:
+                writer.append(alias)
+                count += 1
+    writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="alias 二进制存储工具")
+    parser.add_argument("--file", default=ALIAS_STORE_FILE, help="二进制 alias 文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="导入文本 alias 文件")
+    p_import.add_argument("text_file")
+    sub.add_parser("count", help="输出记录数")
+    p_dump = sub.add_parser("dump", help="按行输出 alias")
+    p_dump.add_argument("-n", type=int, default=0, help="最多输出条数，0 表示全部")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        n = import_text_file(args.text_file, args.file)
+        print(f"导入 {n} 条 alias -> {args.file}")
+    elif args.command == "count":
+        print(len(AliasStore(args.file)))
+    elif args.command == "dump":
+        store = AliasStore(args.file)
+        limit = args.n or len(store)
+        for i in range(min(limit, len(store))):
+            print(store[i])
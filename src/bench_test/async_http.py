@@ -0,0 +1,268 @@
+"""
+基于 asyncio 的轻量 HTTP/1.1 客户端（仅标准库）
+
+- 连接池 + keep-alive，连接数上限可配置
+- 复用的空闲连接被服务端关闭时自动重试一次
+- 只实现压测需要的部分：Content-Length / chunked 响应体，不跟随跳转
+- 可选 tracer（trace_sampler.Tracer）：按比例抽样记录排队、DNS、建连、TLS、写请求、首字节、读响应体各阶段耗时
+- 可选 recorder（traffic_trace.TraceWriter）：把发出的每个请求（以及创建返回的 alias）录成流量轨迹，供之后确定性回放
+- 可选 metrics（metrics_exporter.MetricsExporter）：按操作名聚合请求数、状态码和延迟，供 Prometheus 抓取
+
+用法：
+    client = HttpClient("http://localhost:10086", max_connections=500)
+    resp = await client.post_json("/create", {"url": "https://www.example.com/abc"})
+    resp = await client.get("/u/" + alias)
+    await client.close()
+"""
+
+import asyncio
+import json
+import socket
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpResponse:
+    __slots__ = ("status", "headers", "body", "keep_alive")
+
+    def __init__(self, status, headers, body, keep_alive):
+        self.status = status
+        self.headers = headers  # header 名统一小写
+        self.body = body
+        self.keep_alive = keep_alive
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def parse_base_url(base_url):
+    """返回 (scheme, host, port)"""
+    parts = urlsplit(base_url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"不支持的协议: {base_url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return parts.scheme, parts.hostname, port
+
+
+def build_request(method, host_header, path, body=None, headers=None, keep_alive=True):
+    """拼出完整的请求报文"""
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host_header}"]
+    if not keep_alive:
+        lines.append("Connection: close")
+    if headers:
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+    if body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return head + body if body else head
+
+
+async def read_response(reader, status_line=None):
+    """从流中读取一个完整响应；status_line 为已读出的状态行"""
+    if status_line is None:
+        status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("连接已被服务端关闭")
+    try:
+        version, status = status_line.split(None, 2)[:2]
+        status = int(status)
+    except ValueError:
+        raise HttpError(f"无效的状态行: {status_line!r}")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower().decode("latin-1")] = value.strip().decode("latin-1")
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == b"HTTP/1.1" else connection == "keep-alive"
+
+    if status < 200 or status in (204, 304):
+        body = b""
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return HttpResponse(status, headers, body, keep_alive)
+
+
+class HttpConnection:
+    __slots__ = ("reader", "writer", "reused")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    @classmethod
+    async def open(cls, host, port, ssl_context=None, sample=None):
+        if sample is None:
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=ssl_context, server_hostname=host if ssl_context else None)
+            return cls(reader, writer)
+        # 抽样请求分开计时：解析、TCP 建连、TLS 握手
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        sample.dns = time.perf_counter_ns()
+        reader, writer = await asyncio.open_connection(infos[0][4][0], port)
+        sample.connected = time.perf_counter_ns()
+        if ssl_context:
+            await writer.start_tls(ssl_context, server_hostname=host)
+            sample.tls = time.perf_counter_ns()
+        return cls(reader, writer)
+
+    async def send(self, data, sample=None):
+        self.writer.write(data)
+        await self.writer.drain()
+        if sample is None:
+            return await read_response(self.reader)
+        sample.written = time.perf_counter_ns()
+        status_line = await self.reader.readline()
+        sample.first_byte = time.perf_counter_ns()
+        resp = await read_response(self.reader, status_line)
+        sample.done = time.perf_counter_ns()
+        return resp
+
+    def close(self):
+        self.writer.close()
+
+
+class HttpClient:
+    """带连接池的 keep-alive 客户端，同一个事件循环内共享"""
+
+    def __init__(self, base_url, max_connections=100, timeout=10.0, keep_alive=True, tracer=None, recorder=None,
+                 metrics=None):
+        self.scheme, self.host, self.port = parse_base_url(base_url)
+        default_port = 443 if self.scheme == "https" else 80
+        self.host_header = self.host if self.port == default_port else f"{self.host}:{self.port}"
+        self.ssl_context = ssl.create_default_context() if self.scheme == "https" else None
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.max_connections = max_connections
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_connections)
+        self.connections_opened = 0
+        self.tracer = tracer
+        self.recorder = recorder  # traffic_trace.TraceWriter，录制发出的请求
+        self.metrics = metrics  # metrics_exporter.MetricsExporter
+
+    async def _connect(self, sample=None):
+        conn = await HttpConnection.open(self.host, self.port, self.ssl_context, sample)
+        self.connections_opened += 1
+        return conn
+
+    async def _acquire(self, sample=None):
+        await self._slots.acquire()
+        if sample is not None:
+            sample.acquired = time.perf_counter_ns()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            return await self._connect(sample)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, reusable):
+        if reusable:
+            conn.reused = True
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    async def request(self, method, path, body=None, headers=None, name=None):
+        """name 为 trace / 指标中的操作名，默认用请求方法"""
+        data = build_request(method, self.host_header, path, body, headers, self.keep_alive)
+        recorded = None
+        if self.recorder is not None:
+            recorded = self.recorder.record_request(method, path, body)
+        metrics = self.metrics
+        if metrics is None:
+            resp = await self._traced(data, name or method)
+        else:
+            start = time.perf_counter()
+            try:
+                resp = await self._traced(data, name or method)
+            except BaseException:
+                metrics.record(name or method, time.perf_counter() - start, 0)
+                raise
+            metrics.record(name or method, time.perf_counter() - start, resp.status)
+        if recorded is not None:
+            # 创建请求：录下服务端分配的 alias，回放时据此映射
+            self.recorder.record_response(recorded, resp)
+        return resp
+
+    async def _traced(self, data, name):
+        tracer = self.tracer
+        if tracer is None or not tracer.should_sample():
+            return await self._send(data)
+        sample = tracer.begin()
+        try:
+            resp = await self._send(data, sample)
+        except BaseException:
+            tracer.finish(sample, name, error=True)
+            raise
+        tracer.finish(sample, name, resp.status)
+        return resp
+
+    async def _send(self, data, sample=None):
+        conn = await self._acquire(sample)
+        try:
+            if sample is not None:
+                sample.reused = conn.reused
+            try:
+                resp = await asyncio.wait_for(conn.send(data, sample), self.timeout)
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                if not conn.reused:
+                    raise
+                # 空闲连接已被服务端关闭，换新连接重试一次
+                conn.close()
+                if sample is not None:
+                    sample.reused = False
+                conn = await self._connect(sample)
+                resp = await asyncio.wait_for(conn.send(data, sample), self.timeout)
+        except BaseException:
+            self._release(conn, False)
+            raise
+        self._release(conn, self.keep_alive and resp.keep_alive)
+        return resp
+
+    async def get(self, path, headers=None, name=None):
+        return await self.request("GET", path, headers=headers, name=name)
+
+    async def post_json(self, path, payload, headers=None, name=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, separators=(",", ":")).encode()
+        all_headers = {"Content-Type": "application/json"}
+        if headers:
+            all_headers.update(headers)
+        return await self.request("POST", path, body, all_headers, name)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
@@ -12,15 +12,15 @@ def log_execution_time(func):
     """装饰器：记录函数执行时间"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter()
         print(f"\n📋 开始执行: {func.__name__}")
         try:
             result = func(*args, **kwargs)
-            elapsed_time = time.time() - start_time
+            elapsed_time = time.perf_counter() - start_time
             print(f"✅ {func.__name__} 执行成功 - 耗时: {elapsed_time:.3f}秒")
             return result
         except Exception as e:
-            elapsed_time = time.time() - start_time
+            elapsed_time = time.perf_counter() - start_time
             print(f"❌ {func.__name__} 执行失败 - 耗时: {elapsed_time:.3f}秒 - 错误: {e}")
             raise
     return wrapper
@@ -98,6 +98,7 @@ def test_create_with_expire_and_expire_check():
     assert redirect_resp.status_code in (301, 302, 307, 308)
     assert redirect_resp.headers["Location"] == url
 
+    # 不在这里阻塞等待过期，到期前后的定时探测与收敛延迟见 expiry_test.py
     # # 等待过期
     # import time
     # time.sleep(expire_seconds + 1)
@@ -114,12 +115,12 @@ if __name__ == "__main__":
     print("🚀 开始运行短链接测试套件")
     print("=" * 50)
     
-    total_start = time.time()
+    total_start = time.perf_counter()
     
     test_create_and_redirect()
     test_404_for_invalid_alias()
     test_create_with_expire_and_expire_check()
     
-    total_elapsed = time.time() - total_start
+    total_elapsed = time.perf_counter() - total_start
     print("=" * 50)
     print(f"🎉 所有测试通过! 总耗时: {total_elapsed:.3f}秒")
\ No newline at end of file
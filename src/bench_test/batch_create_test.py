@@ -0,0 +1,107 @@
+from locust import task, between, FastHttpUser, events
+import itertools
+import key_dist
+import harness_profiler
+import latency_hist
+import metrics_exporter
+import payload_pool
+import traffic_trace
+from alias_store import get_shared_writer, flush_shared_writers
+
+MAX_BATCH_SIZE = 1000  # 与 ShortUrlController.MaxBatchSize 一致，超过会被服务端 400 拒绝
+
+# 批量创建测试：POST /create/batch（v3 与 mock_server.py 支持），对比不同批大小下的插入吞吐和单条延迟
+# locust -f batch_create_test.py --host=http://localhost:10086 --batch-sizes 1,10,100,500
+# locust -f batch_create_test.py --host=http://192.168.1.3:10086 -u 50 -r 50 --headless --csv=report --run-time 2m --batch-sizes 100 --no-batch-cache
+
+# 每个批大小单独统计，请求名为 /create/batch[N]；结束时按 locust 汇总数据换算：
+#   插入/秒 = 成功批次 × N / 该批大小的持续时间，单条延迟 = 批次延迟 / N
+# 分布式运行同 create_only_test.py，换算表在 master 上输出
+
+@events.init_command_line_parser.add_listener
+def on_init_parser(parser):
+    key_dist.add_arguments(parser)
+    parser.add_argument("--batch-sizes", type=str, env_var="LOCUST_BATCH_SIZES", default="100",
+                        help=f"逗号分隔的批大小（1-{MAX_BATCH_SIZE}），每个用户按顺序轮流使用，如 1,10,100,500")
+    parser.add_argument("--no-batch-cache", action="store_true", default=False,
+                        help="带 cache=false，只写 MySQL 不写 Redis")
+    parser.add_argument("--batch-save-aliases", action="store_true", default=False,
+                        help="把创建的 alias 追加到 alias 文件，供读测试使用")
+
+
+latency_hist.install_locust_hooks(events)
+traffic_trace.install_locust_hooks(events)
+metrics_exporter.install_locust_hooks(events)
+harness_profiler.install_locust_hooks(events)
+payload_pool.install_locust_hooks(events)
+
+
+def batch_name(size):
+    return f"/create/batch[{size}]"
+
+
+def parse_batch_sizes(text):
+    sizes = [int(s) for s in text.split(",") if s.strip()]
+    if not sizes:
+        raise ValueError(f"无效的 --batch-sizes: {text}")
+    if min(sizes) <= 0 or max(sizes) > MAX_BATCH_SIZE:
+        raise ValueError(f"--batch-sizes 必须在 1-{MAX_BATCH_SIZE} 之间（服务端 MaxBatchSize={MAX_BATCH_SIZE}）: {text}")
+    return sizes
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    # 启动时就检查，不等每个用户 on_start 时才报错
+    if environment.parsed_options is not None:
+        parse_batch_sizes(environment.parsed_options.batch_sizes)
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    from locust.runners import WorkerRunner
+    if isinstance(environment.runner, WorkerRunner) or environment.parsed_options is None:
+        return
+    flush_shared_writers()
+    sizes = parse_batch_sizes(environment.parsed_options.batch_sizes)
+    print(f"\n{'批大小':>8}{'批次':>10}{'插入条数':>12}{'插入/秒':>12}{'批 p50':>10}{'批 p99':>10}"
+          f"{'单条 p50':>10}{'单条 p99':>10}  (ms)")
+    for size in sizes:
+        entry = environment.stats.entries.get((batch_name(size), "POST"))
+        if entry is None or not entry.num_requests:
+            continue
+        ok = entry.num_requests - entry.num_failures
+        # 只算成功的批次，失败的批次没有插入
+        elapsed = entry.last_request_timestamp - entry.start_time
+        inserts_per_s = ok * size / elapsed if elapsed > 0 else 0.0
+        p50 = entry.get_response_time_percentile(0.5)
+        p99 = entry.get_response_time_percentile(0.99)
+        print(f"{size:>8}{entry.num_requests:>10}{ok * size:>12}{inserts_per_s:>12.0f}"
+              f"{p50:>10.1f}{p99:>10.1f}{p50 / size:>10.3f}{p99 / size:>10.3f}")
+
+
+class BatchCreateUser(FastHttpUser):
+    wait_time = between(0, 0)
+
+    def on_start(self):
+        options = self.environment.parsed_options
+        self.sizes = itertools.cycle(parse_batch_sizes(options.batch_sizes))
+        self.path = "/create/batch?cache=false" if options.no_batch_cache else "/create/batch"
+        self.writer = get_shared_writer() if options.batch_save_aliases else None
+        self.payloads = payload_pool.pool_from_environment(self.environment)
+
+    @task
+    def create_batch(self):
+        size = next(self.sizes)
+        body = self.payloads.take_batch(size)
+        with self.client.post(self.path, data=body, headers=payload_pool.JSON_HEADERS, name=batch_name(size),
+                              catch_response=True) as resp:
+            if resp.status_code != 200:
+                resp.failure(f"HTTP {resp.status_code}: {resp.text[:200] if resp.text else ''}")
+                return
+            created = resp.json().get("items") or []
+            if len(created) != size:
+                resp.failure(f"返回 {len(created)} 条，期望 {size} 条")
+                return
+            if self.writer is not None:
+                for item in created:
+                    self.writer.append(item["alias"])
@@ -0,0 +1,648 @@
+"""
+缓存预热 / 冷启动压测：清空 v3 的 Redis 缓存后回放同一份 alias 访问轨迹，观察恢复到稳态的过程
+
+每种预热策略依次执行：冷启动 -> 预热 -> 按轨迹开环回放，每 --interval 秒一行：
+  客户端 RPS / p50 / p99（从计划发送时间算起，包含排队）、错误数，
+  服务端缓存命中率和 DB 回源 QPS（来自 mock 的 /stats、Redis INFO 或 Prometheus）
+回放结束后以最后 --baseline-fraction 的窗口为稳态基线，找出第一个连续 --steady-windows 个窗口
+都回到基线附近的时间点，输出到达稳态的时间、峰值 p99 / 稳态 p99（惊群倍数）、
+峰值 DB QPS，以及稳态前比稳态多出来的回源次数。
+
+冷启动方式（--cold）：
+  none   不清空，直接指向刚启动的 mock / 服务
+  mock   POST /cache/flush（mock_server.py --cache-capacity 开启时）
+  redis  对 --redis 执行 FLUSHDB（v3 的 Redis 只存 shortlink:{alias} 缓存）
+  cmd    执行 --cold-cmd（如 docker restart urlshort_redis），然后等 /health 恢复
+
+预热策略（--strategies，逗号分隔，按顺序各跑一次）：
+  none          直接全量回放，重现发布 / Redis 故障切换后的惊群
+  preload:N     回放前以 --preload-concurrency 并发读一遍轨迹中最热的 N 个 alias（读穿透回填缓存）
+  ramp:S        S 秒内把接入比例从 --ramp-floor 线性升到 100%，未接入的请求计为分流到其他实例
+
+访问轨迹（--trace）每行 "偏移秒数 alias" 或只有 alias（按 --rps 匀速），# 开头为注释；
+也可以直接用 traffic_trace.py 录制 / 从 nginx 导入的流量轨迹，只取其中的 read 请求；
+不指定时按 --key-dist 从 alias 文件生成 --duration 秒的轨迹（--save-trace 可以保存下来复用）。
+所有策略回放的是同一份轨迹，结果可以直接对比。
+
+Redis INFO 的命中数包含所有 key，DB QPS 按未命中数估算；Prometheus 的精度受抓取间隔限制。
+
+# python mock_server.py --port 10086 --cache-capacity 200000 --db-latency-ms 5 --db-connections 16
+# python seed_data.py --base-url http://localhost:10086 --total 100000 --batch-size 500
+# python cache_warmup.py --base-url http://localhost:10086 --cold mock --metrics mock --rps 3000 --duration 60 --key-dist zipf:1.0 --strategies none,preload:5000,ramp:20
+# python cache_warmup.py --base-url http://192.168.1.3:10086 --cold redis --redis 192.168.1.3:6379 --metrics redis --trace access.trace --csv report/warmup
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import random
+import subprocess
+import time
+from array import array
+from collections import Counter
+from statistics import median
+
+import key_dist
+import traffic_trace
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from latency_hist import LatencyHistogram
+from prom_report import DEFAULT_PROMETHEUS_URL, PrometheusClient, to_float
+
+SPARK = "▁▂▃▄▅▆▇█"
+
+
+class AccessTrace:
+    """alias 访问轨迹：去重后的 alias 表 + 每次访问的下标与计划偏移（秒），都放在 array 里"""
+
+    def __init__(self, aliases, index, offsets):
+        self.aliases = aliases
+        self.index = index
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self):
+        return self.offsets[-1] if self.offsets else 0.0
+
+    def alias(self, i):
+        return self.aliases[self.index[i]]
+
+    def hottest(self, n):
+        return [self.aliases[i] for i, _ in Counter(self.index).most_common(n)]
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(len(self)):
+                f.write(f"{self.offsets[i]:.6f} {self.alias(i)}\n")
+
+
+def trace_entries(path, rps):
+    """产出 (偏移秒数, alias)"""
+    if traffic_trace.is_trace_file(path):
+        for offset_us, op, key, _ in traffic_trace.iter_records(path):
+            if op == "read":
+                yield offset_us / 1e6, key
+        return
+    count = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            if len(parts) >= 2:
+                yield float(parts[0]), parts[1]
+            else:
+                yield count / rps, parts[0]
+            count += 1
+
+
+def load_trace(path, rps):
+    aliases, ids = [], {}
+    index, offsets = array("I"), array("d")
+    for offset, alias in trace_entries(path, rps):
+        alias_id = ids.get(alias)
+        if alias_id is None:
+            alias_id = ids[alias] = len(aliases)
+            aliases.append(alias)
+        index.append(alias_id)
+        offsets.append(offset)
+    if any(b < a for a, b in zip(offsets, offsets[1:])):
+        order = sorted(range(len(index)), key=offsets.__getitem__)
+        index = array("I", (index[i] for i in order))
+        offsets = array("d", (offsets[i] for i in order))
+    return AccessTrace(aliases, index, offsets)
+
+
+def synthesize_trace(store, selector, rps, duration, arrival="poisson", seed=None):
+    """按 key 分布从 alias 文件生成轨迹，下标直接指向 alias 文件里的记录"""
+    rng = random.Random(seed)
+    n = len(store)
+    index, offsets = array("I"), array("d")
+    t = 0.0
+    while t < duration:
+        index.append(selector.next_index(n))
+        offsets.append(t)
+        t += rng.expovariate(rps) if arrival == "poisson" else 1.0 / rps
+    return AccessTrace(store, index, offsets)
+
+
+class MockStatsSource:
+    """mock_server.py 的 /stats：cacheHits / cacheMisses / dbQueries"""
+    name = "mock"
+
+    def __init__(self, base_url, timeout):
+        self.client = HttpClient(base_url, max_connections=2, timeout=timeout)
+
+    async def sample(self):
+        data = (await self.client.get("/stats")).json()
+        if "cacheHits" not in data:
+            raise RuntimeError("mock 未开启缓存模拟，请加 --cache-capacity 启动")
+        return data["cacheHits"], data["cacheMisses"], data["dbQueries"]
+
+    async def close(self):
+        await self.client.close()
+
+
+class RedisConnection:
+    """够用即可的 RESP 客户端：只发 INFO / FLUSHDB / PING"""
+
+    def __init__(self, address, timeout=5.0):
+        host, _, port = address.partition(":")
+        self.host, self.port = host or "localhost", int(port or 6379)
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def command(self, *args):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.writer.write(b"".join(parts))
+        return await asyncio.wait_for(self._read_reply(), self.timeout)
+
+    async def _read_reply(self):
+        line = await self.reader.readline()
+        kind, rest = line[:1], line[1:].rstrip(b"\r\n")
+        if kind == b"-":
+            raise RuntimeError(f"Redis 错误: {rest.decode(errors='replace')}")
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else (await self.reader.readexactly(length + 2))[:-2].decode()
+        return rest.decode()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class RedisInfoSource:
+    """INFO stats 的 keyspace_hits / keyspace_misses；v3 每次未命中都回源 MySQL，DB 查询数按未命中数估算"""
+    name = "redis"
+
+    def __init__(self, address, timeout):
+        self.redis = RedisConnection(address, timeout)
+
+    async def sample(self):
+        info = await self.redis.command("INFO", "stats")
+        fields = dict(line.split(":", 1) for line in info.splitlines() if ":" in line)
+        hits, misses = int(fields["keyspace_hits"]), int(fields["keyspace_misses"])
+        return hits, misses, misses
+
+    async def close(self):
+        await self.redis.close()
+
+
+class PrometheusSource:
+    """v3 自己暴露的计数器：shorturl_queried_total{cache_hit} 和 get_shorturl_by_alias 的 DB 操作数"""
+    name = "prometheus"
+    QUERIES = {
+        "hits": 'sum(shorturl_queried_total{cache_hit="true"})',
+        "misses": 'sum(shorturl_queried_total{cache_hit="false"})',
+        "db": 'sum(database_operations_total{operation="get_shorturl_by_alias"})',
+    }
+
+    def __init__(self, url, timeout):
+        self.prom = PrometheusClient(url, timeout=timeout)
+
+    async def sample(self):
+        now = time.time()
+        results = await asyncio.gather(*(self.prom.query(q, now) for q in self.QUERIES.values()))
+        values = [to_float(r[0]["value"][1]) if r else 0.0 for r in results]
+        return tuple(int(v or 0) for v in values)
+
+    async def close(self):
+        await self.prom.close()
+
+
+def metrics_source(args):
+    if args.metrics == "mock":
+        return MockStatsSource(args.base_url, args.timeout)
+    if args.metrics == "redis":
+        return RedisInfoSource(args.redis, args.timeout)
+    if args.metrics == "prometheus":
+        return PrometheusSource(args.prometheus_url, args.timeout)
+    return None
+
+
+class WindowStats:
+    """一个统计窗口内的客户端延迟与服务端计数增量"""
+
+    def __init__(self, index):
+        self.index = index
+        self.hist = LatencyHistogram()
+        self.errors = 0
+        self.shed = 0  # ramp 策略分流掉的请求
+        self.dropped = 0  # 未完成请求超过上限，没能按时发出
+        self.hits = self.misses = self.db = None
+
+    def row(self, interval):
+        s = self.hist.summary()
+        lookups = (self.hits or 0) + (self.misses or 0)
+        return {
+            "elapsed_s": round((self.index + 1) * interval, 3),
+            "rps": round(s["count"] / interval, 1),
+            "p50_ms": s["p50_ms"],
+            "p99_ms": s["p99_ms"],
+            "max_ms": s["max_ms"],
+            "errors": self.errors + self.dropped,
+            "shed": self.shed,
+            "hit_ratio": round(self.hits / lookups, 4) if self.hits is not None and lookups else None,
+            "db_qps": round(self.db / interval, 1) if self.db is not None else None,
+        }
+
+
+def parse_strategy(text):
+    name, _, value = text.strip().partition(":")
+    if name == "none":
+        return name, 0
+    if name == "preload":
+        return name, int(value or 1000)
+    if name == "ramp":
+        return name, float(value or 30)
+    raise ValueError(f"未知的预热策略: {text}")
+
+
+class WarmupRun:
+    """一种策略的一次冷启动 + 回放"""
+
+    def __init__(self, strategy, trace, client, source, args):
+        self.strategy, self.strategy_arg = parse_strategy(strategy)
+        self.label = strategy.strip()
+        self.trace = trace
+        self.client = client
+        self.source = source
+        self.args = args
+        # 字符串种子与轨迹、key 分布的种子不相关，否则同一个 --seed 会让分流只放行最热的 key
+        self.rng = random.Random(f"ramp:{args.seed}")
+        self.windows = []
+        self.rows = []
+        self.outstanding = set()
+        self.preload_s = 0.0
+        self.preload_requests = 0
+        self.start = 0.0
+        self.polled = 0  # 已取过服务端计数的窗口数
+
+    def window(self, elapsed):
+        index = max(0, int(elapsed // self.args.interval))
+        while len(self.windows) <= index:
+            self.windows.append(WindowStats(len(self.windows)))
+        return self.windows[index]
+
+    async def preload(self):
+        """读穿透预热：v3 未命中时自己回填 Redis，这里只需要把最热的 alias 读一遍"""
+        hot = self.trace.hottest(self.strategy_arg)
+        slots = asyncio.Semaphore(self.args.preload_concurrency)
+        start = time.monotonic()
+
+        async def read(alias):
+            async with slots:
+                try:
+                    await self.client.get(f"/u/{alias}", name="/u/[preload]")
+                except Exception:
+                    pass
+
+        await asyncio.gather(*(read(alias) for alias in hot))
+        self.preload_s = time.monotonic() - start
+        self.preload_requests = len(hot)
+        print(f"  🔥 预热 {len(hot)} 个热点 alias 用时 {self.preload_s:.1f}s")
+
+    def admitted(self, elapsed):
+        if self.strategy != "ramp" or elapsed >= self.strategy_arg:
+            return True
+        floor = self.args.ramp_floor
+        return self.rng.random() < floor + (1 - floor) * elapsed / self.strategy_arg
+
+    async def fire(self, alias, intended):
+        loop = asyncio.get_running_loop()
+        try:
+            resp = await self.client.get(f"/u/{alias}", name="/u/[replay]")
+            ok = resp.status in (302, 404) if self.args.allow_404 else resp.status == 302
+        except Exception:
+            ok = False
+        stats = self.window(intended - self.start)
+        stats.hist.record(int((loop.time() - intended) * 1_000_000))
+        if not ok:
+            stats.errors += 1
+
+    async def replay(self):
+        loop = asyncio.get_running_loop()
+        trace, speed = self.trace, self.args.speed
+        i, n = 0, len(trace)
+        while i < n:
+            now = loop.time()
+            due = self.start + trace.offsets[i] / speed
+            if due > now:
+                await asyncio.sleep(due - now)
+                continue
+            # 调度落后时把所有到期的请求一次发出，计划时间不丢失
+            while i < n and self.start + trace.offsets[i] / speed <= now:
+                intended = self.start + trace.offsets[i] / speed
+                elapsed = intended - self.start
+                if not self.admitted(elapsed):
+                    self.window(elapsed).shed += 1
+                elif len(self.outstanding) >= self.args.max_outstanding:
+                    self.window(elapsed).dropped += 1
+                else:
+                    task = loop.create_task(self.fire(trace.alias(i), intended))
+                    self.outstanding.add(task)
+                    task.add_done_callback(self.outstanding.discard)
+                i += 1
+        if self.outstanding:
+            await asyncio.wait(list(self.outstanding), timeout=self.client.timeout + 1)
+
+    async def poll(self):
+        """每个窗口结束时取一次服务端计数，增量记到该窗口"""
+        loop = asyncio.get_running_loop()
+        last = await self.source.sample() if self.source else None
+        while True:
+            k = self.polled + 1
+            await asyncio.sleep(max(0.0, self.start + k * self.args.interval - loop.time()))
+            stats = self.window((k - 1) * self.args.interval)
+            if self.source:
+                try:
+                    current = await self.source.sample()
+                except Exception as e:
+                    print(f"  ⚠️  读取服务端计数失败: {e}")
+                    current = None
+                if current is not None and last is not None:
+                    # 计数器回退说明服务重启过，当作从 0 开始
+                    stats.hits, stats.misses, stats.db = (c - l if c >= l else c for c, l in zip(current, last))
+                last = current or last
+            self.polled = k
+            if not self.args.quiet:
+                self.print_window(stats.row(self.args.interval))
+
+    def print_window(self, row):
+        """窗口结束时的即时输出；之后才完成的请求会计入最终结果"""
+        hit = "-" if row["hit_ratio"] is None else f"{row['hit_ratio'] * 100:5.1f}%"
+        db = "-" if row["db_qps"] is None else f"{row['db_qps']:8.0f}"
+        print(f"  [{row['elapsed_s']:>6.1f}s] {row['rps']:>8.0f} RPS | p50 {row['p50_ms']:>7.2f} "
+              f"p99 {row['p99_ms']:>8.2f}ms | 命中率 {hit} | DB {db}/s | 错误 {row['errors']} 分流 {row['shed']}")
+
+    async def run(self):
+        if self.strategy == "preload" and self.strategy_arg > 0:
+            await self.preload()
+        loop = asyncio.get_running_loop()
+        self.start = loop.time()
+        poller = loop.create_task(self.poll())
+        try:
+            await self.replay()
+            # 等最后一个窗口的服务端计数取完
+            while self.polled < len(self.windows):
+                await asyncio.sleep(self.args.interval / 10)
+        finally:
+            poller.cancel()
+        # 延迟按计划发送时间归入窗口，等所有请求完成后再生成最终结果
+        self.rows = [stats.row(self.args.interval) for stats in self.windows]
+        return self.summary()
+
+    def steady_index(self, base):
+        """第一个连续 --steady-windows 个窗口都回到稳态基线附近的窗口下标"""
+        args = self.args
+        p99_limit = max(base["p99_ms"] * (1 + args.tolerance), base["p99_ms"] + args.tolerance_ms)
+
+        def ok(row):
+            if row["p99_ms"] > p99_limit:
+                return False
+            return base["hit_ratio"] is None or row["hit_ratio"] is None or \
+                row["hit_ratio"] >= base["hit_ratio"] - args.hit_tolerance
+
+        run = 0
+        for i, row in enumerate(self.rows):
+            run = run + 1 if ok(row) else 0
+            if run >= args.steady_windows:
+                return i - run + 1
+        return None
+
+    def summary(self):
+        rows = [r for r in self.rows if r["rps"] > 0]
+        tail = rows[-max(1, int(len(rows) * self.args.baseline_fraction)):] if rows else []
+
+        def tail_median(key):
+            values = [r[key] for r in tail if r[key] is not None]
+            return round(median(values), 4) if values else None
+
+        base = {"p99_ms": tail_median("p99_ms") or 0.0, "hit_ratio": tail_median("hit_ratio"),
+                "db_qps": tail_median("db_qps")}
+        steady = self.steady_index(base) if rows else None
+        warm = self.rows[:steady] if steady is not None else self.rows
+        db_values = [r["db_qps"] for r in self.rows if r["db_qps"] is not None]
+        excess = None
+        if base["db_qps"] is not None:
+            excess = round(sum(max(0.0, (r["db_qps"] or 0) - base["db_qps"]) * self.args.interval for r in warm))
+        peak_p99 = max((r["p99_ms"] for r in self.rows), default=0.0)
+        hits = [r["hit_ratio"] for r in self.rows if r["hit_ratio"] is not None]
+        return {
+            "strategy": self.label,
+            "preload_s": round(self.preload_s, 2),
+            "preload_requests": self.preload_requests,
+            "time_to_steady_s": round(steady * self.args.interval, 1) if steady is not None else None,
+            "peak_p99_ms": peak_p99,
+            "steady_p99_ms": base["p99_ms"],
+            "herd_factor": round(peak_p99 / base["p99_ms"], 1) if base["p99_ms"] else None,
+            "first_hit_ratio": hits[0] if hits else None,
+            "steady_hit_ratio": base["hit_ratio"],
+            "peak_db_qps": max(db_values) if db_values else None,
+            "steady_db_qps": base["db_qps"],
+            "excess_db_queries": excess,
+            "warmup_errors": sum(r["errors"] for r in warm),
+            "shed": sum(r["shed"] for r in self.rows),
+        }
+
+
+def sparkline(values, width=60):
+    """按 width 分组取最大值画成一行，突出尖刺；None 画成空格"""
+    if not values:
+        return ""
+    group = max(1, -(-len(values) // width))
+    points = []
+    for i in range(0, len(values), group):
+        chunk = [v for v in values[i:i + group] if v is not None]
+        points.append(max(chunk) if chunk else None)
+    known = [v for v in points if v is not None]
+    if not known:
+        return " " * len(points)
+    low, high = min(known), max(known)
+    scale = (len(SPARK) - 1) / (high - low) if high > low else 0
+    return "".join(" " if v is None else SPARK[int((v - low) * scale)] for v in points)
+
+
+def print_plot(label, rows):
+    print(f"\n📈 [{label}] {len(rows)} 个窗口（左 -> 右）")
+    for key, title in (("p99_ms", "p99(ms)"), ("hit_ratio", "命中率"), ("db_qps", "DB QPS")):
+        values = [r[key] for r in rows]
+        known = [v for v in values if v is not None]
+        if known:
+            print(f"  {title:<8}{sparkline(values)}  {min(known):g} ~ {max(known):g}")
+
+
+def fmt(value, spec=""):
+    return "-" if value is None else format(value, spec)
+
+
+def print_comparison(summaries):
+    print(f"\n{'策略':<14}{'预热(s)':>9}{'到稳态(s)':>11}{'峰值p99':>10}{'稳态p99':>10}{'惊群倍数':>10}"
+          f"{'首窗命中':>10}{'峰值DB/s':>10}{'多余回源':>10}{'错误':>8}{'分流':>8}")
+    for s in summaries:
+        first_hit = None if s["first_hit_ratio"] is None else s["first_hit_ratio"] * 100
+        print(f"{s['strategy']:<14}{s['preload_s']:>9}{fmt(s['time_to_steady_s']):>11}{s['peak_p99_ms']:>10}"
+              f"{s['steady_p99_ms']:>10}{fmt(s['herd_factor']):>10}{fmt(first_hit, '.1f'):>10}"
+              f"{fmt(s['peak_db_qps']):>10}{fmt(s['excess_db_queries']):>10}{s['warmup_errors']:>8}{s['shed']:>8}")
+
+
+def write_results(results, prefix):
+    path = f"{prefix}_warmup_windows.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None
+        for summary, rows in results:
+            for row in rows:
+                row = dict(strategy=summary["strategy"], **row)
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                    writer.writeheader()
+                writer.writerow(row)
+    with open(f"{prefix}_warmup_summary.json", "w", encoding="utf-8") as f:
+        json.dump({"finished": time.strftime("%Y-%m-%d %H:%M:%S"), "results": [s for s, _ in results]},
+                  f, indent=2, ensure_ascii=False)
+    print(f"📄 结果已写入 {path} 和 {prefix}_warmup_summary.json")
+
+
+async def wait_healthy(client, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status == 200:
+                return True
+        except Exception:
+            pass
+        await asyncio.sleep(1)
+    return False
+
+
+async def make_cold(args, client):
+    """清空缓存，返回是否成功"""
+    if args.cold == "mock":
+        resp = await client.post_json("/cache/flush", {})
+        if resp.status != 200:
+            print(f"❌ mock 清空缓存失败 HTTP {resp.status}: {resp.text[:200]}")
+            return False
+        print(f"  🧊 已清空 mock 缓存 {resp.json().get('flushed')} 条")
+    elif args.cold == "redis":
+        redis = RedisConnection(args.redis, args.timeout)
+        try:
+            await redis.command("FLUSHDB")
+        finally:
+            await redis.close()
+        print(f"  🧊 已对 {args.redis} 执行 FLUSHDB")
+    elif args.cold == "cmd":
+        print(f"  🧊 执行: {args.cold_cmd}")
+        proc = await asyncio.create_subprocess_shell(args.cold_cmd, stdout=subprocess.DEVNULL)
+        if await proc.wait() != 0:
+            print(f"❌ 命令退出码 {proc.returncode}")
+            return False
+        if not await wait_healthy(client, args.ready_timeout):
+            print(f"❌ {args.ready_timeout}s 内 /health 未恢复")
+            return False
+    if args.settle:
+        await asyncio.sleep(args.settle)
+    return True
+
+
+def build_trace(args):
+    if args.trace:
+        trace = load_trace(args.trace, args.rps)
+        print(f"📼 轨迹 {args.trace}: {len(trace)} 次访问, {len(trace.aliases)} 个 alias, {trace.duration:.1f}s")
+    else:
+        store = AliasStore(args.alias_file)
+        if not len(store):
+            raise SystemExit(f"❌ alias 文件 {args.alias_file} 为空，先用 seed_data.py 预灌数据或指定 --trace")
+        selector = key_dist.get_selector(args.key_dist, args.key_seed)
+        trace = synthesize_trace(store, selector, args.rps, args.duration, args.arrival, args.seed)
+        print(f"📼 按 {args.key_dist} 从 {args.alias_file}（{len(store)} 条）生成轨迹: "
+              f"{len(trace)} 次访问, {args.duration}s")
+        if args.save_trace:
+            trace.save(args.save_trace)
+            print(f"📄 轨迹已保存到 {args.save_trace}")
+    return trace
+
+
+async def main_async(args):
+    trace = build_trace(args)
+    client = HttpClient(args.base_url, max_connections=args.connections, timeout=args.timeout)
+    source = metrics_source(args)
+    results = []
+    try:
+        for strategy in args.strategies.split(","):
+            print(f"\n🚀 [{strategy.strip()}] {args.base_url} 冷启动方式 {args.cold}，服务端计数 {args.metrics}")
+            if not await make_cold(args, client):
+                break
+            run = WarmupRun(strategy, trace, client, source, args)
+            results.append((await run.run(), run.rows))
+            if args.cooldown:
+                await asyncio.sleep(args.cooldown)
+    finally:
+        await client.close()
+        if source:
+            await source.close()
+
+    for summary, rows in results:
+        print_plot(summary["strategy"], rows)
+    summaries = [s for s, _ in results]
+    print_comparison(summaries)
+    if any(s["time_to_steady_s"] is None for s in summaries):
+        print("⚠️  有策略在回放结束前没有回到稳态，可以加长 --duration 或放宽 --tolerance")
+    if args.csv and results:
+        write_results(results, args.csv)
+    return summaries
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="缓存冷启动 / 预热策略对比压测")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--cold", choices=("none", "mock", "redis", "cmd"), default="mock", help="冷启动方式")
+    parser.add_argument("--cold-cmd", default="docker restart urlshort_redis", help="--cold cmd 时执行的命令")
+    parser.add_argument("--ready-timeout", type=float, default=120, help="执行命令后等待 /health 恢复的秒数")
+    parser.add_argument("--settle", type=float, default=0, help="清空缓存后等待的秒数")
+    parser.add_argument("--metrics", choices=("none", "mock", "redis", "prometheus"), default="mock",
+                        help="命中率与 DB QPS 的来源")
+    parser.add_argument("--redis", default="localhost:6379", help="Redis 地址 host:port")
+    parser.add_argument("--prometheus-url", default=DEFAULT_PROMETHEUS_URL)
+    parser.add_argument("--strategies", default="none,preload:1000,ramp:30", help="逗号分隔的预热策略")
+    parser.add_argument("--preload-concurrency", type=int, default=50, help="preload 策略的并发数")
+    parser.add_argument("--ramp-floor", type=float, default=0.1, help="ramp 策略起始的接入比例")
+    parser.add_argument("--trace", default="", help="访问轨迹文件，留空时按 --key-dist 生成")
+    parser.add_argument("--save-trace", default="", help="把生成的轨迹保存到该文件")
+    parser.add_argument("--rps", type=float, default=1000, help="生成轨迹的到达率；轨迹没有偏移时的回放速率")
+    parser.add_argument("--duration", type=float, default=60, help="生成轨迹的秒数")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="poisson", help="生成轨迹的到达模型")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="二进制 alias 文件")
+    parser.add_argument("--key-dist", default="zipf:1.0", help="生成轨迹的 key 分布")
+    parser.add_argument("--key-seed", type=int, default=None, help="key 分布随机种子")
+    parser.add_argument("--seed", type=int, default=None, help="到达间隔与 ramp 分流的随机种子")
+    parser.add_argument("--allow-404", action="store_true", help="404 不计为错误（轨迹里有已删除 / 过期的 alias）")
+    parser.add_argument("--interval", type=float, default=1.0, help="统计窗口（秒）")
+    parser.add_argument("--baseline-fraction", type=float, default=0.2, help="取最后多少比例的窗口作为稳态基线")
+    parser.add_argument("--steady-windows", type=int, default=5, help="连续多少个窗口回到基线附近视为稳态")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p99 高于基线的比例容差")
+    parser.add_argument("--tolerance-ms", type=float, default=2.0, help="p99 高于基线的绝对容差（毫秒）")
+    parser.add_argument("--hit-tolerance", type=float, default=0.02, help="命中率低于基线的容差")
+    parser.add_argument("--cooldown", type=float, default=5, help="策略之间等待的秒数")
+    parser.add_argument("--connections", type=int, default=1000, help="连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="未完成请求上限，超过的计为错误")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--quiet", action="store_true", help="不逐窗口输出")
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_warmup_windows.csv 和 _warmup_summary.json")
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
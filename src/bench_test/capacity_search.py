@@ -0,0 +1,266 @@
+"""
+容量搜索：自动找出满足 SLO 的最大可持续 RPS（吞吐曲线的拐点）
+
+在 open_loop.py 的开环驱动上跑一系列短阶段：
+  1. 爬升：从 --rps-start 开始每步乘以 --growth，直到 SLO 不满足（p99 / 错误率超限，
+     或实际吞吐跟不上目标到达率），得到 [通过, 失败] 区间
+  2. 二分：在区间内二分，直到区间宽度小于 --tolerance
+  3. 确认：在找到的 RPS 上跑一个更长的阶段（--confirm-duration），不通过则下调后重试
+每个阶段之间留 --cooldown 秒让服务端队列排空。输出可持续 RPS、该 RPS 下的延迟，以及所有阶段的曲线。
+
+可以一次搜索多个服务，结束时打印对比表。读 alias 文件的请求只对预灌过该文件的服务有意义：
+--target 可以写成 name=url@文件 指定各自的 alias 文件；多个服务而没有指定时，该服务不读 alias 文件
+（这部分权重并入读新建 alias，读写比例不变），否则没预灌过的服务会因 404 被算作错误、低估容量。
+
+# python capacity_search.py --target v1=http://192.168.1.3:10086 --slo-p99-ms 50
+# python capacity_search.py --target v1=http://host1:10086 --target v3=http://host3:10086 --rps-start 2000 --csv report/capacity
+# python capacity_search.py --target v1=http://host1:10086@v1_aliases.bin --target v3=http://host3:10086@v3_aliases.bin
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import time
+
+import key_dist
+import metrics_exporter
+import trace_sampler
+import traffic_trace
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from open_loop import OP_CREATE, OP_READ, OpenLoopDriver, print_summary, slo_ok
+from request_mix import CREATE_WEIGHT, READ_WEIGHT, READ_WEIGHT_BY_FILE
+
+# 不读 alias 文件时的请求比例：读文件的权重并入读新建 alias
+NO_FILE_WEIGHTS = ((OP_CREATE, CREATE_WEIGHT), (OP_READ, READ_WEIGHT + READ_WEIGHT_BY_FILE))
+
+
+def step_passes(summary, duration, args):
+    """SLO 满足，且实际吞吐跟得上目标（否则说明已经饱和，只是请求被挡在客户端或服务端队列里）"""
+    # 泊松到达的请求数本身有 1/sqrt(N) 的波动，短阶段不能因此误判为饱和
+    slack = max(args.throughput_slack, 3 / math.sqrt(max(1.0, summary["target_rps"] * duration)))
+    keeps_up = summary["achieved_rps"] >= summary["target_rps"] * (1 - slack)
+    summary["saturated"] = not keeps_up
+    return slo_ok(summary, args.slo_p99_ms, args.slo_error_rate) and keeps_up
+
+
+class CapacitySearch:
+    def __init__(self, name, driver, args):
+        self.name = name
+        self.driver = driver
+        self.args = args
+        self.steps = []
+
+    async def run_step(self, rps, duration, phase):
+        rps = int(rps)
+        result = await self.driver.run_step(rps, duration, self.args.arrival)
+        summary = result.summary()
+        summary["phase"] = phase
+        summary["slo_ok"] = step_passes(summary, duration, self.args)
+        self.steps.append(summary)
+        print_summary(summary, summary["slo_ok"])
+        if self.args.cooldown:
+            await asyncio.sleep(self.args.cooldown)
+        return summary
+
+    async def ramp(self):
+        """返回 (最后通过的 RPS, 第一个失败的 RPS)，失败值为 None 表示到 --rps-max 都通过"""
+        args = self.args
+        passed, rps = 0, args.rps_start
+        while rps <= args.rps_max:
+            if not (await self.run_step(rps, args.step_duration, "ramp"))["slo_ok"]:
+                return passed, rps
+            passed = rps
+            if rps == args.rps_max:
+                break
+            # 起始 RPS 很小时 int(rps * growth) 可能不变，至少加 1
+            rps = min(args.rps_max, max(rps + 1, int(rps * args.growth)))
+        return passed, None
+
+    async def bisect(self, low, high):
+        args = self.args
+        for _ in range(args.max_bisect_steps):
+            if high - low <= max(args.min_rps_gap, low * args.tolerance):
+                break
+            mid = (low + high) // 2
+            if (await self.run_step(mid, args.step_duration, "bisect"))["slo_ok"]:
+                low = mid
+            else:
+                high = mid
+        return low, high
+
+    async def confirm(self, rps):
+        """长时间确认，不通过则把 RPS 下调一个容差后重试"""
+        args = self.args
+        for _ in range(args.confirm_retries + 1):
+            if rps <= 0:
+                break
+            summary = await self.run_step(rps, args.confirm_duration, "confirm")
+            if summary["slo_ok"]:
+                return summary
+            rps = int(rps * (1 - args.tolerance))
+        return None
+
+    async def run(self):
+        print(f"\n🔎 [{self.name}] 容量搜索：SLO p99 <= {self.args.slo_p99_ms}ms, "
+              f"错误率 <= {self.args.slo_error_rate * 100}%")
+        if self.args.warmup:
+            await self.run_step(self.args.rps_start, self.args.warmup, "warmup")
+        low, high = await self.ramp()
+        if high is not None and low > 0:
+            low, high = await self.bisect(low, high)
+        if low <= 0:
+            sustained = None
+        elif self.args.confirm_duration:
+            sustained = await self.confirm(low)
+        else:
+            sustained = [s for s in self.steps if s["slo_ok"] and s["target_rps"] == low][-1]
+        return self.report(sustained, high)
+
+    def report(self, sustained, first_failure):
+        result = {
+            "name": self.name,
+            "sustained_rps": sustained["target_rps"] if sustained else 0,
+            "achieved_rps": sustained["achieved_rps"] if sustained else 0,
+            "p50_ms": sustained["p50_ms"] if sustained else None,
+            "p99_ms": sustained["p99_ms"] if sustained else None,
+            "p999_ms": sustained["p999_ms"] if sustained else None,
+            "first_failure_rps": first_failure,
+            "hit_rps_max": first_failure is None,
+            "steps": self.steps,
+        }
+        if sustained:
+            print(f"🎯 [{self.name}] 可持续 {result['sustained_rps']} RPS（实际 {result['achieved_rps']}），"
+                  f"p50 {result['p50_ms']}ms p99 {result['p99_ms']}ms")
+            if result["hit_rps_max"]:
+                print("   已达到 --rps-max 仍未饱和，容量可能更高")
+        else:
+            print(f"⚠️  [{self.name}] 起始 RPS {self.args.rps_start} 已不满足 SLO，请降低 --rps-start")
+        return result
+
+
+def parse_target(text):
+    """name=url，省略 name 时用 url 本身"""
+    name, sep, url = text.partition("=")
+    return (name, url) if sep else (text, text)
+
+
+def parse_search_target(text):
+    """name=url[@alias文件] -> (name, url, alias 文件或 None)"""
+    name, sep, rest = text.partition("=")
+    spec = rest if sep else text
+    url, at, alias_file = spec.rpartition("@") if "@" in spec else (spec, "", "")
+    if at and not alias_file:
+        raise SystemExit(f"❌ --target {text} 的 @ 后缺少 alias 文件")
+    return (name if sep else url), url, alias_file or None
+
+
+def print_curve(result):
+    print(f"\n[{result['name']}] 阶段曲线（按目标 RPS 排序）")
+    for summary in sorted(result["steps"], key=lambda s: (s["target_rps"], s["phase"])):
+        phase = summary["phase"] + ("(饱和)" if summary["saturated"] else "")
+        print(f"  {phase:<12}", end="")
+        print_summary(summary, summary["slo_ok"])
+
+
+def print_comparison(results):
+    print(f"\n{'服务':<12}{'可持续RPS':>12}{'实际RPS':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'p99.9(ms)':>11}{'首次失败':>10}")
+    for r in results:
+        fail = "-" if r["first_failure_rps"] is None else r["first_failure_rps"]
+        print(f"{r['name']:<12}{r['sustained_rps']:>12}{r['achieved_rps']:>12}{r['p50_ms'] or '-':>10}"
+              f"{r['p99_ms'] or '-':>10}{r['p999_ms'] or '-':>11}{fail:>10}")
+
+
+def write_results(results, prefix):
+    with open(f"{prefix}_steps.csv", "w", newline="", encoding="utf-8") as f:
+        fields = ["name", "phase", "target_rps", "achieved_rps", "sent", "errors", "error_rate",
+                  "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms", "saturated", "slo_ok"]
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for r in results:
+            for summary in r["steps"]:
+                writer.writerow(dict(summary, name=r["name"]))
+    with open(f"{prefix}_summary.json", "w", encoding="utf-8") as f:
+        json.dump({"finished": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f, indent=2,
+                  ensure_ascii=False)
+    print(f"📄 结果已写入 {prefix}_steps.csv 和 {prefix}_summary.json")
+
+
+async def main_async(args):
+    if args.growth <= 1:
+        raise SystemExit("❌ --growth 必须大于 1")
+    if args.rps_start <= 0:
+        raise SystemExit("❌ --rps-start 必须大于 0")
+    targets = [parse_search_target(text) for text in args.target or ["http://localhost:10086"]]
+    tracer = trace_sampler.tracer_from_args(args)
+    recorder = traffic_trace.recorder_from_args(args, "capacity_search")
+    metrics = metrics_exporter.exporter_from_args(args, "capacity_search")
+    results = []
+    for name, url, alias_file in targets:
+        client = HttpClient(url, max_connections=args.connections, timeout=args.timeout, tracer=tracer,
+                            recorder=recorder, metrics=metrics)
+        selector = key_dist.get_selector(args.key_dist, args.key_seed)
+        if alias_file or len(targets) == 1:
+            driver = OpenLoopDriver(client, selector, AliasStore(alias_file or args.alias_file),
+                                    args.max_outstanding, args.seed)
+        else:
+            print(f"ℹ️  [{name}] 没有指定 @alias 文件，不读 alias 文件（--alias-file 只在单个服务时使用）")
+            driver = OpenLoopDriver(client, selector, None, args.max_outstanding, args.seed, NO_FILE_WEIGHTS)
+        try:
+            results.append(await CapacitySearch(name, driver, args).run())
+        finally:
+            await client.close()
+    if tracer:
+        tracer.close()
+    if recorder:
+        recorder.close()
+        print(f"📼 已录制 {recorder.count} 条请求到 {args.record_file}")
+    if metrics:
+        metrics.close()
+    for result in results:
+        print_curve(result)
+    print_comparison(results)
+    if args.csv:
+        write_results(results, args.csv)
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="自动搜索满足 SLO 的最大可持续 RPS")
+    parser.add_argument("--target", action="append",
+                        help="name=url[@alias文件]，可重复指定多个服务依次搜索")
+    parser.add_argument("--rps-start", type=int, default=500, help="爬升起始 RPS")
+    parser.add_argument("--rps-max", type=int, default=200000, help="RPS 上限")
+    parser.add_argument("--growth", type=float, default=2.0, help="爬升阶段每步的倍数")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="二分结束时区间宽度占比")
+    parser.add_argument("--min-rps-gap", type=int, default=50, help="二分结束时的最小区间宽度")
+    parser.add_argument("--max-bisect-steps", type=int, default=8)
+    parser.add_argument("--step-duration", type=float, default=15, help="爬升与二分阶段的秒数")
+    parser.add_argument("--confirm-duration", type=float, default=60, help="确认阶段秒数，0 表示不确认")
+    parser.add_argument("--confirm-retries", type=int, default=2, help="确认失败后下调重试的次数")
+    parser.add_argument("--warmup", type=float, default=10, help="搜索前以起始 RPS 预热的秒数，0 表示不预热")
+    parser.add_argument("--cooldown", type=float, default=5, help="阶段之间等待服务端排空的秒数")
+    parser.add_argument("--throughput-slack", type=float, default=0.05,
+                        help="实际吞吐低于目标的该比例时视为饱和")
+    parser.add_argument("--slo-p99-ms", type=float, default=100, help="SLO: p99 延迟上限（毫秒）")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="SLO: 错误率上限（0~1）")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="poisson", help="到达模型")
+    parser.add_argument("--connections", type=int, default=1000, help="连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="未完成请求上限，超过的计为丢弃")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE,
+                        help="二进制 alias 文件，只用于单个服务；多个服务用 --target name=url@文件")
+    parser.add_argument("--key-dist", default=key_dist.DEFAULT_KEY_DIST, help="读请求 key 分布")
+    parser.add_argument("--key-seed", type=int, default=None, help="key 分布随机种子")
+    parser.add_argument("--seed", type=int, default=None, help="请求比例与到达间隔的随机种子")
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_steps.csv 和 <前缀>_summary.json")
+    trace_sampler.add_arguments(parser)
+    traffic_trace.add_arguments(parser)
+    metrics_exporter.add_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
@@ -0,0 +1,324 @@
+"""
+多服务对比压测：v1（纯内存）/ v2（本地库）/ v2_mysql / v3（分布式）在相同负载下逐项对比
+
+v1、v2、v3 接口一致，这里把 目标服务 × 负载剖面 的每个组合用相同的种子、相同的时长跑一遍：
+  - 交错执行：按轮次跑，每一轮每个剖面依次打所有目标，目标的先后顺序每轮轮换，
+    压测机、网络、数据库后台任务随时间的漂移会均摊到每个目标上，而不是全部落在最后跑的那个
+  - 相同种子：同一剖面同一轮次，所有目标的请求类型序列、到达间隔、key 选择、生成的长链接都相同
+  - 开始前给每个目标预灌 --prefill 条相同的长链接，读请求从一开始就有 key 可选
+结束时按剖面输出一张对比表：吞吐（只算成功的请求，失败单独列出每秒错误数，
+快速失败的目标不会显得吞吐更高）、分位数、错误率，以及相对基线（默认 v1）的倍数，
+即每一层存储带来的开销；“漂移”列是各轮吞吐的变异系数，过大说明环境不稳定，结论需要谨慎。
+
+负载剖面（--profile，可重复）：名称 或 名称:参数，参数为逗号分隔的 key=value
+  users=N        闭环，N 个并发循环发请求，测最大吞吐
+  rps=N          开环，固定到达率（见 open_loop.py），测同等压力下的延迟
+  arrival=...    开环的到达模型，constant / poisson
+  create=W       创建权重
+  read=W         读已创建 alias 的权重
+  file=W         读 --alias-file 中 alias 的权重（各目标的库里预灌数据不同，默认不读）
+  key_dist=...   读请求 key 分布，见 key_dist.py
+内置剖面见 PROFILES，也可以覆盖内置剖面的部分参数，如 mixed:users=256
+
+# python compare_targets.py --target v1=http://host1:10086 --target v2=http://host2:10086 --target v3=http://nginx:80
+# python compare_targets.py --target v1=http://localhost:10086 --target v2_mysql=http://localhost:10087 \
+#     --profile mixed --profile read:key_dist=zipf:1.1 --profile steady:rps=5000 --rounds 5 --duration 20 --csv report/compare
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import random
+import statistics
+import time
+
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from capacity_search import parse_target
+from key_dist import DEFAULT_KEY_DIST, parse_key_dist
+from open_loop import OP_CREATE, OP_READ, OP_READ_FILE, OpenLoopDriver, StepResult
+from request_mix import CREATE_WEIGHT, READ_WEIGHT, READ_WEIGHT_BY_FILE, random_url
+
+PROFILES = {
+    # request_mix.py 的比例，读文件 alias 的份额并入普通读
+    "mixed": f"users=64,create={CREATE_WEIGHT},read={READ_WEIGHT + READ_WEIGHT_BY_FILE}",
+    "read": "users=64,create=0,read=1",
+    "create": "users=64,create=1,read=0",
+    "steady": f"rps=1000,arrival=poisson,create={CREATE_WEIGHT},read={READ_WEIGHT + READ_WEIGHT_BY_FILE}",
+}
+DEFAULT_PROFILES = ("mixed", "read", "create")
+PROFILE_OPTIONS = {"users", "rps", "arrival", "create", "read", "file", "key_dist"}
+
+
+class Profile:
+    def __init__(self, name, users=0, rps=0, arrival="constant", create=CREATE_WEIGHT,
+                 read=READ_WEIGHT + READ_WEIGHT_BY_FILE, file=0, key_dist=DEFAULT_KEY_DIST):
+        self.name = name
+        self.users = int(users)
+        self.rps = int(rps)
+        self.arrival = arrival
+        self.weights = tuple((op, float(w)) for op, w in ((OP_CREATE, create), (OP_READ, read), (OP_READ_FILE, file))
+                             if float(w) > 0)
+        self.key_dist = key_dist
+        if not self.weights:
+            raise ValueError(f"剖面 {name} 的请求权重全为 0")
+        if (self.users > 0) == (self.rps > 0):
+            raise ValueError(f"剖面 {name} 需要且只能指定 users（闭环）或 rps（开环）之一")
+        parse_key_dist(key_dist)  # 提前校验
+
+    @property
+    def mode(self):
+        return f"闭环 {self.users} 并发" if self.users else f"开环 {self.rps} RPS {self.arrival}"
+
+    def describe(self):
+        mix = " ".join(f"{op}:{w:g}" for op, w in self.weights)
+        return f"{self.name}（{self.mode}，{mix}，key {self.key_dist}）"
+
+
+def parse_profile(text):
+    """名称 或 名称:k=v,k=v；名称是内置剖面时在其参数上覆盖"""
+    name, _, params = text.partition(":")
+    options, overrides = {}, {}
+    for spec, target in ((PROFILES.get(name, ""), options), (params, overrides)):
+        for item in filter(None, (s.strip() for s in spec.split(","))):
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise ValueError(f"剖面参数格式应为 key=value: {item}")
+            target[key.strip()] = value.strip()
+    # 覆盖时只写了另一种模式（如 mixed:rps=2000），以覆盖的为准
+    if "users" in overrides or "rps" in overrides:
+        options.pop("users", None)
+        options.pop("rps", None)
+    options.update(overrides)
+    unknown = options.keys() - PROFILE_OPTIONS
+    if unknown:
+        raise ValueError(f"剖面 {text} 含未知参数: {', '.join(sorted(unknown))}")
+    return Profile(name, **options)
+
+
+class Target:
+    """一个被测服务：连接池与已创建的 alias 在各轮次之间保留"""
+
+    def __init__(self, name, url, args):
+        self.name = name
+        self.url = url
+        self.client = HttpClient(url, max_connections=args.connections, timeout=args.timeout)
+        self.created_aliases = []
+        self.reachable = True
+
+
+class Cell:
+    """目标 × 剖面：各轮次的结果合并为一个 StepResult"""
+
+    def __init__(self, target, profile):
+        self.target = target
+        self.profile = profile
+        self.rounds = []
+        self.merged = StepResult(profile.rps, 0)
+
+    def add(self, result):
+        self.rounds.append(result.succeeded / result.duration)
+        merged = self.merged
+        merged.duration += result.duration
+        merged.sent += result.sent
+        merged.dropped += result.dropped
+        for op in result.latencies:
+            merged.latencies[op].extend(result.latencies[op])
+            merged.errors[op] += result.errors[op]
+
+    def summary(self):
+        summary = self.merged.summary() if self.merged.duration else {}
+        mean = statistics.fmean(self.rounds) if self.rounds else 0.0
+        drift = statistics.pstdev(self.rounds) / mean * 100 if len(self.rounds) > 1 and mean else 0.0
+        summary.update(target=self.target.name, profile=self.profile.name, rounds=len(self.rounds),
+                       drift_pct=round(drift, 1))
+        return summary
+
+
+async def run_closed(driver, users, duration):
+    """闭环：users 个循环各自发完一个再发下一个，测最大吞吐"""
+    loop = asyncio.get_running_loop()
+    result = StepResult(0, duration)
+    end = loop.time() + duration
+
+    async def user():
+        while loop.time() < end:
+            result.sent += 1
+            await driver.fire(driver.choose_op(), loop.time(), result)
+
+    await asyncio.gather(*(user() for _ in range(users)))
+    return result
+
+
+async def prefill(target, count, args):
+    """用相同种子的长链接给每个目标灌入相同数量的 alias"""
+    rng = random.Random(f"{args.seed}:prefill")
+    sem = asyncio.Semaphore(args.connections)
+    aliases = [None] * count
+
+    async def create(i, url):
+        async with sem:
+            try:
+                resp = await target.client.post_json("/create", {"url": url}, name=OP_CREATE)
+                if resp.status == 200:
+                    aliases[i] = resp.json().get("alias")
+            except Exception:
+                pass
+
+    await asyncio.gather(*(create(i, random_url(rng)) for i in range(count)))
+    target.created_aliases.extend(a for a in aliases if a)
+    return sum(1 for a in aliases if a)
+
+
+async def probe(target):
+    """只确认服务可达，不要求具体状态码（v1 / v2 没有 /health）"""
+    try:
+        await target.client.get("/u/__compare_probe__")
+        return True
+    except Exception:
+        return False
+
+
+async def run_cell(target, profile, round_index, duration, file_aliases, args):
+    # 种子只与剖面和轮次有关，同一轮所有目标收到相同的请求序列
+    seed = f"{args.seed}:{profile.name}:{round_index}"
+    selector = parse_key_dist(profile.key_dist, f"{seed}:keys")
+    driver = OpenLoopDriver(target.client, selector, file_aliases, args.max_outstanding, seed, profile.weights)
+    driver.created_aliases = target.created_aliases
+    if profile.users:
+        return await run_closed(driver, profile.users, duration)
+    return await driver.run_step(profile.rps, duration, profile.arrival)
+
+
+def print_row(summary, tag=""):
+    print(f"  {summary['target']:<12}{tag:<8} 成功 {summary['achieved_rps']:>9} RPS | 错误 {summary['error_rps']:>8}/s "
+          f"{summary['error_rate']:>6}% | "
+          f"p50 {summary['p50_ms']:>8}ms p99 {summary['p99_ms']:>8}ms p99.9 {summary['p999_ms']:>8}ms")
+
+
+def ratio(value, base):
+    return round(value / base, 2) if base else None
+
+
+def comparison_rows(cells, targets, profiles, baseline):
+    rows = []
+    for profile in profiles:
+        base = cells[(baseline, profile.name)].summary()
+        for target in targets:
+            summary = cells[(target.name, profile.name)].summary()
+            if not summary.get("sent"):
+                continue
+            if base.get("sent"):
+                summary["rps_vs_base"] = ratio(summary["achieved_rps"], base["achieved_rps"])
+                summary["p50_vs_base"] = ratio(summary["p50_ms"], base["p50_ms"])
+                summary["p99_vs_base"] = ratio(summary["p99_ms"], base["p99_ms"])
+            rows.append(summary)
+    return rows
+
+
+def print_comparison(rows, profiles, baseline):
+    def fmt(value, suffix="x"):
+        return "-" if value is None else f"{value}{suffix}"
+
+    for profile in profiles:
+        print(f"\n📊 {profile.describe()}，基线 {baseline}")
+        print(f"  {'服务':<12}{'成功RPS':>10}{'错误/s':>10}{'错误率':>9}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}"
+              f"{'p99.9(ms)':>11}{'吞吐/基线':>10}{'p50/基线':>10}{'p99/基线':>10}{'漂移':>8}")
+        for r in (r for r in rows if r["profile"] == profile.name):
+            print(f"  {r['target']:<12}{r['achieved_rps']:>10}{r['error_rps']:>10}{r['error_rate']:>8}%{r['p50_ms']:>10}{r['p90_ms']:>10}"
+                  f"{r['p99_ms']:>10}{r['p999_ms']:>11}{fmt(r.get('rps_vs_base')):>10}"
+                  f"{fmt(r.get('p50_vs_base')):>10}{fmt(r.get('p99_vs_base')):>10}{r['drift_pct']:>7}%")
+
+
+def write_results(rows, rounds, args, profiles, prefix):
+    fields = ["profile", "target", "rounds", "sent", "errors", "error_rate", "achieved_rps", "error_rps", "p50_ms", "p90_ms",
+              "p99_ms", "p999_ms", "max_ms", "rps_vs_base", "p50_vs_base", "p99_vs_base", "drift_pct"]
+    with open(f"{prefix}_compare.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    config = {k: v for k, v in vars(args).items() if k not in ("profile", "csv")}
+    config["profiles"] = {p.name: p.describe() for p in profiles}
+    with open(f"{prefix}_compare.json", "w", encoding="utf-8") as f:
+        json.dump({"finished": time.strftime("%Y-%m-%d %H:%M:%S"), "config": config, "results": rows,
+                   "rounds": rounds}, f, indent=2, ensure_ascii=False)
+    print(f"📄 结果已写入 {prefix}_compare.csv 和 {prefix}_compare.json")
+
+
+async def main_async(args):
+    profiles = [parse_profile(p) for p in (args.profile or DEFAULT_PROFILES)]
+    targets = [Target(name, url, args) for name, url in map(parse_target, args.target or ["http://localhost:10086"])]
+    names = [t.name for t in targets]
+    if len(set(names)) != len(names):
+        raise SystemExit("❌ --target 名称重复")
+    baseline = args.baseline or ("v1" if "v1" in names else names[0])
+    if baseline not in names:
+        raise SystemExit(f"❌ 基线 {baseline} 不在 --target 中")
+    file_aliases = AliasStore(args.alias_file)
+    cells = {(t.name, p.name): Cell(t, p) for t in targets for p in profiles}
+    rounds = []
+
+    print(f"🚀 对比 {', '.join(f'{t.name}={t.url}' for t in targets)}，基线 {baseline}")
+    print(f"   {args.rounds} 轮 × {len(profiles)} 个剖面 × {len(targets)} 个目标，每项 {args.duration}s，种子 {args.seed}")
+    for profile in profiles:
+        print(f"   剖面 {profile.describe()}")
+    try:
+        for target in targets:
+            target.reachable = await probe(target)
+            if not target.reachable:
+                print(f"⚠️  {target.name} ({target.url}) 不可达，跳过")
+            elif args.prefill:
+                print(f"🌱 {target.name}: 预灌 {await prefill(target, args.prefill, args)}/{args.prefill} 条")
+        live = [t for t in targets if t.reachable]
+        if args.warmup:
+            print(f"🔥 预热 {args.warmup}s / 目标")
+            for target in live:
+                await run_cell(target, profiles[0], -1, args.warmup, file_aliases, args)
+        for round_index in range(args.rounds):
+            print(f"\n🔁 第 {round_index + 1}/{args.rounds} 轮")
+            for profile in profiles:
+                # 每轮轮换目标顺序，时间漂移均摊到每个目标
+                shift = round_index % len(live) if live else 0
+                for target in live[shift:] + live[:shift]:
+                    result = await run_cell(target, profile, round_index, args.duration, file_aliases, args)
+                    cells[(target.name, profile.name)].add(result)
+                    summary = result.summary()
+                    summary.update(target=target.name, profile=profile.name, round=round_index + 1)
+                    rounds.append(summary)
+                    print_row(summary, profile.name)
+                    if args.cooldown:
+                        await asyncio.sleep(args.cooldown)
+    finally:
+        for target in targets:
+            await target.client.close()
+
+    rows = comparison_rows(cells, targets, profiles, baseline)
+    print_comparison(rows, profiles, baseline)
+    if args.csv:
+        write_results(rows, rounds, args, profiles, args.csv)
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="多服务在相同负载下的交错对比压测")
+    parser.add_argument("--target", action="append", help="name=url，可重复，如 v1=http://localhost:10086")
+    parser.add_argument("--profile", action="append",
+                        help=f"负载剖面，可重复，内置: {', '.join(PROFILES)}，默认 {','.join(DEFAULT_PROFILES)}")
+    parser.add_argument("--baseline", default="", help="基线目标名，默认 v1（不存在时取第一个）")
+    parser.add_argument("--rounds", type=int, default=3, help="交错轮数")
+    parser.add_argument("--duration", type=float, default=20, help="每个 目标×剖面 每轮的秒数")
+    parser.add_argument("--warmup", type=float, default=5, help="正式开始前每个目标用第一个剖面预热的秒数")
+    parser.add_argument("--cooldown", type=float, default=2, help="两次运行之间等待服务端排空的秒数")
+    parser.add_argument("--prefill", type=int, default=1000, help="开始前给每个目标预灌的短链数")
+    parser.add_argument("--seed", default="1", help="所有目标共用的随机种子")
+    parser.add_argument("--connections", type=int, default=1000, help="每个目标的连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="开环剖面的未完成请求上限")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="file 权重大于 0 的剖面读取的二进制 alias 文件")
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_compare.csv 和 <前缀>_compare.json")
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
@@ -0,0 +1,501 @@
+"""
+跳转热路径（GET /u/{alias}）的连接复用矩阵
+
+302 响应只有几百字节，高并发下开销主要在连接处理上。这里固定一组 alias 和 key 分布，
+逐个配置跑闭环压测，输出每种连接用法的 RPS 与延迟：
+  - 连接数         --connections 1,8,32,128
+  - keep-alive     --keep-alive on,off；off 时每个请求新建连接并带 Connection: close
+  - pipelining     --pipeline 1,4,16；一次写出 N 个请求再依次读 N 个响应（仅 keep-alive）
+  - HTTP/2 多路复用 --h2-streams 1,16,100；每个连接上同时 N 个流（需要 pip install h2）
+每个配置的 alias 序列相同（相同的 key 分布与种子），结果只随连接用法变化。
+
+直接打 Kestrel 服务时，压测端的连接用法就相当于 nginx 到上游的连接用法，
+结束时按 “达到 keep-alive 峰值 RPS 的 95% 所需的连接数” 估算 nginx upstream keepalive：
+upstream keepalive 是每个 worker 进程缓存的空闲连接数，由 upstream 内所有节点共享，
+所以需要 连接数 × --upstream-servers / --nginx-workers（见 docker-distributed/nginx/conf.d/urlshort.conf）。
+
+HTTP/2：nginx 的 listen 80 未开启 http2，Kestrel 的明文端口默认也只接受 HTTP/1.1，
+明文目标用 prior knowledge（h2c）连接，https 目标通过 ALPN 协商；不支持时该配置记为失败并继续。
+
+# python conn_matrix.py --base-url http://192.168.1.3:10086 --connections 1,8,32,128,512 --pipeline 1,8 --duration 10
+# python conn_matrix.py --base-url http://localhost:80 --keep-alive on --pipeline 1 --connections 16,64,256 --csv report/conn
+# python conn_matrix.py --base-url https://localhost:5001 --h2-streams 1,32,128 --connections 1,4 --insecure
+"""
+
+import argparse
+import asyncio
+import csv
+import ssl
+import time
+
+import key_dist
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient, HttpError, build_request, parse_base_url, read_response
+from latency_hist import LatencyHistogram
+from request_mix import random_url
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events  # 可选，仅 --h2-streams 需要
+    import h2.exceptions
+except ImportError:
+    h2 = None
+
+H2_HANDSHAKE_TIMEOUT = 3.0
+
+
+def parse_list(text, cast=int):
+    return [cast(v) for v in text.split(",") if v.strip()]
+
+
+class Config:
+    def __init__(self, protocol, connections, keep_alive=True, depth=1):
+        self.protocol = protocol  # http1 / h2
+        self.connections = connections
+        self.keep_alive = keep_alive
+        self.depth = depth  # http1 为 pipelining 深度，h2 为每连接的并发流数
+
+    @property
+    def label(self):
+        if self.protocol == "h2":
+            return f"h2 conn={self.connections} streams={self.depth}"
+        if not self.keep_alive:
+            return f"http1 conn={self.connections} close"
+        return f"http1 conn={self.connections} keepalive pipeline={self.depth}"
+
+
+class ConfigResult:
+    def __init__(self, config):
+        self.config = config
+        self.hist = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.connects = 0
+        self.duration = 0.0
+        self.failure = ""  # 整个配置无法运行时的原因
+
+    def row(self):
+        s = self.hist.summary()
+        c = self.config
+        return {
+            "protocol": c.protocol,
+            "connections": c.connections,
+            "keep_alive": c.keep_alive,
+            "depth": c.depth,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.requests / self.duration, 1) if self.duration else 0.0,
+            "connects": self.connects,
+            "p50_ms": round(s["p50_ms"], 3),
+            "p90_ms": round(s["p90_ms"], 3),
+            "p99_ms": round(s["p99_ms"], 3),
+            "p999_ms": round(s["p99.9_ms"], 3),
+            "max_ms": round(s["max_ms"], 3),
+            "failure": self.failure,
+        }
+
+
+class AliasSource:
+    """每个配置从头开始、相同种子的 alias 序列"""
+
+    def __init__(self, aliases, spec, seed):
+        self.aliases = aliases
+        self.selector = key_dist.parse_key_dist(spec, seed)
+
+    def next_path(self):
+        return f"/u/{self.selector.pick(self.aliases)}"
+
+
+class Http1Worker:
+    """一个连接槽位：keep-alive 时复用连接并可 pipelining，否则每个请求新建连接"""
+
+    def __init__(self, target, config, source, result, ssl_context, timeout):
+        self.scheme, self.host, self.port, self.host_header = target
+        self.config = config
+        self.source = source
+        self.result = result
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl_context, server_hostname=self.host if self.ssl_context else None)
+        self.result.connects += 1
+
+    def disconnect(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def batch(self, measuring, until):
+        config, result = self.config, self.result
+        depth = config.depth if config.keep_alive else 1
+        paths = [self.source.next_path() for _ in range(depth)]
+        data = b"".join(build_request("GET", self.host_header, p, keep_alive=config.keep_alive) for p in paths)
+        loop = asyncio.get_running_loop()
+        # 建连、写出、读完这一批响应共用一个超时，且不超过统计结束时刻，服务端不响应时也能按时结束
+        timeout_at = loop.time() + self.timeout
+        deadline = min(timeout_at, until)
+        start = time.perf_counter_ns()
+        answered = 0
+        try:
+            if self.writer is None:
+                await asyncio.wait_for(self.connect(), deadline - loop.time())
+            self.writer.write(data)
+            await asyncio.wait_for(self.writer.drain(), deadline - loop.time())
+            for _ in paths:
+                resp = await asyncio.wait_for(read_response(self.reader), deadline - loop.time())
+                answered += 1
+                if measuring:
+                    result.hist.record((time.perf_counter_ns() - start) // 1000)
+                    result.requests += 1
+                    if resp.status != 302:
+                        result.errors += 1
+                if not resp.keep_alive:
+                    # 服务端要求关闭（或 keep-alive off），剩余 pipelined 请求作废
+                    break
+        except (OSError, HttpError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            cut = isinstance(e, asyncio.TimeoutError) and loop.time() < timeout_at
+            if measuring and not cut:
+                # 这一批里没收到响应的请求都记为错误（超时、连接断开）；统计结束时还没超时的不计入
+                result.requests += len(paths) - answered
+                result.errors += len(paths) - answered
+            self.disconnect()
+            return
+        if not config.keep_alive or not resp.keep_alive:
+            self.disconnect()
+
+    async def run(self, until, measure_from):
+        loop = asyncio.get_running_loop()
+        try:
+            while loop.time() < until:
+                await self.batch(loop.time() >= measure_from, until)
+        finally:
+            self.disconnect()
+
+
+class H2Connection:
+    """基于 h2 的最小 HTTP/2 客户端连接：只发 GET，响应体丢弃"""
+
+    def __init__(self, reader, writer, authority, scheme):
+        self.reader = reader
+        self.writer = writer
+        self.authority = authority
+        self.scheme = scheme
+        self.conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=True))
+        self.streams = {}  # stream_id -> [future, status]
+        self.reader_task = None
+
+    @classmethod
+    async def open(cls, host, port, authority, scheme, ssl_context):
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl_context, server_hostname=host if ssl_context else None)
+        if ssl_context and writer.get_extra_info("ssl_object").selected_alpn_protocol() != "h2":
+            writer.close()
+            raise HttpError("服务端未通过 ALPN 协商 h2")
+        connection = cls(reader, writer, authority, scheme)
+        connection.conn.initiate_connection()
+        writer.write(connection.conn.data_to_send())
+        await writer.drain()
+        try:
+            await asyncio.wait_for(connection.handshake(), H2_HANDSHAKE_TIMEOUT)
+        except (asyncio.TimeoutError, OSError, HttpError, h2.exceptions.ProtocolError) as e:
+            writer.close()
+            raise HttpError(f"服务端不支持 HTTP/2（{'ALPN' if ssl_context else 'h2c prior knowledge'}）") from e
+        connection.reader_task = asyncio.ensure_future(connection.read_loop())
+        return connection
+
+    async def handshake(self):
+        """等到服务端的 SETTINGS；只支持 HTTP/1.1 的服务端会返回 400 或直接关闭连接"""
+        while True:
+            data = await self.reader.read(65536)
+            if not data:
+                raise ConnectionResetError("连接已被服务端关闭")
+            events = self.conn.receive_data(data)
+            pending = self.conn.data_to_send()
+            if pending:
+                self.writer.write(pending)
+            if any(isinstance(e, h2.events.RemoteSettingsChanged) for e in events):
+                return
+
+    async def read_loop(self):
+        error = ConnectionResetError("HTTP/2 连接已关闭")
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                for event in self.conn.receive_data(data):
+                    self.handle(event)
+                pending = self.conn.data_to_send()
+                if pending:
+                    self.writer.write(pending)
+        except Exception as e:
+            error = e
+        for future, _ in self.streams.values():
+            if not future.done():
+                future.set_exception(error)
+        self.streams.clear()
+
+    def handle(self, event):
+        if isinstance(event, h2.events.ResponseReceived):
+            for name, value in event.headers:
+                if name in (b":status", ":status"):
+                    self.streams[event.stream_id][1] = int(value)
+        elif isinstance(event, h2.events.DataReceived):
+            self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+            future, status = self.streams.pop(event.stream_id, (None, 0))
+            if future is not None and not future.done():
+                future.set_result(status)
+        elif isinstance(event, h2.events.StreamReset):
+            future, _ = self.streams.pop(event.stream_id, (None, 0))
+            if future is not None and not future.done():
+                future.set_exception(HttpError(f"流被重置: {event.error_code}"))
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            raise ConnectionResetError(f"GOAWAY: {event.error_code}")
+
+    async def get(self, path, timeout):
+        if self.reader_task.done():
+            raise ConnectionResetError("HTTP/2 连接已关闭")
+        stream_id = self.conn.get_next_available_stream_id()
+        future = asyncio.get_running_loop().create_future()
+        self.streams[stream_id] = [future, 0]
+        self.conn.send_headers(stream_id, [(":method", "GET"), (":authority", self.authority),
+                                           (":scheme", self.scheme), (":path", path)], end_stream=True)
+        self.writer.write(self.conn.data_to_send())
+        try:
+            await asyncio.wait_for(self.writer.drain(), timeout)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # 超时的流重置掉，迟到的响应不再处理
+            self.streams.pop(stream_id, None)
+            try:
+                self.conn.reset_stream(stream_id)
+                self.writer.write(self.conn.data_to_send())
+            except h2.exceptions.ProtocolError:
+                pass  # 流已经结束
+            raise
+
+    def close(self):
+        if self.reader_task:
+            self.reader_task.cancel()
+        self.writer.close()
+
+
+async def run_h2_connection(target, config, source, result, ssl_context, until, measure_from, timeout):
+    scheme, host, port, host_header = target
+    loop = asyncio.get_running_loop()
+    conn = None
+
+    async def stream():
+        nonlocal conn
+        while loop.time() < until:
+            measuring = loop.time() >= measure_from
+            start = time.perf_counter_ns()
+            # 与 HTTP/1 相同：单请求超时，且不超过统计结束时刻
+            timeout_at = loop.time() + timeout
+            try:
+                if conn is None or conn.reader_task.done():
+                    conn = await asyncio.wait_for(H2Connection.open(host, port, host_header, scheme, ssl_context),
+                                                  min(timeout_at, until) - loop.time())
+                    result.connects += 1
+                status = await conn.get(source.next_path(), min(timeout_at, until) - loop.time())
+            except (OSError, HttpError, asyncio.IncompleteReadError, asyncio.TimeoutError,
+                    h2.exceptions.ProtocolError) as e:
+                if isinstance(e, asyncio.TimeoutError) and loop.time() < timeout_at:
+                    continue  # 统计结束时还没完成，也还没超时，不计入
+                if measuring:
+                    result.requests += 1
+                    result.errors += 1
+                await asyncio.sleep(0.01)
+                continue
+            if measuring:
+                result.hist.record((time.perf_counter_ns() - start) // 1000)
+                result.requests += 1
+                if status != 302:
+                    result.errors += 1
+
+    try:
+        # 先建好连接再并发开流，避免每个流各自建连
+        conn = await asyncio.wait_for(H2Connection.open(host, port, host_header, scheme, ssl_context), timeout)
+        result.connects += 1
+        await asyncio.gather(*(stream() for _ in range(config.depth)))
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+async def run_config(config, target, aliases, args, ssl_context):
+    result = ConfigResult(config)
+    source = AliasSource(aliases, args.key_dist, args.seed)
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + args.warmup
+    until = measure_from + args.duration
+    try:
+        if config.protocol == "h2":
+            tasks = [run_h2_connection(target, config, source, result, ssl_context, until, measure_from,
+                                       args.timeout) for _ in range(config.connections)]
+        else:
+            tasks = [Http1Worker(target, config, source, result, ssl_context, args.timeout).run(until, measure_from)
+                     for _ in range(config.connections)]
+        await asyncio.gather(*tasks)
+        result.duration = args.duration
+    except Exception as e:
+        result.failure = str(e) or type(e).__name__
+    return result
+
+
+def build_configs(args):
+    configs = []
+    for connections in parse_list(args.connections):
+        for keep_alive in (v.strip() == "on" for v in args.keep_alive.split(",") if v.strip()):
+            if not keep_alive:
+                configs.append(Config("http1", connections, keep_alive=False))
+                continue
+            for depth in parse_list(args.pipeline):
+                configs.append(Config("http1", connections, depth=depth))
+        for streams in parse_list(args.h2_streams):
+            configs.append(Config("h2", connections, depth=streams))
+    return configs
+
+
+async def load_aliases(args):
+    """优先用 alias 文件；没有时先创建 --prefill 条，所有配置共用"""
+    store = AliasStore(args.alias_file)
+    if len(store) >= args.prefill:
+        return store
+    client = HttpClient(args.base_url, max_connections=64, timeout=args.timeout)
+    aliases = []
+    sem = asyncio.Semaphore(64)
+
+    async def create(i):
+        async with sem:
+            try:
+                resp = await client.post_json("/create", {"url": random_url()}, name="/create")
+                if resp.status == 200:
+                    aliases.append(resp.json()["alias"])
+            except Exception:
+                pass
+
+    try:
+        await asyncio.gather(*(create(i) for i in range(args.prefill)))
+    finally:
+        await client.close()
+    return aliases
+
+
+def print_row(row):
+    if row["failure"]:
+        print(f"  ❌ {row['failure']}")
+        return
+    print(f"  RPS {row['rps']:>9} | 错误 {row['errors']:>6} | 建连 {row['connects']:>7} | "
+          f"p50 {row['p50_ms']:>7}ms p99 {row['p99_ms']:>7}ms p99.9 {row['p999_ms']:>7}ms max {row['max_ms']:>7}ms")
+
+
+def print_table(results):
+    print(f"\n{'配置':<44}{'RPS':>10}{'错误':>8}{'建连':>9}{'p50(ms)':>10}{'p99(ms)':>10}{'p99.9(ms)':>11}")
+    for r in results:
+        row = r.row()
+        if row["failure"]:
+            print(f"{r.config.label:<44}{'失败':>10}  {row['failure']}")
+            continue
+        print(f"{r.config.label:<44}{row['rps']:>10}{row['errors']:>8}{row['connects']:>9}{row['p50_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['p999_ms']:>11}")
+
+
+def suggest_keepalive(results, args):
+    """keep-alive、不 pipelining 且错误率低于 1% 时，达到峰值 RPS 95% 的最少连接数"""
+    rows = [r.row() for r in results if r.config.protocol == "http1" and r.config.keep_alive
+            and r.config.depth == 1 and not r.failure and r.duration and r.requests
+            and r.errors <= r.requests * 0.01]
+    if not rows:
+        return
+    peak = max(row["rps"] for row in rows)
+    knee = min((row for row in rows if row["rps"] >= peak * 0.95), key=lambda row: row["connections"])
+    per_worker = -(-knee["connections"] * args.upstream_servers // args.nginx_workers)
+    print(f"\n🎯 keep-alive 连接达到 {knee['connections']} 个时 RPS {knee['rps']}，已达峰值 {peak} 的 95%")
+    print(f"   {args.upstream_servers} 个上游节点、{args.nginx_workers} 个 nginx worker："
+          f"upstream keepalive 建议 >= {per_worker}（每个 worker 的空闲连接缓存）")
+    closed = [r.row() for r in results if r.config.protocol == "http1" and not r.config.keep_alive
+              and not r.failure and r.duration and r.config.connections == knee["connections"]]
+    if closed and closed[0]["rps"]:
+        print(f"   同样 {knee['connections']} 个连接不复用时 RPS {closed[0]['rps']}，"
+              f"keep-alive 是其 {knee['rps'] / closed[0]['rps']:.1f} 倍")
+
+
+def write_csv(results, path):
+    rows = [r.row() for r in results]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"📄 结果已写入 {path}")
+
+
+async def main_async(args):
+    configs = build_configs(args)
+    if any(c.protocol == "h2" for c in configs) and h2 is None:
+        print("⚠️  未安装 h2（pip install h2），跳过 HTTP/2 配置")
+        configs = [c for c in configs if c.protocol != "h2"]
+    if not configs:
+        raise SystemExit("❌ 没有可运行的配置")
+    scheme, host, port = parse_base_url(args.base_url)
+    default_port = 443 if scheme == "https" else 80
+    target = (scheme, host, port, host if port == default_port else f"{host}:{port}")
+
+    aliases = await load_aliases(args)
+    if not len(aliases):
+        raise SystemExit("❌ 没有可用的 alias：--alias-file 为空且创建失败")
+    print(f"🚀 连接复用矩阵 {args.base_url} | {len(configs)} 个配置 × {args.duration}s（预热 {args.warmup}s）| "
+          f"alias {len(aliases)} 条 | key 分布 {args.key_dist}")
+
+    results = []
+    for config in configs:
+        ssl_context = None
+        if scheme == "https":
+            ssl_context = ssl.create_default_context()
+            if args.insecure:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+            ssl_context.set_alpn_protocols(["h2"] if config.protocol == "h2" else ["http/1.1"])
+        print(f"▶ {config.label}")
+        result = await run_config(config, target, aliases, args, ssl_context)
+        results.append(result)
+        print_row(result.row())
+        if args.cooldown:
+            await asyncio.sleep(args.cooldown)
+
+    print_table(results)
+    suggest_keepalive(results, args)
+    if args.csv:
+        write_csv(results, args.csv)
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="跳转热路径的连接数 / keep-alive / pipelining / HTTP/2 矩阵")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--connections", default="1,8,32,128", help="逗号分隔的连接数")
+    parser.add_argument("--keep-alive", default="on,off", help="on / off / on,off")
+    parser.add_argument("--pipeline", default="1,4,16", help="逗号分隔的 pipelining 深度（仅 keep-alive）")
+    parser.add_argument("--h2-streams", default="", help="逗号分隔的每连接 HTTP/2 并发流数，空表示不测 HTTP/2")
+    parser.add_argument("--duration", type=float, default=10, help="每个配置的统计秒数")
+    parser.add_argument("--warmup", type=float, default=2, help="每个配置开始统计前的秒数")
+    parser.add_argument("--cooldown", type=float, default=2, help="配置之间等待服务端回收连接的秒数")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒），超时记为错误；也用于预灌")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="二进制 alias 文件，条数不足 --prefill 时改为现场创建")
+    parser.add_argument("--prefill", type=int, default=1000, help="没有 alias 文件时现场创建的条数")
+    parser.add_argument("--key-dist", default=key_dist.DEFAULT_KEY_DIST, help="读请求 key 分布")
+    parser.add_argument("--seed", type=int, default=1, help="key 分布随机种子，每个配置相同")
+    parser.add_argument("--upstream-servers", type=int, default=4, help="nginx upstream 节点数，用于估算 keepalive")
+    parser.add_argument("--nginx-workers", type=int, default=4, help="nginx worker_processes，用于估算 keepalive")
+    parser.add_argument("--insecure", action="store_true", help="https 目标不校验证书")
+    parser.add_argument("--csv", default="", help="把每个配置的结果写入 CSV")
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
@@ -0,0 +1,442 @@
+"""
+压测过程中的正确性抽样校验：跳转的 Location 是否等于创建时的长链接，以及写后读延迟
+
+locustfile 在压测中只看状态码（v2_test.py 里 404 直接 pass），不会发现缓存与数据库不一致、
+写入一半失败之类的问题；base_test.py 的 Location 断言只跑一次。这里在全速压测中常开：
+  - 创建时按 alias 的 crc32 抽样（--consistency-sample，默认 1%），记下 alias -> 长链接哈希
+  - 读到被抽中的 alias 时比对 Location，分为：
+      ok           302 且 Location 一致
+      mismatch     302 但 Location 不一致（缓存 / 数据库分叉）
+      not_visible  创建成功后还没读到过 302 就返回 404（写后读未生效）
+      lost         已经读到过 302，之后又返回 404（数据丢失或缓存被错误删除）
+  - 写后读延迟：创建响应收到 -> 第一次读到正确的 302（任意节点）
+跟踪表是定长环形缓冲：alias 列表 + array 存哈希和时间，--consistency-capacity 条满了覆盖最旧的，
+10 万条约 20MB，不随压测时长增长；没被抽中的 alias 只多一次 crc32，不查表。
+
+locustfile 中（分布式运行时各 worker 的计数和延迟直方图汇总到 master 输出）：
+    consistency.install_locust_hooks(events)
+    consistency.on_create(alias, url)
+    consistency.on_redirect(alias, resp.status_code, resp.headers.get("Location"))
+
+独立运行时主动探测：每个被抽中的新 alias 立即开始按退避间隔轮流探测 --node 指定的各个节点，
+直到读到 302，写后读延迟不依赖读请求碰巧选中它；同时以 --read-rps 随机复查已跟踪的 alias。
+
+# python consistency.py --base-url http://localhost:10086 --create-rps 200 --read-rps 2000 --duration 60
+# python consistency.py --base-url http://192.168.1.3:80 --node http://192.168.1.3:8081 --node http://192.168.1.3:8082 \
+#     --create-rps 1000 --duration 300 --csv report/consistency
+# locust -f v2_test.py --host=http://192.168.1.3:10086 --consistency-sample 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import random
+import time
+import zlib
+from array import array
+
+from async_http import HttpClient
+from latency_hist import LatencyHistogram
+from request_mix import random_url
+
+DEFAULT_SAMPLE = 0.01
+DEFAULT_CAPACITY = 100000
+MAX_EXAMPLES = 20
+ALIAS_ENTRY_BYTES = 170
+VERDICTS = ("ok", "mismatch", "not_visible", "lost")
+
+
+def url_hash(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ConsistencyChecker:
+    """抽样 alias 的定长跟踪表与校验计数"""
+
+    def __init__(self, sample=DEFAULT_SAMPLE, capacity=DEFAULT_CAPACITY, clock=time.monotonic):
+        self.threshold = int(min(1.0, max(0.0, sample)) * 0xFFFFFFFF)
+        self.capacity = capacity
+        self.clock = clock
+        self.index = {}  # alias -> 槽位
+        self.aliases = [None] * capacity
+        self.hashes = array("Q", bytes(8 * capacity))
+        self.created = array("d", bytes(8 * capacity))
+        self.first_ok = array("d", bytes(8 * capacity))  # 0 表示还没读到过 302
+        self.cursor = 0
+        self.tracked_total = 0
+        self.evicted = 0
+        self.counts = dict.fromkeys(VERDICTS, 0)
+        self.lag = LatencyHistogram()
+        self.examples = []
+
+    def sampled(self, alias):
+        return zlib.crc32(alias.encode("utf-8")) <= self.threshold
+
+    def on_create(self, alias, url, expire=None):
+        """创建成功；带 expire 的不跟踪，否则到期后的 404 会被误判为 lost"""
+        if expire or not alias or not self.sampled(alias) or alias in self.index:
+            return
+        slot = self.cursor
+        old = self.aliases[slot]
+        if old is not None:
+            del self.index[old]
+            self.evicted += 1
+        self.aliases[slot] = alias
+        self.index[alias] = slot
+        self.hashes[slot] = url_hash(url)
+        self.created[slot] = self.clock()
+        self.first_ok[slot] = 0.0
+        self.cursor = (slot + 1) % self.capacity
+        self.tracked_total += 1
+
+    def on_redirect(self, alias, status, location, node=""):
+        """返回判定结果，未跟踪的 alias 或其他状态码返回 None"""
+        slot = self.index.get(alias) if alias else None
+        if slot is None:
+            return None
+        if status == 302:
+            if location is not None and url_hash(location) == self.hashes[slot]:
+                verdict = "ok"
+                if not self.first_ok[slot]:
+                    now = self.clock()
+                    self.first_ok[slot] = now
+                    self.lag.record(int((now - self.created[slot]) * 1_000_000))
+            else:
+                verdict = "mismatch"
+        elif status == 404:
+            verdict = "lost" if self.first_ok[slot] else "not_visible"
+        else:
+            return None
+        self.counts[verdict] += 1
+        if verdict in ("mismatch", "lost") and len(self.examples) < MAX_EXAMPLES:
+            self.examples.append({"alias": alias, "verdict": verdict, "status": status, "location": location,
+                                  "node": node, "age_s": round(self.clock() - self.created[slot], 3)})
+        return verdict
+
+    def memory_bytes(self):
+        """估算值：三个 array + alias 列表的指针，加上每条 alias 字符串与字典项"""
+        return 32 * self.capacity + len(self.index) * ALIAS_ENTRY_BYTES
+
+    def drain(self):
+        """取出计数和延迟直方图并清空，跟踪表保留（用于向 master 发送增量）"""
+        data = {"counts": self.counts, "tracked": self.tracked_total, "evicted": self.evicted,
+                "lag": base64.b64encode(self.lag.encode()).decode("ascii"), "examples": self.examples}
+        self.counts = dict.fromkeys(VERDICTS, 0)
+        self.tracked_total = self.evicted = 0
+        self.lag = LatencyHistogram()
+        self.examples = []
+        return data
+
+
+class ConsistencyReport:
+    """一个或多个 ConsistencyChecker 的汇总"""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(VERDICTS, 0)
+        self.tracked = 0
+        self.evicted = 0
+        self.lag = LatencyHistogram()
+        self.examples = []
+
+    def merge(self, data):
+        for verdict, value in data["counts"].items():
+            self.counts[verdict] = self.counts.get(verdict, 0) + value
+        self.tracked += data["tracked"]
+        self.evicted += data["evicted"]
+        self.lag.merge(LatencyHistogram.decode(base64.b64decode(data["lag"])))
+        self.examples.extend(data["examples"][:MAX_EXAMPLES - len(self.examples)])
+
+    def summary(self):
+        checked = sum(self.counts.values())
+        redirects = self.counts["ok"] + self.counts["mismatch"]
+        lag = self.lag.summary()
+        return {
+            "tracked": self.tracked,
+            "evicted": self.evicted,
+            "checked": checked,
+            **self.counts,
+            "mismatch_rate": round(self.counts["mismatch"] / redirects * 100, 4) if redirects else 0.0,
+            "lost_rate": round(self.counts["lost"] / checked * 100, 4) if checked else 0.0,
+            "visible": lag["count"],
+            "lag_p50_ms": round(lag["p50_ms"], 3),
+            "lag_p99_ms": round(lag["p99_ms"], 3),
+            "lag_max_ms": round(lag["max_ms"], 3),
+        }
+
+    def print(self, title="一致性抽样校验"):
+        s = self.summary()
+        if not s["tracked"] and not s["checked"]:
+            return
+        print(f"\n🔍 {title}: 跟踪 {s['tracked']} 条（覆盖 {s['evicted']}），校验 {s['checked']} 次")
+        print(f"   ok {s['ok']} | Location 不一致 {s['mismatch']} ({s['mismatch_rate']}%) | "
+              f"未生效 404 {s['not_visible']} | 读到过又 404 {s['lost']} ({s['lost_rate']}%)")
+        print(f"   写后读延迟（创建 -> 第一次正确 302，{s['visible']} 条）: p50 {s['lag_p50_ms']}ms "
+              f"p99 {s['lag_p99_ms']}ms max {s['lag_max_ms']}ms")
+        for example in self.examples:
+            print(f"   ⚠️  {example}")
+
+
+# locustfile 共用的进程内实例，未开启时为 None
+checker = None
+
+
+def on_create(alias, url, expire=None):
+    if checker is not None:
+        checker.on_create(alias, url, expire)
+
+
+def on_redirect(alias, status, location, node=""):
+    if checker is not None:
+        return checker.on_redirect(alias, status, location, node)
+    return None
+
+
+def install_locust_hooks(events):
+    """注册 --consistency-sample / --consistency-capacity，worker 的结果随心跳汇总到 master"""
+    report = ConsistencyReport()
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--consistency-sample", type=float, env_var="LOCUST_CONSISTENCY_SAMPLE",
+                            default=DEFAULT_SAMPLE, help="抽样校验 Location 的 alias 比例，0 表示关闭")
+        parser.add_argument("--consistency-capacity", type=int, env_var="LOCUST_CONSISTENCY_CAPACITY",
+                            default=DEFAULT_CAPACITY, help="每个进程最多跟踪的 alias 数")
+
+    @events.init.add_listener
+    def on_init(environment, **kwargs):
+        global checker
+        from locust.runners import MasterRunner
+        options = environment.parsed_options
+        if options is None or options.consistency_sample <= 0 or isinstance(environment.runner, MasterRunner):
+            return
+        checker = ConsistencyChecker(options.consistency_sample, options.consistency_capacity)
+
+    @events.report_to_master.add_listener
+    def on_report_to_master(client_id, data):
+        if checker is not None:
+            data["consistency"] = checker.drain()
+
+    @events.worker_report.add_listener
+    def on_worker_report(client_id, data):
+        if "consistency" in data:
+            report.merge(data["consistency"])
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        from locust.runners import WorkerRunner
+        if isinstance(environment.runner, WorkerRunner):
+            return
+        if checker is not None:
+            report.merge(checker.drain())
+        report.print()
+
+    return report
+
+
+def add_arguments(parser):
+    """独立压测驱动（open_loop.py 等）共用的参数"""
+    parser.add_argument("--consistency-sample", type=float, default=DEFAULT_SAMPLE,
+                        help="抽样校验 Location 的 alias 比例，0 表示关闭（见 consistency.py）")
+    parser.add_argument("--consistency-capacity", type=int, default=DEFAULT_CAPACITY, help="最多跟踪的 alias 数")
+
+
+def checker_from_args(args):
+    if args.consistency_sample <= 0:
+        return None
+    return ConsistencyChecker(args.consistency_sample, args.consistency_capacity)
+
+
+def print_checker(checker):
+    if checker is not None:
+        report = ConsistencyReport()
+        report.merge(checker.drain())
+        report.print()
+
+
+class ActiveVerifier:
+    """独立运行：按固定速率创建，对抽中的 alias 主动探测直到可见，并随机复查"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.checker = ConsistencyChecker(args.sample, args.capacity)
+        self.nodes = args.node or [args.base_url]
+        self.clients = {}
+        self.node_counts = {node: dict.fromkeys(VERDICTS, 0) for node in self.nodes}
+        self.probe_slots = asyncio.Semaphore(args.max_probes)
+        self.created = 0
+        self.create_errors = 0
+        self.probe_skipped = 0
+        self.probes = set()  # 在途的探测，与 paced() 的在途请求分开计数
+        self.skipped = {"create": 0, "read": 0}  # 在途请求满载而没有发出的创建 / 复查
+        self.never_visible = 0
+        self.first_try_visible = 0
+        self.rows = []
+        self.report = ConsistencyReport()  # 累计结果，进度输出时把 checker 的增量合并进来
+
+    def client(self, node):
+        client = self.clients.get(node)
+        if client is None:
+            client = self.clients[node] = HttpClient(node, max_connections=self.args.connections,
+                                                     timeout=self.args.timeout)
+        return client
+
+    async def check(self, alias, node):
+        try:
+            resp = await self.client(node).get(f"/u/{alias}", name="/u/[verify]")
+        except Exception:
+            return None
+        verdict = self.checker.on_redirect(alias, resp.status, resp.headers.get("location"), node)
+        if verdict is not None:
+            self.node_counts[node][verdict] += 1
+        return verdict
+
+    async def probe_until_visible(self, alias):
+        """退避探测，节点轮流，第一次 302 即停止（延迟由 checker 记录）"""
+        args = self.args
+        delay = args.probe_initial_ms / 1000
+        deadline = time.monotonic() + args.probe_max_wait
+        attempt = 0
+        async with self.probe_slots:
+            while True:
+                node = self.nodes[attempt % len(self.nodes)]
+                verdict = await self.check(alias, node)
+                if verdict in ("ok", "mismatch"):
+                    if attempt == 0:
+                        self.first_try_visible += 1
+                    return
+                attempt += 1
+                if time.monotonic() + delay > deadline:
+                    self.never_visible += 1
+                    return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, args.probe_max_delay_ms / 1000)
+
+    async def create_one(self):
+        url = random_url(self.rng)
+        try:
+            resp = await self.client(self.args.base_url).post_json("/create", {"url": url}, name="/create")
+            alias = resp.json().get("alias") if resp.status == 200 else None
+        except Exception:
+            alias = None
+        if not alias:
+            self.create_errors += 1
+            return
+        self.created += 1
+        self.checker.on_create(alias, url)
+        if alias in self.checker.index:
+            if len(self.probes) >= self.args.max_probes:
+                self.probe_skipped += 1
+                return
+            task = asyncio.ensure_future(self.probe_until_visible(alias))
+            self.probes.add(task)
+            task.add_done_callback(self.probes.discard)
+
+    async def paced(self, rps, end, action, kind):
+        if rps <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / rps
+        next_time = loop.time()
+        tasks = set()
+        while next_time < end:
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) < self.args.max_probes:
+                task = asyncio.ensure_future(action())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            else:
+                self.skipped[kind] += 1
+            next_time += interval
+        while tasks:
+            await asyncio.wait(list(tasks))
+
+    async def read_one(self):
+        # 环形缓冲未写满时已用的是前 len(index) 个槽位，写满后是全部
+        filled = len(self.checker.index)
+        if filled:
+            alias = self.checker.aliases[self.rng.randrange(filled)]
+            await self.check(alias, self.rng.choice(self.nodes))
+
+    async def reporter(self):
+        report = self.report
+        start = time.monotonic()
+        while True:
+            await asyncio.sleep(self.args.window)
+            report.merge(self.checker.drain())
+            s = report.summary()
+            s["elapsed_s"] = round(time.monotonic() - start, 1)
+            s["created"] = self.created
+            self.rows.append(s)
+            print(f"  [{s['elapsed_s']:>6.0f}s] 创建 {self.created:>8} | 跟踪 {s['tracked']:>8} | 校验 {s['checked']:>9} | "
+                  f"不一致 {s['mismatch']} ({s['mismatch_rate']}%) | 未生效 {s['not_visible']} | 丢失 {s['lost']} | "
+                  f"写后读 p50 {s['lag_p50_ms']}ms p99 {s['lag_p99_ms']}ms")
+
+    async def run(self):
+        args = self.args
+        loop = asyncio.get_running_loop()
+        print(f"🚀 一致性校验 {args.base_url}: 创建 {args.create_rps}/s（抽样 {args.sample * 100:g}%），"
+              f"复查 {args.read_rps}/s，探测节点 {', '.join(self.nodes)}")
+        end = loop.time() + args.duration
+        reporter = asyncio.ensure_future(self.reporter())
+        try:
+            await asyncio.gather(self.paced(args.create_rps, end, self.create_one, "create"),
+                                 self.paced(args.read_rps, end, self.read_one, "read"))
+            while self.probes:
+                await asyncio.wait(list(self.probes))
+        finally:
+            reporter.cancel()
+            for client in self.clients.values():
+                await client.close()
+        self.report.merge(self.checker.drain())
+        self.report.print()
+        print(f"   新建 {self.created} 条（失败 {self.create_errors}），第一次探测即可见 {self.first_try_visible} 条，"
+              f"{args.probe_max_wait}s 内始终不可见 {self.never_visible} 条，探测满载跳过 {self.probe_skipped} 条，"
+              f"在途请求满载跳过创建 {self.skipped['create']} / 复查 {self.skipped['read']} 次，"
+              f"跟踪表约 {self.checker.memory_bytes() / 1e6:.1f}MB")
+        if len(self.nodes) > 1:
+            for node, counts in self.node_counts.items():
+                print(f"   {node:<32} " + " ".join(f"{k} {v}" for k, v in counts.items()))
+        if args.csv:
+            self.write(args.csv)
+        return self.report
+
+    def write(self, prefix):
+        if self.rows:
+            with open(f"{prefix}_consistency_windows.csv", "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.rows[-1].keys()))
+                writer.writeheader()
+                writer.writerows(self.rows)
+        with open(f"{prefix}_consistency.json", "w", encoding="utf-8") as f:
+            json.dump({"summary": self.report.summary(), "nodes": self.node_counts,
+                       "examples": self.report.examples, "created": self.created,
+                       "never_visible": self.never_visible, "first_try_visible": self.first_try_visible,
+                       "probe_skipped": self.probe_skipped, "skipped": self.skipped},
+                      f, indent=2, ensure_ascii=False)
+        print(f"📄 结果已写入 {prefix}_consistency.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="写后读一致性与 Location 抽样校验")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="创建请求发往的服务基础URL")
+    parser.add_argument("--node", action="append", help="探测与复查的节点URL，可重复，默认同 --base-url")
+    parser.add_argument("--create-rps", type=float, default=100, help="每秒创建数")
+    parser.add_argument("--read-rps", type=float, default=500, help="每秒随机复查已跟踪 alias 的次数")
+    parser.add_argument("--duration", type=float, default=60, help="持续秒数")
+    parser.add_argument("--sample", type=float, default=1.0, help="跟踪并主动探测的新建 alias 比例")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="跟踪表容量")
+    parser.add_argument("--probe-initial-ms", type=float, default=2, help="第一次探测失败后的重试间隔（毫秒），之后翻倍")
+    parser.add_argument("--probe-max-delay-ms", type=float, default=500, help="探测重试间隔上限（毫秒）")
+    parser.add_argument("--probe-max-wait", type=float, default=10, help="超过该秒数仍不可见则放弃")
+    parser.add_argument("--max-probes", type=int, default=500, help="同时在途的探测上限；创建、复查的在途请求各自也以此为上限")
+    parser.add_argument("--window", type=float, default=10, help="进度输出间隔（秒）")
+    parser.add_argument("--connections", type=int, default=200, help="每个节点的连接池上限")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_consistency.json 和 _consistency_windows.csv")
+    asyncio.run(ActiveVerifier(parser.parse_args()).run())
@@ -1,6 +1,10 @@
-from locust import task, between, FastHttpUser
-import random
-import string
+from locust import task, between, FastHttpUser, events
+import key_dist
+import harness_profiler
+import latency_hist
+import metrics_exporter
+import payload_pool
+import traffic_trace
 
 # 仅测试创建性能的测试用例
 # locust -f create_only_test.py --host=http://localhost:10086
@@ -12,24 +16,35 @@ import string
 # 工作节点 (Worker): 负责执行任务，只需要知道主节点的地址
 # locust -f create_only_test.py --worker --master-host=192.168.1.3
 
+# 与 v1_test.py / v2_test.py 共用 --key-dist 参数，保证同一套分布式启动命令可以直接切换 locustfile；
+# 本文件只有创建请求，不会用到 key 分布
+@events.init_command_line_parser.add_listener
+def on_init_parser(parser):
+    key_dist.add_arguments(parser)
+
+
+# 每个接口的微秒级延迟直方图，分布式运行时由 master 合并，结束时写到 --csv 目录下
+latency_hist.install_locust_hooks(events)
+traffic_trace.install_locust_hooks(events)
+metrics_exporter.install_locust_hooks(events)
+harness_profiler.install_locust_hooks(events)
+payload_pool.install_locust_hooks(events)
+
+
 class CreateOnlyUser(FastHttpUser):
     wait_time = between(0, 0)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.created_count = 0
+        # 10% 的请求带随机过期时间（60 ~ 86400 秒），与原来逐请求生成的比例相同
+        self.payloads = payload_pool.pool_from_environment(self.environment, expire_ratio=0.1)
 
     @task
     def create_short_url(self):
-        print(f"[Locust] 当前 host: {self.host}")
         """专门测试创建短链的性能"""
-        url = "https://www.example.com/" + ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-        data = {"url": url}
-        # 随机添加过期时间（10%概率）
-        if random.random() < 0.1:
-            expire = random.choice([60, 300, 3600, 7200, 86400])
-            data["expire"] = expire
-        resp = self.client.post("/create", json=data)
+        _, body = self.payloads.take()
+        resp = self.client.post("/create", data=body, headers=payload_pool.JSON_HEADERS)
         if resp.status_code != 200:
             if resp.status_code == 0:
                 raise Exception("HTTP 0: 连接失败或目标服务无响应，可能服务未启动或网络异常")
@@ -0,0 +1,297 @@
+"""
+过期（expire）验证压测：持续创建带 expire 的短链，在到期前后定时探测
+
+- 每条带 expire 的 alias 安排两次探测：到期前 --margin 秒（应 302）、到期后 --margin 秒（应 404）
+- 到期后仍返回 302 的，每隔 --retry-interval 秒重探，直到 404 或超过 --max-retries，
+  第一次 404 的时间减去到期时间就是过期收敛延迟（Redis TTL / DB expire 检查生效的快慢）
+- 按时间窗口分别统计 “未过期读” 和 “已过期读” 的延迟，以及累计已过期条数，
+  观察过期数据堆积时读延迟的变化（v3 对已过期的 alias 每次都会回源 MySQL）
+
+待探测的 alias 放在按时间分桶的时间轮里：每个桶是一个 bytearray，记录为 17 字节定长结构
+（12 字节 alias + 4 字节到期时间偏移 + 1 字节探测类型），百万级 alias 只占几十 MB，
+到点整桶取出，不需要为每条记录维护对象或堆节点。
+
+# python expiry_test.py --base-url http://localhost:10086 --create-rps 200 --ttls 5,30,120 --duration 600
+# python expiry_test.py --base-url http://192.168.1.3:10086 --create-rps 2000 --ttls 60 --duration 3600 --max-tracked 5000000 --csv report/expiry
+"""
+
+import argparse
+import asyncio
+import csv
+import random
+import struct
+import time
+
+from async_http import HttpClient
+from latency_hist import LatencyHistogram
+from request_mix import random_url
+from shortcode import V3_ALIAS_LENGTH
+
+PROBE_BEFORE = 0
+PROBE_AFTER = 1  # 大于等于 1 的值表示第几次到期后探测
+
+# alias、到期时间（相对开始的毫秒）、探测类型
+ENTRY = struct.Struct(f"<{V3_ALIAS_LENGTH}sIB")
+
+
+class TimingWheel:
+    """按 resolution 秒分桶的时间轮，桶内是定长记录"""
+
+    def __init__(self, resolution=0.1):
+        self.resolution = resolution
+        self.slots = {}
+        self.size = 0
+        self.cursor = 0  # 下一个要取出的桶
+
+    def schedule(self, at, alias, deadline_ms, kind):
+        # 已经过去的时间点放进下一个要取出的桶
+        slot = max(self.cursor, int(at / self.resolution))
+        bucket = self.slots.get(slot)
+        if bucket is None:
+            bucket = self.slots[slot] = bytearray()
+        bucket += ENTRY.pack(alias.encode("ascii").ljust(V3_ALIAS_LENGTH), deadline_ms, kind)
+        self.size += 1
+
+    def pop_due(self, now):
+        """取出所有到点的记录"""
+        due_slot = int(now / self.resolution)
+        while self.cursor <= due_slot:
+            bucket = self.slots.pop(self.cursor, None)
+            self.cursor += 1
+            if bucket is None:
+                continue
+            self.size -= len(bucket) // ENTRY.size
+            for alias, deadline_ms, kind in ENTRY.iter_unpack(bucket):
+                yield alias.rstrip(b" ").decode("ascii"), deadline_ms, kind
+
+    def memory_bytes(self):
+        return sum(len(b) for b in self.slots.values())
+
+
+class WindowStats:
+    """一个时间窗口内的读延迟与过期情况"""
+
+    def __init__(self, index):
+        self.index = index
+        self.live = LatencyHistogram()
+        self.expired = LatencyHistogram()
+        self.premature = 0  # 到期前就 404
+        self.stale = 0  # 到期后仍 302
+        self.errors = 0  # 探测请求失败（超时、连接错误、其他状态码）
+
+    def row(self, window, expired_total, tracked, tracked_mb):
+        live, expired = self.live.summary(), self.expired.summary()
+        return {
+            "elapsed_s": (self.index + 1) * window,
+            "expired_total": expired_total,
+            "tracked": tracked,
+            "tracked_mb": round(tracked_mb, 2),
+            "live_reads": live["count"],
+            "live_p50_ms": live["p50_ms"],
+            "live_p99_ms": live["p99_ms"],
+            "expired_reads": expired["count"],
+            "expired_p50_ms": expired["p50_ms"],
+            "expired_p99_ms": expired["p99_ms"],
+            "premature_404": self.premature,
+            "stale_302": self.stale,
+            "probe_errors": self.errors,
+        }
+
+
+class ExpiryTest:
+    def __init__(self, args):
+        self.args = args
+        self.ttls = [int(t) for t in args.ttls.split(",") if t.strip()]
+        self.rng = random.Random(args.seed)
+        self.wheel = TimingWheel(args.resolution)
+        self.client = None
+        self.start = 0.0
+        self.created = 0
+        self.create_errors = 0
+        self.untracked = 0
+        self.expired_total = 0  # 已确认 404 的条数
+        self.gave_up = 0  # 重探次数用完仍未 404
+        self.create_skipped = 0  # 在途创建达到 --max-probes 时没有发出的创建
+        self.missed_before = 0  # 到期前探测一直失败，到期前没能确认
+        self.convergence = LatencyHistogram()  # 到期 -> 第一次 404（毫秒）
+        self.windows = []
+        self.rows = []
+        self.probe_slots = asyncio.Semaphore(args.max_probes)
+
+    def now(self):
+        return time.monotonic() - self.start
+
+    def window(self):
+        index = int(self.now() // self.args.window)
+        while len(self.windows) <= index:
+            self.windows.append(WindowStats(len(self.windows)))
+        return self.windows[index]
+
+    async def create_one(self):
+        ttl = self.rng.choice(self.ttls)
+        sent = self.now()
+        try:
+            resp = await self.client.post_json("/create", {"url": random_url(self.rng), "expire": ttl}, name="/create")
+            alias = resp.json().get("alias") if resp.status == 200 else None
+        except Exception:
+            alias = None
+        received = self.now()
+        if not alias:
+            self.create_errors += 1
+            return
+        self.created += 1
+        if self.wheel.size >= self.args.max_tracked:
+            self.untracked += 1
+            return
+        # 服务端用收到请求时的 UtcNow + expire 计算到期时间，落在 [sent, received] 之间
+        margin = self.args.margin
+        self.wheel.schedule(sent + ttl - margin, alias, int((sent + ttl) * 1000), PROBE_BEFORE)
+        self.wheel.schedule(received + ttl + margin, alias, int((received + ttl) * 1000), PROBE_AFTER)
+
+    async def probe(self, alias, deadline_ms, kind):
+        async with self.probe_slots:
+            start = time.perf_counter_ns()
+            try:
+                resp = await self.client.get(f"/u/{alias}", name="/u/[expiring]")
+                status = resp.status
+            except Exception:
+                status = 0
+            elapsed_us = (time.perf_counter_ns() - start) // 1000
+        stats = self.window()
+        if status not in (302, 404):
+            # 请求失败不能说明是否过期：计入错误并重探，不从报告里消失
+            stats.errors += 1
+            self.retry(alias, deadline_ms, kind)
+            return
+        if kind == PROBE_BEFORE:
+            stats.live.record(elapsed_us)
+            if status == 404:
+                stats.premature += 1
+            return
+        stats.expired.record(elapsed_us)
+        if status == 404:
+            self.expired_total += 1
+            self.convergence.record(max(0, int(self.now() * 1000) - deadline_ms) * 1000)
+        else:
+            stats.stale += 1
+            self.retry(alias, deadline_ms, kind)
+
+    def retry(self, alias, deadline_ms, kind):
+        """到期后的探测 --retry-interval 秒后重探，计入重探次数；
+        到期前的探测要赶在到期前重探（间隔取剩余时间的一半），来不及时放弃"""
+        now = self.now()
+        if kind == PROBE_BEFORE:
+            remaining = deadline_ms / 1000 - now
+            if remaining > 2 * self.args.resolution:
+                at = now + min(self.args.retry_interval, remaining / 2)
+                self.wheel.schedule(at, alias, deadline_ms, PROBE_BEFORE)
+            else:
+                self.missed_before += 1
+        elif kind > self.args.max_retries:
+            self.gave_up += 1
+        else:
+            self.wheel.schedule(now + self.args.retry_interval, alias, deadline_ms, kind + 1)
+
+    async def creator(self, end):
+        interval = 1.0 / self.args.create_rps
+        next_time = self.now()
+        pending = set()
+        while next_time < end:
+            delay = next_time - self.now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(pending) < self.args.max_probes:
+                task = asyncio.ensure_future(self.create_one())
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            else:
+                self.create_skipped += 1
+            next_time += interval
+        if pending:
+            await asyncio.wait(pending)
+
+    async def prober(self, end):
+        tasks = set()
+        while self.now() < end or self.wheel.size or tasks:
+            for entry in self.wheel.pop_due(self.now()):
+                task = asyncio.ensure_future(self.probe(*entry))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.sleep(self.args.resolution)
+
+    async def reporter(self):
+        reported = 0
+        while True:
+            await asyncio.sleep(self.args.window)
+            while reported < len(self.windows) - 1:
+                self.report_window(self.windows[reported])
+                reported += 1
+
+    def report_window(self, stats):
+        row = stats.row(self.args.window, self.expired_total, self.wheel.size, self.wheel.memory_bytes() / 1e6)
+        self.rows.append(row)
+        print(f"  [{row['elapsed_s']:>6.0f}s] 已过期 {row['expired_total']:>9} | 待探测 {row['tracked']:>9} ({row['tracked_mb']}MB) | "
+              f"未过期读 p50 {row['live_p50_ms']:>7.2f} p99 {row['live_p99_ms']:>7.2f}ms | "
+              f"已过期读 p50 {row['expired_p50_ms']:>7.2f} p99 {row['expired_p99_ms']:>7.2f}ms | "
+              f"提前404 {row['premature_404']} 过期后302 {row['stale_302']} 探测失败 {row['probe_errors']}")
+
+    async def run(self):
+        args = self.args
+        self.client = HttpClient(args.base_url, max_connections=args.connections, timeout=args.timeout)
+        self.start = time.monotonic()
+        end = args.duration
+        print(f"🚀 过期验证 {args.base_url}: 创建 {args.create_rps}/s, expire {self.ttls}s, "
+              f"创建 {args.duration}s 后继续探测到所有 alias 到期")
+        reporter = asyncio.ensure_future(self.reporter())
+        try:
+            await asyncio.gather(self.creator(end), self.prober(end))
+        finally:
+            reporter.cancel()
+            await self.client.close()
+        for stats in self.windows[len(self.rows):]:
+            self.report_window(stats)
+        self.print_result()
+        if args.csv:
+            self.write_csv(args.csv)
+
+    def print_result(self):
+        c = self.convergence.summary()
+        print(f"\n🎉 创建 {self.created} 条（失败 {self.create_errors}，在途满载跳过 {self.create_skipped}，"
+              f"未跟踪 {self.untracked}），确认过期 {self.expired_total} 条，重探后仍未过期或一直探测失败 {self.gave_up} 条，"
+              f"到期前探测一直失败 {self.missed_before} 条")
+        errors = sum(w.errors for w in self.windows)
+        if errors:
+            print(f"⚠️  探测请求失败 {errors} 次（超时、连接错误或 302/404 以外的状态码），已重探")
+        print(f"⏱️  过期收敛延迟（到期 -> 第一次 404）: p50 {c['p50_ms']:.0f}ms p99 {c['p99_ms']:.0f}ms "
+              f"max {c['max_ms']:.0f}ms（探测间隔 {self.args.margin}s / {self.args.retry_interval}s，精度受其限制）")
+        premature = sum(w.premature for w in self.windows)
+        if premature:
+            print(f"⚠️  {premature} 条在到期前 {self.args.margin}s 就返回 404，检查服务端与压测机的时钟")
+
+    def write_csv(self, prefix):
+        path = f"{prefix}_expiry_windows.csv"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0].keys()) if self.rows else ["elapsed_s"])
+            writer.writeheader()
+            writer.writerows(self.rows)
+        print(f"📄 时间窗口统计已写入 {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="短链过期验证压测")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--create-rps", type=float, default=100, help="每秒创建的带 expire 短链数")
+    parser.add_argument("--ttls", default="10,60", help="逗号分隔的 expire 秒数，每次随机选一个")
+    parser.add_argument("--duration", type=float, default=120, help="持续创建的秒数")
+    parser.add_argument("--margin", type=float, default=1.0, help="到期前 / 后多少秒探测")
+    parser.add_argument("--retry-interval", type=float, default=1.0, help="到期后仍可访问时的重探间隔（秒）")
+    parser.add_argument("--max-retries", type=int, default=30, help="到期后最多重探次数")
+    parser.add_argument("--max-tracked", type=int, default=2000000, help="最多同时跟踪的探测数，超过后新建的不再跟踪")
+    parser.add_argument("--resolution", type=float, default=0.1, help="时间轮精度（秒）")
+    parser.add_argument("--window", type=float, default=10, help="统计窗口（秒）")
+    parser.add_argument("--max-probes", type=int, default=500, help="同时在途的请求上限")
+    parser.add_argument("--connections", type=int, default=200, help="连接池上限")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_expiry_windows.csv")
+    asyncio.run(ExpiryTest(parser.parse_args()).run())
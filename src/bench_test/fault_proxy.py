@@ -0,0 +1,607 @@
+"""
+故障注入代理：放在压测端与服务之间，或服务与 Redis / MySQL 之间，按时间表注入故障，量化降级与恢复
+
+v3 的 /health 能报告依赖状态，但依赖变慢、抖动、断连时吞吐和延迟会怎样、多久恢复，之前没有办法测。
+这里是一个 asyncio TCP 代理，按字节转发，不解析协议，所以对 HTTP、Redis、MySQL 都适用：
+  latency=MS        每个数据块额外延迟（默认只加在上游 -> 客户端方向，即响应变慢；dir=up / both 改方向）
+  jitter=MS         在 latency 之上再加 [0, jitter] 的均匀随机延迟；同一方向的数据仍然按顺序送达
+  bandwidth=RATE    每个方向所有连接共享的带宽上限，字节/秒，可带 k / m 后缀，如 64k
+  reset[=P]         窗口开始时用 RST 断开所有已有连接，窗口内新连接以概率 P（默认 1）被立即 RST
+  blackhole         窗口内读到的数据全部丢弃、新连接不连上游，窗口结束时断开丢过数据的连接（协议状态已乱）
+  name=NAME         窗口名，默认按故障类型和序号命名
+  repeat=N,every=S  同一窗口每 S 秒重复一次，共 N 次，模拟依赖抖动（flapping）
+时间表（--fault，可重复）：开始秒数+持续秒数:参数，时间可带 s / m / h 后缀，如
+  --fault 60+30:latency=200,jitter=50 --fault 120+10:blackhole --fault 150+2m:reset=0.2,repeat=5,every=30
+同时生效的多个窗口：延迟、抖动、RST 概率取最大值，带宽取最小值。
+
+故障窗口与压测指标对齐：
+  - 指定 --load-url 时在同一进程内以 --load-rps 开环发压（open_loop.py 的驱动），到达过程在整个压测期间不中断，
+    请求按计划发送时刻（与延迟的起点相同）每 --slice 秒一行时间线（吞吐只算成功的请求），每行标上这段时间生效的故障窗口，
+    黑洞里超时的请求记在发出时的窗口里；切片要等 --timeout 秒、其中的请求都结束后才输出。
+    结束时对每个窗口输出：窗口前基线、窗口内、窗口后（到下一个窗口开始为止）的吞吐 / 错误率 / p99，以及恢复时间
+    （窗口结束后第一次连续 --recover-slices 个切片回到基线 --recover-tolerance / --recover-tolerance-ms 以内的时刻）
+  - --health-url 与发压并行、每个切片探测一次 /health，最近一次的状态码写进时间线（超时记 0）
+  - --events-file 把窗口开始 / 结束写成 JSONL（unix 时间），可以和 locust / scenario.py 的时间线对照
+  - --metrics-port 时请求指标的 phase 标签为当前故障窗口（无故障为 baseline，见 metrics_exporter.py）
+
+在 Redis 前面插代理：宿主机上运行代理，docker-compose 里把应用的 Redis__ConnectionString 改成
+host.docker.internal:16379（并加 extra_hosts: "host.docker.internal:host-gateway"），
+MySQL 同理改 ConnectionStrings__DefaultConnection 的 Server / Port。
+
+# 代理 Redis，同时压 nginx，测 Redis 变慢和断连时回退到 GetUrlByAliasAsync（MySQL）的降级与恢复：
+# python fault_proxy.py --listen 16379 --upstream 127.0.0.1:6379 --fault 60+30:latency=50,jitter=20 \
+#     --fault 150+20:reset --fault 240+15:blackhole --load-url http://localhost:10086 --load-rps 3000 \
+#     --health-url http://localhost:8081 --csv report/redis_faults
+# 代理服务本身（压测端 -> 代理 -> 服务），只转发不发压：
+# python fault_proxy.py --listen 20086 --upstream 127.0.0.1:10086 --fault 30+10:bandwidth=256k --duration 120
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import struct
+import time
+
+import key_dist
+import metrics_exporter
+import payload_pool
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from latency_hist import LatencyHistogram
+from open_loop import OpenLoopDriver
+from scenario import format_duration, parse_duration
+
+CHUNK = 65536
+QUEUE_CHUNKS = 256  # 每个方向排队等待送出的数据块上限，满了就不再从对端读（背压）
+TICK = 0.05
+BASELINE = "baseline"
+FAULT_KINDS = ("latency", "jitter", "bandwidth", "reset", "blackhole")
+TIMELINE_FIELDS = ["unix", "elapsed_s", "fault", "health", "sent", "achieved_rps", "error_rate", "p50_ms", "p99_ms"]
+
+
+def parse_rate(text):
+    text = str(text).strip().lower()
+    scale = {"k": 1024, "m": 1024 * 1024}.get(text[-1:], 1)
+    return float(text[:-1] if scale != 1 else text) * scale
+
+
+class FaultWindow:
+    def __init__(self, name, start, duration, params):
+        self.name = name
+        self.start = start
+        self.end = start + duration
+        self.params = params
+
+    def active(self, t):
+        return self.start <= t < self.end
+
+    def describe(self):
+        params = ",".join(f"{k}={v:g}" if isinstance(v, float) else k for k, v in self.params.items())
+        return f"{self.name} [{self.start:g}s, {self.end:g}s) {params}"
+
+
+def parse_fault(text, index):
+    """START+DURATION:k=v,... -> [FaultWindow, ...]（repeat 展开为多个窗口）"""
+    timing, _, params_text = text.partition(":")
+    start_text, plus, duration_text = timing.partition("+")
+    if not plus or not params_text:
+        raise ValueError(f"无效的故障窗口: {text}（格式 开始+持续:参数）")
+    start, duration = parse_duration(start_text), parse_duration(duration_text)
+    params, name, repeat, every = {}, None, 1, 0.0
+    for item in params_text.split(","):
+        key, sep, value = item.strip().partition("=")
+        if key == "name":
+            name = value
+        elif key == "repeat":
+            repeat = int(value)
+        elif key == "every":
+            every = parse_duration(value)
+        elif key in ("latency", "jitter"):
+            params[key] = float(value)
+        elif key == "bandwidth":
+            params[key] = parse_rate(value)
+        elif key == "reset":
+            params[key] = float(value) if sep else 1.0
+        elif key == "blackhole":
+            params[key] = 1.0
+        elif key == "dir":
+            if value not in ("up", "down", "both"):
+                raise ValueError(f"dir 只能是 up / down / both: {text}")
+            params[key] = value
+        else:
+            raise ValueError(f"未知的故障参数 {key}: {text}")
+    if not any(k in params for k in FAULT_KINDS):
+        raise ValueError(f"故障窗口没有指定故障: {text}")
+    if repeat > 1 and every < duration:
+        raise ValueError(f"every 不能小于持续时间: {text}")
+    name = name or f"{next(k for k in FAULT_KINDS if k in params)}#{index + 1}"
+    return [FaultWindow(name if repeat == 1 else f"{name}.{i + 1}", start + i * every, duration, params)
+            for i in range(repeat)]
+
+
+class FaultState:
+    """当前生效的故障（多个窗口合并）"""
+
+    def __init__(self, windows=()):
+        self.names = [w.name for w in windows]
+        self.latency = {"up": 0.0, "down": 0.0}
+        self.jitter = {"up": 0.0, "down": 0.0}
+        self.bandwidth = 0.0
+        self.reset = 0.0
+        self.blackhole = False
+        for w in windows:
+            p = w.params
+            dirs = ("up", "down") if p.get("dir") == "both" else (p.get("dir", "down"),)
+            for d in dirs:
+                self.latency[d] = max(self.latency[d], p.get("latency", 0.0) / 1000)
+                self.jitter[d] = max(self.jitter[d], p.get("jitter", 0.0) / 1000)
+            if p.get("bandwidth"):
+                self.bandwidth = min(self.bandwidth, p["bandwidth"]) if self.bandwidth else p["bandwidth"]
+            self.reset = max(self.reset, p.get("reset", 0.0))
+            self.blackhole = self.blackhole or "blackhole" in p
+
+    @property
+    def label(self):
+        return "+".join(self.names) or BASELINE
+
+    def delay(self, direction, rng):
+        jitter = self.jitter[direction]
+        return self.latency[direction] + (rng.random() * jitter if jitter else 0.0)
+
+
+class Throttle:
+    """一个方向所有连接共享的令牌桶"""
+
+    def __init__(self):
+        self.available_at = 0.0
+
+    async def wait(self, size, rate, loop):
+        now = loop.time()
+        self.available_at = max(now, self.available_at) + size / rate
+        await asyncio.sleep(self.available_at - now)
+
+
+def abort_with_rst(writer):
+    """SO_LINGER=0 后关闭，对端收到 RST 而不是 FIN"""
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+    writer.transport.abort()
+
+
+class ProxyConnection:
+    def __init__(self, proxy, client_reader, client_writer):
+        self.proxy = proxy
+        self.client_reader = client_reader
+        self.client_writer = client_writer
+        self.upstream_writer = None
+        self.tainted = False  # 黑洞期间丢过数据
+        self.tasks = []
+
+    async def run(self):
+        proxy = self.proxy
+        try:
+            while proxy.state.blackhole:
+                # 黑洞：不连上游，客户端发来的数据直接丢弃；MySQL 这类服务端先发包的协议客户端会一直等，定时看窗口是否结束
+                try:
+                    data = await asyncio.wait_for(self.client_reader.read(CHUNK), TICK * 4)
+                except asyncio.TimeoutError:
+                    continue
+                if not data:
+                    return
+                self.tainted = True
+                proxy.stats["dropped_bytes"] += len(data)
+            try:
+                upstream_reader, self.upstream_writer = await asyncio.open_connection(*proxy.upstream)
+            except OSError:
+                proxy.stats["upstream_errors"] += 1
+                return
+            self.tasks = [asyncio.ensure_future(self.pipe(self.client_reader, self.upstream_writer, "up")),
+                          asyncio.ensure_future(self.pipe(upstream_reader, self.client_writer, "down"))]
+            await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.close()
+
+    async def pipe(self, reader, writer, direction):
+        """读端按故障状态给每个数据块定送达时间，写端按时间和带宽依次送出，保持顺序且不串行等待延迟"""
+        proxy = self.proxy
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_CHUNKS)
+
+        async def send():
+            while True:
+                deliver_at, chunk = await queue.get()
+                if chunk is None:
+                    if writer.can_write_eof():
+                        writer.write_eof()
+                    return
+                wait = deliver_at - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if proxy.state.bandwidth:
+                    await proxy.throttles[direction].wait(len(chunk), proxy.state.bandwidth, loop)
+                writer.write(chunk)
+                await writer.drain()
+                proxy.stats[f"{direction}_bytes"] += len(chunk)
+
+        sender = asyncio.ensure_future(send())
+        last_at = 0.0
+        try:
+            while True:
+                chunk = await reader.read(CHUNK)
+                state = proxy.state
+                if not chunk:
+                    await queue.put((0.0, None))
+                    break
+                if state.blackhole:
+                    self.tainted = True
+                    proxy.stats["dropped_bytes"] += len(chunk)
+                    continue
+                # 不早于前一块，保证同一方向按顺序送达
+                last_at = max(loop.time() + state.delay(direction, proxy.rng), last_at)
+                await queue.put((last_at, chunk))
+            await sender
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            sender.cancel()
+
+    def reset(self):
+        self.proxy.stats["resets"] += 1
+        for writer in (self.client_writer, self.upstream_writer):
+            if writer is not None:
+                abort_with_rst(writer)
+        for task in self.tasks:
+            task.cancel()
+
+    def close(self):
+        for writer in (self.client_writer, self.upstream_writer):
+            if writer is not None and not writer.transport.is_closing():
+                writer.transport.abort()
+        self.proxy.connections.discard(self)
+
+
+class FaultProxy:
+    def __init__(self, listen, upstream, windows, seed=None, events_file=None):
+        self.listen = listen
+        self.upstream = upstream
+        self.windows = sorted(windows, key=lambda w: w.start)
+        self.rng = random.Random(seed)
+        self.state = FaultState()
+        self.connections = set()
+        self.throttles = {"up": Throttle(), "down": Throttle()}
+        self.stats = dict.fromkeys(("connections", "up_bytes", "down_bytes", "dropped_bytes", "resets",
+                                    "upstream_errors"), 0)
+        self.events_file = events_file
+        self.on_change = []  # 故障状态变化时回调 (old, new)
+        self.started = None
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.accept, *self.listen)
+        self.started = time.time()
+        asyncio.ensure_future(self.schedule())
+        print(f"🧨 故障代理 {self.listen[0]}:{self.listen[1]} -> {self.upstream[0]}:{self.upstream[1]}")
+        for window in self.windows:
+            print(f"   {window.describe()}")
+
+    async def accept(self, reader, writer):
+        self.stats["connections"] += 1
+        if self.state.reset and self.rng.random() < self.state.reset:
+            self.stats["resets"] += 1
+            abort_with_rst(writer)
+            return
+        conn = ProxyConnection(self, reader, writer)
+        self.connections.add(conn)
+        try:
+            await conn.run()
+        except asyncio.CancelledError:
+            pass  # 退出时事件循环取消仍在转发的连接
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    async def schedule(self):
+        while True:
+            t = self.elapsed()
+            active = [w for w in self.windows if w.active(t)]
+            if [w.name for w in active] != self.state.names:
+                self.transition(FaultState(active))
+            await asyncio.sleep(TICK)
+
+    def transition(self, new):
+        old, self.state = self.state, new
+        started = set(new.names) - set(old.names)
+        ended = set(old.names) - set(new.names)
+        now = time.time()
+        for name in sorted(ended):
+            print(f"✅ [{format_duration(now - self.started)}] 故障结束 {name}")
+        for name in sorted(started):
+            window = next(w for w in self.windows if w.name == name)
+            print(f"💥 [{format_duration(now - self.started)}] 故障开始 {window.describe()}")
+        if new.reset and not old.reset:
+            for conn in list(self.connections):
+                conn.reset()
+        if old.blackhole and not new.blackhole:
+            for conn in [c for c in self.connections if c.tainted]:
+                conn.reset()
+        if self.events_file:
+            for event, names in (("end", ended), ("start", started)):
+                for name in sorted(names):
+                    window = next(w for w in self.windows if w.name == name)
+                    self.events_file.write(json.dumps({"unix": round(now, 3), "event": event, "fault": name,
+                                                       "params": window.params}) + "\n")
+            self.events_file.flush()
+        for callback in self.on_change:
+            callback(old, new)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for conn in list(self.connections):
+            conn.close()
+
+    def print_stats(self):
+        s = self.stats
+        print(f"\n🧨 代理统计: 连接 {s['connections']} | 上行 {s['up_bytes'] / 1048576:.1f}MB "
+              f"下行 {s['down_bytes'] / 1048576:.1f}MB | 丢弃 {s['dropped_bytes'] / 1048576:.2f}MB | "
+              f"RST {s['resets']} | 上游连接失败 {s['upstream_errors']}")
+
+
+# ---------------------------------------------------------------- 同进程发压与窗口对齐
+
+class SliceRow:
+    def __init__(self, start_unix, unix, elapsed, fault, result, health):
+        lat = LatencyHistogram()
+        for values in result.latencies.values():
+            for value in values:
+                lat.record(int(value * 1000))
+        summary = lat.summary()
+        self.start_unix = start_unix
+        self.unix = unix
+        self.elapsed = elapsed
+        self.fault = fault
+        self.health = health
+        self.sent = result.sent + result.dropped
+        # 按发送时刻分桶，输出时切片里的请求都已结束；提前停止时未结束的不计入分母
+        self.finished = result.completed + result.dropped
+        self.achieved_rps = result.succeeded / result.duration if result.duration else 0.0
+        self.error_rate = result.error_count / self.finished if self.finished else 0.0
+        self.p50_ms = summary["p50_ms"]
+        self.p99_ms = summary["p99_ms"]
+        self.hist = lat
+
+    def to_dict(self):
+        return {"unix": round(self.unix, 3), "elapsed_s": round(self.elapsed, 1), "fault": self.fault,
+                "health": self.health, "sent": self.sent, "achieved_rps": round(self.achieved_rps, 1),
+                "error_rate": round(self.error_rate * 100, 3), "p50_ms": round(self.p50_ms, 2),
+                "p99_ms": round(self.p99_ms, 2)}
+
+
+def merge_rows(rows):
+    if not rows:
+        return None
+    hist = LatencyHistogram()
+    for row in rows:
+        hist.merge(row.hist)
+    finished = sum(r.finished for r in rows)
+    summary = hist.summary()
+    return {"achieved_rps": round(sum(r.achieved_rps for r in rows) / len(rows), 1),
+            "error_rate": round(sum(r.error_rate * r.finished for r in rows) / finished * 100, 3) if finished else 0.0,
+            "p50_ms": round(summary["p50_ms"], 2), "p99_ms": round(summary["p99_ms"], 2)}
+
+
+def window_report(window, rows, started, args, next_start=None):
+    """窗口前基线 / 窗口内 / 窗口后（到 next_start 为止），以及恢复时间"""
+    start, end = started + window.start, started + window.end
+    limit = started + next_start if next_start is not None else float("inf")
+    before = [r for r in rows if start - args.baseline <= r.start_unix and r.unix <= start and r.fault == BASELINE]
+    during = [r for r in rows if r.unix > start and r.start_unix < end]  # 与窗口有重叠的切片
+    after = [r for r in rows if r.start_unix >= end and r.unix <= limit and r.fault == BASELINE]
+    base = merge_rows(before)
+    recovery = None
+    if base:
+        tol = args.recover_tolerance
+        p99_limit = max(base["p99_ms"] * (1 + tol), base["p99_ms"] + args.recover_tolerance_ms)
+
+        def ok(row):
+            return row.achieved_rps >= base["achieved_rps"] * (1 - tol) and row.p99_ms <= p99_limit and \
+                row.error_rate * 100 <= base["error_rate"] + tol
+
+        run = 0
+        for i, row in enumerate(after):
+            run = run + 1 if ok(row) else 0
+            if run >= args.recover_slices:
+                recovery = round(after[i - run + 1].unix - end, 1)
+                break
+    return {"fault": window.name, "start_s": window.start, "end_s": window.end, "params": window.params,
+            "baseline": base, "during": merge_rows(during),
+            "after": merge_rows(after[:max(1, int(args.baseline / args.slice))]), "recovery_s": recovery}
+
+
+def print_window_reports(reports):
+    if not reports:
+        return
+    print(f"\n{'故障窗口':<20}{'':<6}{'RPS':>10}{'错误%':>9}{'p50':>9}{'p99':>10}  (ms)")
+    for r in reports:
+        for label, key in (("基线", "baseline"), ("窗口内", "during"), ("窗口后", "after")):
+            s = r[key]
+            name = r["fault"] if key == "baseline" else ""
+            if s is None:
+                print(f"{name:<20}{label:<6}{'-':>10}")
+                continue
+            print(f"{name:<20}{label:<6}{s['achieved_rps']:>10}{s['error_rate']:>9}{s['p50_ms']:>9}{s['p99_ms']:>10}")
+        recovery = "未恢复" if r["recovery_s"] is None else f"{r['recovery_s']}s"
+        print(f"{'':<20}恢复时间 {recovery}")
+
+
+async def probe_health(health, state, interval):
+    """与发压并行，每 interval 秒探测一次 /health，不占用发压的时间"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        try:
+            state["status"] = (await health.get("/health", name="/health")).status
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            state["status"] = 0
+        await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+
+async def run_load(proxy, args, metrics=None):
+    """按发送时刻分桶：rotate() 出来的切片先挂起，等 timeout 秒、其中的请求都结束后再输出"""
+    client = HttpClient(args.load_url, max_connections=args.connections, timeout=args.timeout, metrics=metrics)
+    health = HttpClient(args.health_url, max_connections=1, timeout=min(args.timeout, args.slice)) \
+        if args.health_url else None
+    payloads = payload_pool.pool_from_args(args, seed=args.seed)
+    driver = OpenLoopDriver(client, key_dist.get_selector(args.key_dist), AliasStore(args.alias_file),
+                            args.max_outstanding, args.seed, payloads=payloads)
+    loop = asyncio.get_running_loop()
+    rows = []
+    timeline = None
+    if args.csv:
+        os.makedirs(os.path.dirname(os.path.abspath(args.csv)), exist_ok=True)
+        timeline_file = open(f"{args.csv}_timeline.csv", "w", newline="", encoding="utf-8", buffering=1)
+        timeline = csv.DictWriter(timeline_file, fieldnames=TIMELINE_FIELDS)
+        timeline.writeheader()
+    health_state = {"status": ""}
+    prober = loop.create_task(probe_health(health, health_state, args.slice)) if health is not None else None
+    pending = []  # [(可以输出的时刻, SliceRow 参数), ...]，切片里还有请求没结束
+
+    def emit(item):
+        row = SliceRow(*item[1])
+        rows.append(row)
+        if timeline is not None:
+            timeline.writerow(row.to_dict())
+        print(f"  [{format_duration(row.elapsed)}] {row.fault:<16} RPS {row.achieved_rps:>8.1f} | "
+              f"错误 {row.error_rate * 100:>6.2f}% | p50 {row.p50_ms:>8.2f}ms p99 {row.p99_ms:>8.2f}ms"
+              + (f" | health {row.health}" if health is not None else ""))
+
+    # 到达过程在整个压测期间不中断，请求的结果记入计划发送时刻所在的切片
+    driver.start(args.load_rps, args.arrival, by_send_time=True)
+    deadline = loop.time() + args.duration
+    next_slice = loop.time()
+    start_unix = time.time()
+    fault = proxy.state.label
+    interrupted = False
+    try:
+        while next_slice < deadline:
+            next_slice += args.slice
+            await asyncio.sleep(max(0.0, next_slice - loop.time()))
+            result = driver.rotate()
+            # 切片跨过窗口边界时记为故障（开始时的优先），不计入基线
+            if fault == BASELINE:
+                fault = proxy.state.label
+            unix = time.time()
+            pending.append((loop.time() + args.timeout + 1,
+                            (start_unix, unix, proxy.elapsed(), fault, result, health_state["status"])))
+            start_unix, fault = unix, proxy.state.label
+            while pending and pending[0][0] <= loop.time():
+                emit(pending.pop(0))
+    except asyncio.CancelledError:
+        interrupted = True
+        print("\n⏹️  已中断")
+    finally:
+        # 等最后几个切片的请求结束（最多 timeout + 1 秒）；结束后才发出的请求不统计
+        await driver.stop(drain=not interrupted)
+        for item in pending:
+            emit(item)
+        if prober is not None:
+            prober.cancel()
+            await asyncio.gather(prober, return_exceptions=True)
+        await client.close()
+        if health is not None:
+            await health.close()
+        if timeline is not None:
+            timeline_file.close()
+    return rows
+
+
+async def main_async(args):
+    windows = [w for i, text in enumerate(args.fault or []) for w in parse_fault(text, i)]
+    names = [w.name for w in windows]
+    if len(set(names)) != len(names):
+        raise ValueError("故障窗口名重复，请用 name= 区分")
+    listen_host, _, listen_port = args.listen.rpartition(":")
+    upstream_host, _, upstream_port = args.upstream.rpartition(":")
+    events_file = open(args.events_file, "a", encoding="utf-8") if args.events_file else None
+    proxy = FaultProxy((listen_host or "0.0.0.0", int(listen_port)),
+                       (upstream_host or "127.0.0.1", int(upstream_port)), windows, args.seed, events_file)
+    metrics = metrics_exporter.exporter_from_args(args, "fault_proxy")
+    if metrics:
+        metrics.set_phase(BASELINE)
+        metrics.set_gauge("fault_connections", lambda: len(proxy.connections))
+        proxy.on_change.append(lambda old, new: metrics.set_phase(new.label))
+    if not args.duration:
+        args.duration = (max(w.end for w in windows) if windows else 0) + args.baseline * 2
+    await proxy.start()
+    rows = []
+    try:
+        if args.load_url:
+            rows = await run_load(proxy, args, metrics)
+        else:
+            await asyncio.sleep(args.duration)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await proxy.close()
+        if metrics:
+            metrics.close()
+        if events_file:
+            events_file.close()
+    proxy.print_stats()
+    if rows:
+        starts = sorted(w.start for w in proxy.windows)
+        reports = [window_report(w, rows, proxy.started, args, next((t for t in starts if t >= w.end), None))
+                   for w in proxy.windows]
+        print_window_reports(reports)
+        if args.csv:
+            with open(f"{args.csv}_faults.json", "w", encoding="utf-8") as f:
+                json.dump({"upstream": args.upstream, "load_url": args.load_url, "load_rps": args.load_rps,
+                           "started_unix": proxy.started, "windows": reports}, f, indent=2, ensure_ascii=False)
+            print(f"📄 结果已写入 {args.csv}_timeline.csv 和 {args.csv}_faults.json")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="按时间表注入延迟 / 带宽限制 / RST / 黑洞的 TCP 代理")
+    parser.add_argument("--listen", required=True, help="监听地址 [host:]port")
+    parser.add_argument("--upstream", required=True, help="上游地址 host:port（服务、Redis 或 MySQL）")
+    parser.add_argument("--fault", action="append", help="故障窗口 开始+持续:参数，可重复")
+    parser.add_argument("--duration", type=float, default=0, help="总秒数，默认到最后一个窗口结束后再留 2 个基线时长")
+    parser.add_argument("--events-file", default="", help="把窗口开始 / 结束追加写入 JSONL 文件")
+    parser.add_argument("--seed", type=int, default=None, help="抖动与 RST 概率的随机种子，同时用于发压")
+    parser.add_argument("--load-url", default="", help="同进程内开环发压的目标，不指定则只做代理")
+    parser.add_argument("--load-rps", type=int, default=1000, help="发压到达率")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="poisson", help="到达模型")
+    parser.add_argument("--slice", type=float, default=1.0, help="时间线切片秒数")
+    parser.add_argument("--baseline", type=float, default=20, help="窗口前取多少秒作为基线")
+    parser.add_argument("--recover-tolerance", type=float, default=0.1,
+                        help="恢复判定：吞吐、p99 回到基线的该比例以内，错误率不超过基线加该百分点")
+    parser.add_argument("--recover-tolerance-ms", type=float, default=2.0,
+                        help="恢复判定：p99 高于基线的绝对容差（毫秒），与比例容差取较宽的")
+    parser.add_argument("--recover-slices", type=int, default=3, help="连续多少个切片回到基线才算恢复")
+    parser.add_argument("--health-url", default="", help="每个切片探测一次 <url>/health，如 http://localhost:8081")
+    parser.add_argument("--connections", type=int, default=1000, help="发压连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="未完成请求上限，超过的计为丢弃")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="二进制 alias 文件")
+    parser.add_argument("--key-dist", default=key_dist.DEFAULT_KEY_DIST, help="读请求 key 分布")
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_timeline.csv 和 <前缀>_faults.json")
+    metrics_exporter.add_arguments(parser)
+    payload_pool.add_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main_async(build_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,259 @@
+"""
+压测端自身开销剖析：压测进程的 CPU 花在哪里，以及调度是否跟得上
+
+压测结果里看不到 Python 侧的开销（每个请求拼随机字符串、v1_test.py 里持锁发请求、逐请求 print 之类），
+压测端先到瓶颈时测到的其实是客户端。开启后：
+  - CPU 采样：setitimer(ITIMER_PROF) 按进程 CPU 时间定时触发 SIGPROF，在信号处理函数里看当前调用栈，
+    不占 CPU 时不会采样，所以样本比例就是 CPU 时间比例。每个样本按调用栈分类：
+      harness    压测脚本自身（locustfile、驱动、key 分布等本目录下的代码，及其调用的 random / json 等）
+      http       HTTP 客户端（async_http.py、geventhttpclient、requests、ssl、socket）
+      scheduler  事件循环 / greenlet 调度（asyncio、gevent hub、selectors）
+      other      其他
+    并按 “任务函数”（被事件循环 / locust 调度执行的那层脚本函数，如 v1_test.py:visit_short_url）汇总
+  - 调度延迟：每隔 --profile-lag-interval 睡一次，实际醒来比预期晚多少（asyncio 事件循环或 gevent hub）
+  - 结束时输出 CPU 占单核的比例、各类占比、调度延迟分位数；CPU 接近单核上限或调度延迟过大时告警：
+    Python 压测进程只能用满一个核，这时再加并发只会让客户端排队，测到的不是服务端
+SIGPROF 只在类 Unix 系统上可用，Windows 上只统计 CPU 占比和调度延迟。
+
+# locust -f v1_test.py --headless -u 500 -r 100 --run-time 1m --host=http://localhost:10086 --profile-harness
+# python open_loop.py --host http://localhost:10086 --rps 5000 --duration 30 --profile-harness
+# python load_engine.py --base-url http://localhost:10086 --concurrency 500 --profile-harness
+"""
+
+import asyncio
+import os
+import signal
+import time
+
+from latency_hist import LatencyHistogram
+
+HARNESS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INTERVAL = 0.005
+DEFAULT_LAG_INTERVAL = 0.05
+CPU_WARN = 0.85  # 占单核比例
+LAG_WARN_MS = 10.0
+CATEGORIES = ("harness", "http", "scheduler", "other")
+CATEGORY_NAMES = {"harness": "压测脚本", "http": "HTTP 客户端", "scheduler": "调度/事件循环", "other": "其他"}
+
+# 按文件路径片段分类；本目录下的 async_http.py 算 HTTP 客户端
+HTTP_MARKERS = ("async_http.py", "geventhttpclient", "urllib3", os.sep + "requests" + os.sep, os.sep + "ssl.py",
+                os.sep + "socket.py", os.sep + "http" + os.sep, os.sep + "locust" + os.sep + "clients.py",
+                os.sep + "locust" + os.sep + "contrib" + os.sep, os.sep + "asyncio" + os.sep + "streams.py",
+                "selector_events.py", "sslproto.py")
+SCHEDULER_MARKERS = (os.sep + "gevent" + os.sep, os.sep + "asyncio" + os.sep, "selectors.py", "uvloop",
+                     os.sep + "locust" + os.sep)
+HARNESS_EXCLUDE = ("async_http.py", "harness_profiler.py")
+
+_file_categories = {}
+
+
+def classify_file(filename):
+    """返回文件所属类别，不属于任何类别（如 random.py）返回 None，继续看调用方"""
+    category = _file_categories.get(filename, "")
+    if category != "":
+        return category
+    if filename.startswith("<"):
+        # <frozen abc>、<string> 之类不是真实路径，不能用 abspath 按当前目录解析成压测脚本
+        category = None
+    elif any(m in filename for m in HTTP_MARKERS):
+        category = "http"
+    elif os.path.dirname(os.path.abspath(filename)) == HARNESS_DIR and \
+            not filename.endswith(HARNESS_EXCLUDE):
+        category = "harness"
+    elif any(m in filename for m in SCHEDULER_MARKERS):
+        category = "scheduler"
+    else:
+        category = None
+    _file_categories[filename] = category
+    return category
+
+
+class HarnessProfiler:
+    def __init__(self, interval=DEFAULT_INTERVAL, lag_interval=DEFAULT_LAG_INTERVAL, cpu_warn=CPU_WARN,
+                 lag_warn_ms=LAG_WARN_MS):
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self.cpu_warn = cpu_warn
+        self.lag_warn_ms = lag_warn_ms
+        self.samples = dict.fromkeys(CATEGORIES, 0)
+        self.tasks = {}  # 任务函数 -> [样本数, 其中 harness 样本数]
+        self.lag = LatencyHistogram()
+        self.sampling = False
+        self.started_wall = self.started_cpu = None
+        self.stopped_wall = self.stopped_cpu = None
+        self._lag_task = None
+
+    def start(self):
+        self.started_wall, self.started_cpu = time.monotonic(), time.process_time()
+        if hasattr(signal, "setitimer"):
+            signal.signal(signal.SIGPROF, self._on_sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            self.sampling = True
+
+    def stop(self):
+        if self.sampling:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        if self._lag_task is not None:
+            if isinstance(self._lag_task, asyncio.Future):
+                self._lag_task.cancel()
+            else:
+                self._lag_task.kill(block=False)  # gevent greenlet
+            self._lag_task = None
+        if self.stopped_wall is None:
+            self.stopped_wall, self.stopped_cpu = time.monotonic(), time.process_time()
+
+    def _on_sample(self, signum, frame):
+        category = None
+        task = None
+        while frame is not None:
+            code = frame.f_code
+            kind = classify_file(code.co_filename)
+            if category is None and kind is not None:
+                category = kind
+            if kind == "harness" and code.co_name != "<module>":
+                task = code
+            elif kind == "scheduler" and task is not None:
+                # 往外遇到事件循环 / locust 调度就停：task 是这次被调度执行的脚本函数（协程或 locust task）
+                break
+            frame = frame.f_back
+        category = category or "other"
+        self.samples[category] += 1
+        if task is not None:
+            key = f"{os.path.basename(task.co_filename)}:{task.co_name}"
+            entry = self.tasks.get(key)
+            if entry is None:
+                entry = self.tasks[key] = [0, 0]
+            entry[0] += 1
+            if category == "harness":
+                entry[1] += 1
+
+    def watch_asyncio(self):
+        """在当前事件循环里测调度延迟，需在协程中调用"""
+        async def monitor():
+            loop = asyncio.get_running_loop()
+            while True:
+                before = loop.time()
+                await asyncio.sleep(self.lag_interval)
+                self.lag.record(int(max(0.0, loop.time() - before - self.lag_interval) * 1_000_000))
+
+        self._lag_task = asyncio.ensure_future(monitor())
+
+    def watch_gevent(self):
+        """locust 的 greenlet 调度延迟"""
+        import gevent
+
+        def monitor():
+            while True:
+                before = time.monotonic()
+                gevent.sleep(self.lag_interval)
+                self.lag.record(int(max(0.0, time.monotonic() - before - self.lag_interval) * 1_000_000))
+
+        self._lag_task = gevent.spawn(monitor)
+
+    def report(self):
+        wall_end = self.stopped_wall if self.stopped_wall is not None else time.monotonic()
+        cpu_end = self.stopped_cpu if self.stopped_cpu is not None else time.process_time()
+        wall = wall_end - self.started_wall
+        cpu = cpu_end - self.started_cpu
+        total = sum(self.samples.values())
+        lag = self.lag.summary()
+        return {
+            "pid": os.getpid(),
+            "wall_s": round(wall, 2),
+            "cpu_s": round(cpu, 2),
+            "cpu_util": round(cpu / wall, 3) if wall > 0 else 0.0,
+            "samples": total,
+            "share": {k: round(v / total, 3) if total else 0.0 for k, v in self.samples.items()},
+            "tasks": {k: [round(n / total, 3), round(h / total, 3)] for k, (n, h) in
+                      sorted(self.tasks.items(), key=lambda kv: -kv[1][0])} if total else {},
+            "lag_p50_ms": round(lag["p50_ms"], 3),
+            "lag_p99_ms": round(lag["p99_ms"], 3),
+            "lag_max_ms": round(lag["max_ms"], 3),
+            "cpu_warn": self.cpu_warn,
+            "lag_warn_ms": self.lag_warn_ms,
+        }
+
+    def print_report(self, title=None):
+        print_report(self.report(), title)
+
+
+def print_report(report, title=None, top=10):
+    title = title or f"压测端自身开销 (pid {report['pid']})"
+    print(f"\n🩺 {title}: 墙钟 {report['wall_s']}s，CPU {report['cpu_s']}s（占单核 {report['cpu_util'] * 100:.1f}%）")
+    if report["samples"]:
+        share = " | ".join(f"{CATEGORY_NAMES[k]} {v * 100:.1f}%" for k, v in report["share"].items())
+        print(f"   CPU 采样 {report['samples']} 次: {share}")
+        print(f"   {'任务函数':<40}{'CPU占比':>10}{'脚本自身':>10}")
+        for name, (total, harness) in list(report["tasks"].items())[:top]:
+            print(f"   {name:<44}{total * 100:>9.1f}%{harness * 100:>9.1f}%")
+    elif not hasattr(signal, "setitimer"):
+        print("   当前系统不支持 SIGPROF 采样，只统计 CPU 占比和调度延迟")
+    print(f"   调度延迟: p50 {report['lag_p50_ms']}ms p99 {report['lag_p99_ms']}ms max {report['lag_max_ms']}ms")
+    reasons = []
+    if report["cpu_util"] >= report["cpu_warn"]:
+        reasons.append(f"CPU 占单核 {report['cpu_util'] * 100:.0f}%")
+    if report["lag_p99_ms"] >= report["lag_warn_ms"]:
+        reasons.append(f"调度延迟 p99 {report['lag_p99_ms']}ms")
+    if reasons:
+        print(f"⚠️  压测端已是瓶颈（{'，'.join(reasons)}）：请求在客户端排队，测到的延迟和吞吐反映的是压测机，"
+              f"请增加 worker 进程 / 压测机后重测")
+
+
+def add_arguments(parser):
+    parser.add_argument("--profile-harness", action="store_true", help="剖析压测端自身的 CPU 开销与调度延迟")
+    parser.add_argument("--profile-interval", type=float, default=DEFAULT_INTERVAL, help="CPU 采样间隔（CPU 秒）")
+    parser.add_argument("--profile-lag-interval", type=float, default=DEFAULT_LAG_INTERVAL,
+                        help="调度延迟探测间隔（秒）")
+
+
+def profiler_from_args(args):
+    if not args.profile_harness:
+        return None
+    return HarnessProfiler(args.profile_interval, args.profile_lag_interval)
+
+
+def install_locust_hooks(events):
+    """注册 --profile-harness；每个 worker 的结果随心跳发给 master，结束时逐个输出"""
+    state = {}
+    worker_reports = {}
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--profile-harness", action="store_true", env_var="LOCUST_PROFILE_HARNESS",
+                            default=False, help="剖析压测端自身的 CPU 开销与调度延迟")
+        parser.add_argument("--profile-interval", type=float, env_var="LOCUST_PROFILE_INTERVAL",
+                            default=DEFAULT_INTERVAL, help="CPU 采样间隔（CPU 秒）")
+
+    @events.init.add_listener
+    def on_init(environment, **kwargs):
+        from locust.runners import MasterRunner
+        options = environment.parsed_options
+        if options is None or not options.profile_harness or isinstance(environment.runner, MasterRunner):
+            return
+        profiler = state["profiler"] = HarnessProfiler(options.profile_interval)
+        profiler.start()
+        profiler.watch_gevent()
+
+    @events.report_to_master.add_listener
+    def on_report_to_master(client_id, data):
+        profiler = state.get("profiler")
+        if profiler is not None:
+            data["harness_profile"] = profiler.report()
+
+    @events.worker_report.add_listener
+    def on_worker_report(client_id, data):
+        if "harness_profile" in data:
+            worker_reports[client_id] = data["harness_profile"]
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        profiler = state.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            profiler.print_report()
+        for client_id, report in sorted(worker_reports.items()):
+            print_report(report, f"worker {client_id}")
+
+    return worker_reports
+
@@ -0,0 +1,235 @@
+"""
+跳转请求的 key 选择分布
+
+支持的分布（--key-dist 参数）：
+  uniform                  均匀分布（默认，与原来的 random.choice 相同）
+  zipf:S                   Zipf(s) 分布，下标越小越热，如 zipf:1.1
+  hotspot:KEYS:TRAFFIC     KEYS 比例的 key 承担 TRAFFIC 比例的流量，如 hotspot:0.2:0.8
+  viral:S:PERIOD           Zipf(s)，但热点中心每 PERIOD 秒漂移一次，模拟突然爆火的链接
+
+Zipf 的累计分布表（CDF）用 array('d') 预先计算并在进程内共享，只在 key 数量增长时追加，
+抽样时用 bisect 在前 n 项上二分，单次 O(log n)；其他分布都是 O(1)。
+CDF 表最多 ZIPF_TABLE_LIMIT 项（8MB），更靠后的排名用积分近似并直接反解，
+千万、上亿条预灌数据也不会占用大量内存。
+
+# locust -f v2_test.py --host=http://localhost:10086 --key-dist zipf:1.1
+# locust -f v1_test.py --host=http://localhost:10086 --key-dist hotspot:0.01:0.9 --key-seed 42
+"""
+
+import bisect
+import math
+import random
+import time
+from array import array
+
+DEFAULT_KEY_DIST = "uniform"
+ZIPF_TABLE_LIMIT = 1 << 20
+
+
+class KeySelector:
+    """按分布返回 [0, n) 内的下标"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed) if seed is not None else random
+
+    def next_index(self, n):
+        raise NotImplementedError
+
+    def pick(self, seq):
+        """从序列中选一个元素，空序列返回 None"""
+        n = len(seq)
+        if n == 0:
+            return None
+        return seq[self.next_index(n)]
+
+
+class UniformSelector(KeySelector):
+    def next_index(self, n):
+        return self.rng.randrange(n)
+
+
+# 同一个 s 的 CDF 在进程内共享：下标 k 的值为 sum(1 / (i + 1) ** s for i in range(k + 1))
+_zipf_cdf_cache = {}
+
+
+def _zipf_cdf(s, n):
+    cdf = _zipf_cdf_cache.get(s)
+    if cdf is None:
+        cdf = _zipf_cdf_cache[s] = array("d")
+    if len(cdf) < n:
+        total = cdf[-1] if cdf else 0.0
+        extra = array("d", bytes(8 * (n - len(cdf))))
+        for i, k in enumerate(range(len(cdf), n)):
+            total += 1.0 / (k + 1) ** s
+            extra[i] = total
+        cdf.extend(extra)
+    return cdf
+
+
+class ZipfSelector(KeySelector):
+    def __init__(self, s=1.0, seed=None):
+        super().__init__(seed)
+        if s <= 0:
+            raise ValueError("zipf 参数 s 必须大于 0")
+        self.s = s
+
+    def _tail_mass(self, a, b):
+        """x^-s 在 [a, b] 上的积分，近似排名 a..b 的总权重"""
+        if self.s == 1:
+            return math.log(b / a)
+        return (b ** (1 - self.s) - a ** (1 - self.s)) / (1 - self.s)
+
+    def next_rank(self, n):
+        if n <= ZIPF_TABLE_LIMIT:
+            cdf = _zipf_cdf(self.s, n)
+            # 只在前 n 项上抽样，key 数量增长时分布依然精确
+            return bisect.bisect_left(cdf, self.rng.random() * cdf[n - 1], 0, n - 1)
+        cdf = _zipf_cdf(self.s, ZIPF_TABLE_LIMIT)
+        head = cdf[-1]
+        a = ZIPF_TABLE_LIMIT + 0.5
+        u = self.rng.random() * (head + self._tail_mass(a, n + 0.5))
+        if u < head:
+            return bisect.bisect_left(cdf, u)
+        # 反解积分得到尾部排名
+        u -= head
+        if self.s == 1:
+            x = a * math.exp(u)
+        else:
+            x = (a ** (1 - self.s) + u * (1 - self.s)) ** (1 / (1 - self.s))
+        return min(n - 1, max(ZIPF_TABLE_LIMIT, int(x - 0.5)))
+
+    def next_index(self, n):
+        return self.next_rank(n)
+
+
+class HotspotSelector(KeySelector):
+    def __init__(self, hot_keys=0.2, hot_traffic=0.8, seed=None):
+        super().__init__(seed)
+        if not (0 < hot_keys <= 1 and 0 <= hot_traffic <= 1):
+            raise ValueError("hotspot 参数必须在 (0, 1] 之间")
+        self.hot_keys = hot_keys
+        self.hot_traffic = hot_traffic
+
+    def next_index(self, n):
+        hot_n = max(1, int(n * self.hot_keys))
+        if hot_n >= n or self.rng.random() < self.hot_traffic:
+            return self.rng.randrange(hot_n)
+        return hot_n + self.rng.randrange(n - hot_n)
+
+
+class ViralSelector(ZipfSelector):
+    """Zipf 热度排名不变，但排名第一的 key 每个周期换一个位置"""
+
+    def __init__(self, s=1.2, period=30.0, seed=None, clock=time.time):
+        super().__init__(s, seed)
+        if period <= 0:
+            raise ValueError("viral 周期必须大于 0")
+        self.period = period
+        self.clock = clock
+        # 所有 worker 用相同 seed 时，同一时刻的热点中心一致
+        self.center_seed = seed if seed is not None else 0
+        self._center_key = None
+        self._center = 0
+
+    def center(self, n):
+        epoch = int(self.clock() // self.period)
+        if self._center_key != (epoch, n):
+            # 只保存 [0, 1) 的比例，key 数量变化时热点位置保持相对不变
+            ratio = random.Random(self.center_seed * 1000003 + epoch).random()
+            self._center_key = (epoch, n)
+            self._center = int(ratio * n)
+        return self._center
+
+    def next_index(self, n):
+        return (self.center(n) + self.next_rank(n)) % n
+
+
+def parse_key_dist(spec, seed=None):
+    """把 --key-dist 字符串解析为 KeySelector"""
+    parts = (spec or DEFAULT_KEY_DIST).strip().lower().split(":")
+    name, params = parts[0], [float(p) for p in parts[1:] if p]
+    if name == "uniform":
+        return UniformSelector(seed)
+    if name == "zipf":
+        return ZipfSelector(*params[:1], seed=seed)
+    if name == "hotspot":
+        return HotspotSelector(*params[:2], seed=seed)
+    if name == "viral":
+        return ViralSelector(*params[:2], seed=seed)
+    raise ValueError(f"未知的 key 分布: {spec}")
+
+
+class PhaseSelector(KeySelector):
+    """场景运行（scenario.py）时用户持有的 selector：阶段切换时替换内部分布，用户不用重新获取"""
+
+    def __init__(self, selector):
+        self.current = selector
+
+    def next_index(self, n):
+        return self.current.next_index(n)
+
+    def pick(self, seq):
+        return self.current.pick(seq)
+
+
+_selectors = {}
+_phase_selector = None
+
+
+def get_selector(spec=DEFAULT_KEY_DIST, seed=None):
+    """同一个进程内相同参数共用一个 selector（及其 CDF 表）"""
+    key = (spec, seed)
+    selector = _selectors.get(key)
+    if selector is None:
+        selector = _selectors[key] = parse_key_dist(spec, seed)
+    return selector
+
+
+def add_arguments(parser):
+    """注册 locust 命令行参数，各 locustfile 共用"""
+    parser.add_argument("--key-dist", type=str, env_var="LOCUST_KEY_DIST", default=DEFAULT_KEY_DIST,
+                        help="跳转 key 分布: uniform | zipf:S | hotspot:KEYS:TRAFFIC | viral:S:PERIOD")
+    parser.add_argument("--key-seed", type=int, env_var="LOCUST_KEY_SEED", default=None,
+                        help="key 分布随机种子，不指定则不固定")
+
+
+def selector_from_environment(environment):
+    global _phase_selector
+    options = environment.parsed_options
+    if options is None:
+        return get_selector()
+    selector = get_selector(options.key_dist, options.key_seed)
+    if not getattr(options, "scenario", ""):
+        return selector
+    if _phase_selector is None:
+        _phase_selector = PhaseSelector(selector)
+    return _phase_selector
+
+
+def switch_phase(spec, seed=None):
+    """场景阶段指定了 key 分布时切换；没有用户持有 PhaseSelector 时不生效"""
+    if _phase_selector is not None:
+        _phase_selector.current = get_selector(spec, seed)
+
+
+if __name__ == "__main__":
+    import argparse
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description="预览 key 分布的热点情况")
+    parser.add_argument("spec", nargs="?", default=DEFAULT_KEY_DIST)
+    parser.add_argument("-n", type=int, default=10000, help="key 数量")
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    selector = parse_key_dist(args.spec, args.seed)
+    start = time.perf_counter()
+    counts = Counter(selector.next_index(args.n) for _ in range(args.samples))
+    elapsed = time.perf_counter() - start
+    top = counts.most_common(10)
+    top_share = sum(c for _, c in top) / args.samples * 100
+    print(f"分布 {args.spec}, {args.n} 个 key, {args.samples} 次抽样, 每次 {elapsed / args.samples * 1e6:.2f}us")
+    print(f"覆盖 key 数: {len(counts)}, 前 10 热点占比: {top_share:.1f}%")
+    for index, count in top:
+        print(f"  #{index}: {count}")
@@ -0,0 +1,282 @@
+"""
+高精度延迟直方图（HDR 风格，对数分桶）
+
+- 以微秒记录，小于 2^SUB_BITS 微秒的值精确记录，更大的值按 2 的幂分段、
+  每段再细分 2^(SUB_BITS-1) 个子桶，相对误差 < 1/512（约 0.2%）
+- 桶数固定（默认 14336 个计数），内存固定，记录一次只是一次数组自增
+- 序列化只保存非零桶（下标差分 + varint + zlib），多个 worker 的结果可以无损合并
+
+记录端在单线程（gevent / asyncio）里使用，不需要加锁。
+
+locustfile 中调用 install_locust_hooks(events) 后：
+  - 分布式运行时 worker 随心跳把增量直方图发给 master，master 合并
+  - 结束时 master（或单机运行）写出 <--csv 前缀>_latency_hist.json 并打印 p99/p99.9/p99.99
+
+# 查看 / 合并多个直方图文件
+# python latency_hist.py show report/20250101_120000/report_latency_hist.json
+# python latency_hist.py merge merged.json worker1.json worker2.json
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import socket
+import zlib
+from array import array
+
+SUB_BITS = 10    # 子桶精度：2^10 = 1024，误差 < 1/512
+MAX_BITS = 36    # 最大可记录 2^36 微秒（约 19 小时），超出的记在最后一个桶
+PERCENTILES = (50, 90, 99, 99.9, 99.99)
+
+
+def _varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos
+        shift += 7
+
+
+class LatencyHistogram:
+    """固定内存的对数分桶直方图，单位微秒"""
+
+    def __init__(self, sub_bits=SUB_BITS, max_bits=MAX_BITS):
+        self.sub_bits = sub_bits
+        self.max_bits = max_bits
+        self.sub_count = 1 << sub_bits
+        self.half_count = self.sub_count >> 1
+        self.bucket_count = self.sub_count + (max_bits - sub_bits) * self.half_count
+        self.counts = array("Q", bytes(8 * self.bucket_count))
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def index_for(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        index = self.sub_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+        return min(index, self.bucket_count - 1)
+
+    def bucket_range(self, index):
+        """桶对应的 [下界, 上界] 微秒"""
+        if index < self.sub_count:
+            return index, index
+        k = index - self.sub_count
+        shift = k // self.half_count + 1
+        top = self.half_count + k % self.half_count
+        return top << shift, ((top + 1) << shift) - 1
+
+    def record(self, value_us, count=1):
+        value = int(value_us)
+        if value < 0:
+            value = 0
+        self.counts[self.index_for(value)] += count
+        if self.total == 0 or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+        self.total += count
+        self.sum_us += value * count
+
+    def record_ms(self, value_ms):
+        self.record(value_ms * 1000)
+
+    def merge(self, other):
+        if (other.sub_bits, other.max_bits) != (self.sub_bits, self.max_bits):
+            raise ValueError("直方图精度不同，无法合并")
+        if other.total == 0:
+            return
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        if self.total == 0 or other.min_us < self.min_us:
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        self.total += other.total
+        self.sum_us += other.sum_us
+
+    def value_at_percentile(self, q):
+        """返回 q 分位所在桶的上界（微秒），不会低估尾延迟"""
+        if self.total == 0:
+            return 0
+        target = max(1, math.ceil(self.total * q / 100 - 1e-9))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    if i == self.bucket_count - 1:
+                        return self.max_us  # 溢出桶没有上界，直接用最大值
+                    return min(self.bucket_range(i)[1], self.max_us)
+        return self.max_us
+
+    def mean_us(self):
+        return self.sum_us / self.total if self.total else 0.0
+
+    def summary(self, percentiles=PERCENTILES):
+        result = {"count": self.total, "min_ms": self.min_us / 1000, "mean_ms": round(self.mean_us() / 1000, 3),
+                  "max_ms": self.max_us / 1000}
+        for q in percentiles:
+            result[f"p{q}_ms"] = self.value_at_percentile(q) / 1000
+        return result
+
+    def encode(self):
+        """压缩序列化：头部 + (下标差分, 计数) 的 varint 序列"""
+        out = bytearray()
+        for v in (self.sub_bits, self.max_bits, self.total, self.sum_us, self.min_us, self.max_us):
+            _varint(v, out)
+        last = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                _varint(i - last, out)
+                _varint(c, out)
+                last = i
+        return zlib.compress(bytes(out))
+
+    @classmethod
+    def decode(cls, blob):
+        data = zlib.decompress(blob)
+        header = []
+        pos = 0
+        for _ in range(6):
+            value, pos = _read_varint(data, pos)
+            header.append(value)
+        hist = cls(header[0], header[1])
+        hist.total, hist.sum_us, hist.min_us, hist.max_us = header[2:]
+        index = 0
+        while pos < len(data):
+            delta, pos = _read_varint(data, pos)
+            count, pos = _read_varint(data, pos)
+            index += delta
+            hist.counts[index] = count
+        return hist
+
+
+class HistogramSet:
+    """按接口名分组的一组直方图"""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def get(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = LatencyHistogram()
+        return hist
+
+    def record_ms(self, name, value_ms):
+        self.get(name).record(value_ms * 1000)
+
+    def merge(self, other):
+        for name, hist in other.histograms.items():
+            self.get(name).merge(hist)
+
+    def drain(self):
+        """取出当前数据并清空，用于向 master 发送增量"""
+        drained = HistogramSet()
+        drained.histograms, self.histograms = self.histograms, {}
+        return drained
+
+    def to_dict(self):
+        return {name: base64.b64encode(hist.encode()).decode("ascii")
+                for name, hist in self.histograms.items() if hist.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls()
+        for name, blob in data.items():
+            result.histograms[name] = LatencyHistogram.decode(base64.b64decode(blob))
+        return result
+
+    def save(self, path, **meta):
+        meta.setdefault("host", socket.gethostname())
+        meta.setdefault("pid", os.getpid())
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "histograms": self.to_dict()}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f)["histograms"])
+
+    def print_table(self):
+        print(f"{'接口':<24}{'次数':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'p99.99':>10}{'max':>10}  (ms)")
+        for name in sorted(self.histograms):
+            s = self.histograms[name].summary()
+            print(f"{name:<24}{s['count']:>10}{s['p50_ms']:>10.3f}{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+                  f"{s['p99.9_ms']:>10.3f}{s['p99.99_ms']:>10.3f}{s['max_ms']:>10.3f}")
+
+
+def install_locust_hooks(events, recorder=None):
+    """在 locustfile 中注册直方图记录、worker -> master 汇总和结束时的输出"""
+    recorder = recorder or HistogramSet()
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--hist-file", type=str, env_var="LOCUST_HIST_FILE", default="",
+                            help="延迟直方图输出文件，默认 <--csv 前缀>_latency_hist.json")
+
+    @events.request.add_listener
+    def on_request(name, response_time, **kwargs):
+        recorder.record_ms(name, response_time)
+
+    @events.report_to_master.add_listener
+    def on_report_to_master(client_id, data):
+        drained = recorder.drain()
+        if drained.histograms:
+            data["latency_hist"] = drained.to_dict()
+
+    @events.worker_report.add_listener
+    def on_worker_report(client_id, data):
+        if "latency_hist" in data:
+            recorder.merge(HistogramSet.from_dict(data["latency_hist"]))
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        from locust.runners import WorkerRunner
+        if isinstance(environment.runner, WorkerRunner) or not recorder.histograms:
+            return
+        options = environment.parsed_options
+        path = getattr(options, "hist_file", "") or ""
+        if not path:
+            prefix = getattr(options, "csv_prefix", None) or "report"
+            path = f"{prefix}_latency_hist.json"
+        recorder.save(path, host_url=environment.host)
+        print(f"\n📊 延迟直方图已写入 {path}")
+        recorder.print_table()
+
+    return recorder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="延迟直方图工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_show = sub.add_parser("show", help="打印直方图文件的分位数")
+    p_show.add_argument("files", nargs="+")
+    p_merge = sub.add_parser("merge", help="合并多个直方图文件")
+    p_merge.add_argument("output")
+    p_merge.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    merged = HistogramSet()
+    for path in args.files:
+        merged.merge(HistogramSet.load(path))
+    if args.command == "merge":
+        merged.save(args.output, merged_from=args.files)
+        print(f"已合并 {len(args.files)} 个文件 -> {args.output}")
+    merged.print_table()
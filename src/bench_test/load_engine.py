@@ -0,0 +1,178 @@
+"""
+独立的 asyncio 压测引擎（不依赖 locust）
+
+每个并发协程循环执行 “创建短链 -> 访问跳转”，所有协程共享一个 keep-alive 连接池，
+每个请求用 perf_counter_ns 计时并记入 latency_hist 直方图。
+一个进程可以维持上千并发，适合直接对 v3 服务（或 nginx 入口）施压。
+
+# python load_engine.py --base-url http://localhost:10086 --concurrency 2000 --duration 60
+"""
+
+import argparse
+import asyncio
+import time
+
+import harness_profiler
+import metrics_exporter
+import trace_sampler
+from async_http import HttpClient
+from latency_hist import HistogramSet
+from request_mix import random_url
+
+try:
+    import uvloop  # 可选，安装后事件循环开销更低
+except ImportError:
+    uvloop = None
+
+OP_CREATE = "/create"
+OP_REDIRECT = "/u/[alias]"
+
+
+def new_stats():
+    """与 validate_monitoring.py 的 stats 结构一致；只统计创建成功的条数，不保留 alias"""
+    return {
+        'requests_sent': 0,
+        'successful_requests': 0,
+        'failed_requests': 0,
+        'created': 0
+    }
+
+
+class LoadEngine:
+    def __init__(self, base_url, concurrency=1000, duration=30, connections=0, timeout=10.0,
+                 urls=None, think_time=0.0, stats=None, progress_interval=5.0, tracer=None, metrics=None,
+                 profiler=None):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.duration = duration
+        self.connections = connections or concurrency
+        self.timeout = timeout
+        self.urls = urls
+        self.think_time = think_time
+        self.stats = stats if stats is not None else new_stats()
+        self.histograms = HistogramSet()
+        self.progress_interval = progress_interval
+        self.tracer = tracer
+        self.metrics = metrics
+        self.profiler = profiler  # harness_profiler.HarnessProfiler
+        if metrics is not None:
+            metrics.set_gauge("users", lambda: self.concurrency)
+        self.client = None
+        self._counter = 0
+
+    def _record(self, op, start_ns, ok):
+        self.histograms.record_ms(op, (time.perf_counter_ns() - start_ns) / 1e6)
+        self.stats['requests_sent'] += 1
+        if ok:
+            self.stats['successful_requests'] += 1
+        else:
+            self.stats['failed_requests'] += 1
+
+    def next_url(self):
+        self._counter += 1
+        if self.urls:
+            return self.urls[self._counter % len(self.urls)]
+        return random_url()
+
+    async def create(self, url):
+        start = time.perf_counter_ns()
+        try:
+            resp = await self.client.post_json("/create", {"url": url}, name=OP_CREATE)
+            alias = resp.json().get("alias") if resp.status == 200 else None
+        except Exception:
+            alias = None
+        self._record(OP_CREATE, start, alias is not None)
+        if alias:
+            self.stats['created'] += 1
+        return alias
+
+    async def redirect(self, alias):
+        start = time.perf_counter_ns()
+        try:
+            resp = await self.client.get(f"/u/{alias}", name=OP_REDIRECT)
+            ok = resp.status in (301, 302)
+        except Exception:
+            ok = False
+        self._record(OP_REDIRECT, start, ok)
+        return ok
+
+    async def worker(self, deadline):
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            alias = await self.create(self.next_url())
+            if alias:
+                await self.redirect(alias)
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+    async def report_progress(self, deadline):
+        loop = asyncio.get_running_loop()
+        last_sent = 0
+        while loop.time() < deadline:
+            await asyncio.sleep(self.progress_interval)
+            sent = self.stats['requests_sent']
+            print(f"  ... 已发送 {sent} 请求, 失败 {self.stats['failed_requests']}, "
+                  f"区间 {(sent - last_sent) / self.progress_interval:.0f} RPS")
+            last_sent = sent
+
+    async def run(self):
+        self.client = HttpClient(self.base_url, max_connections=self.connections, timeout=self.timeout,
+                                 tracer=self.tracer, metrics=self.metrics)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.duration
+        progress = loop.create_task(self.report_progress(deadline)) if self.progress_interval else None
+        if self.profiler:
+            self.profiler.start()
+            self.profiler.watch_asyncio()
+        try:
+            await asyncio.gather(*(self.worker(deadline) for _ in range(self.concurrency)))
+        finally:
+            if progress:
+                progress.cancel()
+            await self.client.close()
+            if self.tracer:
+                self.tracer.close()
+            if self.profiler:
+                self.profiler.stop()
+        elapsed = loop.time() - start
+        return elapsed
+
+    def run_sync(self):
+        if uvloop is not None:
+            uvloop.install()
+        return asyncio.run(self.run())
+
+
+def print_result(engine, elapsed):
+    stats = engine.stats
+    print(f"总请求 {stats['requests_sent']}, 成功 {stats['successful_requests']}, 失败 {stats['failed_requests']}, "
+          f"耗时 {elapsed:.1f}s, 平均 {stats['requests_sent'] / elapsed:.0f} RPS, "
+          f"新建连接 {engine.client.connections_opened}")
+    engine.histograms.print_table()
+    if engine.profiler:
+        engine.profiler.print_report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio 独立压测引擎：创建 -> 跳转")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--concurrency", type=int, default=1000, help="并发协程数")
+    parser.add_argument("--connections", type=int, default=0, help="连接池上限，默认等于并发数")
+    parser.add_argument("--duration", type=float, default=30, help="持续秒数")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--think-time", type=float, default=0, help="每轮之间的等待秒数")
+    parser.add_argument("--hist-file", default="", help="把延迟直方图写入文件")
+    trace_sampler.add_arguments(parser)
+    metrics_exporter.add_arguments(parser)
+    harness_profiler.add_arguments(parser)
+    args = parser.parse_args()
+
+    engine = LoadEngine(args.base_url, args.concurrency, args.duration, args.connections,
+                        args.timeout, think_time=args.think_time, tracer=trace_sampler.tracer_from_args(args),
+                        metrics=metrics_exporter.exporter_from_args(args, "load_engine"),
+                        profiler=harness_profiler.profiler_from_args(args))
+    elapsed = engine.run_sync()
+    print_result(engine, elapsed)
+    if args.hist_file:
+        engine.histograms.save(args.hist_file, host_url=args.base_url)
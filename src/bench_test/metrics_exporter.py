@@ -0,0 +1,298 @@
+"""
+压测端（客户端）指标的 Prometheus 抓取端点
+
+在压测进程内按接口名聚合，HTTP 服务跑在后台线程里，热路径上只有一次加锁和几次加法，不再往控制台打印：
+  loadgen_requests_total{tool, name, code}                 请求数，code 为 2xx/3xx/4xx/5xx/error
+  loadgen_request_failures_total{tool, name}                locust 标记为失败的请求数（包括状态码正常但校验失败的）
+  loadgen_request_duration_seconds_bucket{tool, name, le}   延迟直方图，桶与服务端 http_request_duration_seconds 对齐
+  loadgen_requests_per_second{tool, name}                   上一个完整秒的请求数
+  loadgen_window_latency_seconds{tool, name, quantile}      上一个 --metrics-window 秒窗口的 p50 / p99 / p99.9
+  loadgen_events_total{tool, event, name, detail}           其他计数，如 locustfile 里意外的状态码
+  loadgen_users{tool}                                       locust 当前用户数 / 驱动的并发数
+按场景运行（scenario.py）时请求相关的指标都多一个 phase 标签，每个阶段是一组新的时间序列；
+每秒请求数和窗口分位数只输出当前阶段的。
+
+docker-distributed/prometheus/prometheus.yml 的 loadgen 任务每 5 秒抓取一次，
+stress-test-dashboard.json 的 “Load Generator” 面板把客户端与服务端的 RPS / p99 画在同一张图上。
+同一台机器上多个进程（locust 的多个 worker）从 --metrics-port 开始依次找空闲端口。
+
+# python open_loop.py --host http://localhost:10086 --rps 2000 --metrics-port 9400
+# locust -f v2_test.py --worker --master-host=192.168.1.3 --metrics-port 9400
+# curl http://localhost:9400/metrics
+"""
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latency_hist import LatencyHistogram
+
+DEFAULT_PORT = 9400
+PORT_ATTEMPTS = 16
+# 服务端 http_request_duration_seconds 用的是 prometheus-net 默认桶，这里在它前面补了两个毫秒级的桶，
+# 其余边界相同，histogram_quantile 结果可以直接对比
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+WINDOW_QUANTILES = (0.5, 0.99, 0.999)
+
+
+def status_class(status):
+    return f"{status // 100}xx" if status else "error"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**kwargs):
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in kwargs.items()) + "}"
+
+
+class EndpointStats:
+    """单个接口名的累计计数、直方图和按时间滚动的窗口"""
+    __slots__ = ("codes", "failures", "buckets", "sum", "count", "second", "second_count", "last_second_count",
+                 "window_start", "window_hist", "last_window")
+
+    def __init__(self, now):
+        self.codes = {}
+        self.failures = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.second = int(now)
+        self.second_count = 0
+        self.last_second_count = 0
+        self.window_start = now
+        self.window_hist = LatencyHistogram()
+        self.last_window = None
+
+    def roll(self, now, window):
+        second = int(now)
+        if second != self.second:
+            # 中间隔了不止一秒说明上一秒没有请求
+            self.last_second_count = self.second_count if second == self.second + 1 else 0
+            self.second, self.second_count = second, 0
+        if now - self.window_start >= window:
+            self.last_window = self.window_hist if now - self.window_start < 2 * window else LatencyHistogram()
+            self.window_start, self.window_hist = now, LatencyHistogram()
+
+
+class MetricsExporter:
+    def __init__(self, tool, window=5.0, clock=time.monotonic):
+        self.tool = tool
+        self.window = window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.events = {}
+        self.gauges = {}  # 名称 -> 无参函数，抓取时调用
+        self.phase = ""  # scenario.py 的当前阶段名，空表示不加 phase 标签
+        self.server = None
+        self.port = None
+
+    def _endpoint(self, name, now):
+        key = (self.phase, name)
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats(now)
+        return stats
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def record(self, name, seconds, status, failed=False):
+        """一个请求完成；status 为 0 表示连接失败 / 超时"""
+        now = self.clock()
+        code = status_class(status)
+        with self.lock:
+            stats = self._endpoint(name, now)
+            stats.roll(now, self.window)
+            stats.codes[code] = stats.codes.get(code, 0) + 1
+            if failed:
+                stats.failures += 1
+            stats.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            stats.sum += seconds
+            stats.count += 1
+            stats.second_count += 1
+            stats.window_hist.record(int(seconds * 1_000_000))
+
+    def count_event(self, event, name="", detail=""):
+        key = (event, name, str(detail))
+        with self.lock:
+            self.events[key] = self.events.get(key, 0) + 1
+
+    def set_gauge(self, name, func):
+        self.gauges[name] = func
+
+    def render(self):
+        now = self.clock()
+        tool = self.tool
+        out = [
+            "# HELP loadgen_requests_total Requests completed by the load generator",
+            "# TYPE loadgen_requests_total counter",
+        ]
+
+        def lbl(phase, **kwargs):
+            return labels(tool=tool, phase=phase, **kwargs) if phase else labels(tool=tool, **kwargs)
+
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            for _, stats in endpoints:
+                stats.roll(now, self.window)
+            for (phase, name), stats in endpoints:
+                for code, value in sorted(stats.codes.items()):
+                    out.append(f"loadgen_requests_total{lbl(phase, name=name, code=code)} {value}")
+            out += ["# HELP loadgen_request_failures_total Requests marked as failed by the load generator",
+                    "# TYPE loadgen_request_failures_total counter"]
+            for (phase, name), stats in endpoints:
+                out.append(f"loadgen_request_failures_total{lbl(phase, name=name)} {stats.failures}")
+            out += ["# HELP loadgen_request_duration_seconds Client-side request latency",
+                    "# TYPE loadgen_request_duration_seconds histogram"]
+            for (phase, name), stats in endpoints:
+                cumulative = 0
+                for le, value in zip(BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += value
+                    out.append(f"loadgen_request_duration_seconds_bucket{lbl(phase, name=name, le=le)} "
+                               f"{cumulative}")
+                out.append(f"loadgen_request_duration_seconds_sum{lbl(phase, name=name)} {stats.sum:.6f}")
+                out.append(f"loadgen_request_duration_seconds_count{lbl(phase, name=name)} {stats.count}")
+            # 已经结束的阶段不再输出瞬时值，避免停在最后一个值上
+            current = [(key, stats) for key, stats in endpoints if key[0] == self.phase]
+            out += ["# HELP loadgen_requests_per_second Requests completed in the last full second",
+                    "# TYPE loadgen_requests_per_second gauge"]
+            for (phase, name), stats in current:
+                value = stats.last_second_count if int(now) == stats.second else 0
+                out.append(f"loadgen_requests_per_second{lbl(phase, name=name)} {value}")
+            out += [f"# HELP loadgen_window_latency_seconds Client-side latency quantiles over the last "
+                    f"{self.window:g}s window",
+                    "# TYPE loadgen_window_latency_seconds gauge"]
+            for (phase, name), stats in current:
+                if stats.last_window is None or not stats.last_window.total:
+                    continue
+                for q in WINDOW_QUANTILES:
+                    value = stats.last_window.value_at_percentile(q * 100) / 1_000_000
+                    out.append(f"loadgen_window_latency_seconds{lbl(phase, name=name, quantile=q)} "
+                               f"{value:.6f}")
+            out += ["# HELP loadgen_events_total Other load generator events",
+                    "# TYPE loadgen_events_total counter"]
+            for (event, name, detail), value in sorted(self.events.items()):
+                out.append(f"loadgen_events_total{labels(tool=tool, event=event, name=name, detail=detail)} "
+                           f"{value}")
+        for gauge, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                continue
+            out += [f"# TYPE loadgen_{gauge} gauge", f"loadgen_{gauge}{lbl(self.phase)} {value}"]
+        return "\n".join(out) + "\n"
+
+    def start(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        """在后台线程监听，端口被占用时依次尝试后面的端口，返回实际端口"""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        last_error = None
+        for candidate in range(port, port + PORT_ATTEMPTS):
+            try:
+                self.server = ThreadingHTTPServer((host, candidate), Handler)
+                break
+            except OSError as e:
+                last_error = e
+        else:
+            raise OSError(f"端口 {port}~{port + PORT_ATTEMPTS - 1} 都被占用: {last_error}")
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True).start()
+        return self.port
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def add_arguments(parser):
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help=f"在该端口暴露压测端指标（Prometheus，如 {DEFAULT_PORT}），0 表示不开启")
+    parser.add_argument("--metrics-window", type=float, default=5.0, help="窗口延迟分位数的窗口秒数")
+
+
+def exporter_from_args(args, tool):
+    if not args.metrics_port:
+        return None
+    exporter = MetricsExporter(tool, args.metrics_window)
+    port = exporter.start(args.metrics_port)
+    print(f"📡 压测端指标: http://0.0.0.0:{port}/metrics")
+    return exporter
+
+
+_locust_events = {}  # locustfile 里的其他计数，没有开启端点时也统计，结束时输出
+_locust_exporters = []
+
+
+def count_event(event, name="", detail=""):
+    """locustfile 热路径里代替 print：只计数，由端点暴露并在结束时汇总输出"""
+    key = (event, name, str(detail))
+    _locust_events[key] = _locust_events.get(key, 0) + 1
+
+
+def set_phase(phase):
+    """locust 下由 scenario.py 在阶段切换时调用，之后的请求指标带上 phase 标签"""
+    for exporter in _locust_exporters:
+        exporter.set_phase(phase)
+
+
+def install_locust_hooks(events, tool="locust"):
+    """在 locustfile 中注册 --metrics-port；master 没有逐请求事件，只在 worker / 单机模式下开启"""
+    state = {}
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--metrics-port", type=int, env_var="LOCUST_METRICS_PORT", default=0,
+                            help=f"在该端口暴露压测端指标（Prometheus，如 {DEFAULT_PORT}），0 表示不开启")
+        parser.add_argument("--metrics-window", type=float, env_var="LOCUST_METRICS_WINDOW", default=5.0,
+                            help="窗口延迟分位数的窗口秒数")
+
+    @events.init.add_listener
+    def on_init(environment, **kwargs):
+        from locust.runners import MasterRunner
+        options = environment.parsed_options
+        if options is None or not options.metrics_port or isinstance(environment.runner, MasterRunner):
+            return
+        exporter = state["exporter"] = MetricsExporter(tool, options.metrics_window)
+        exporter.events = _locust_events
+        _locust_exporters.append(exporter)
+        port = exporter.start(options.metrics_port)
+        exporter.set_gauge("users", lambda: environment.runner.user_count if environment.runner else 0)
+        print(f"📡 压测端指标 (pid {os.getpid()}): http://0.0.0.0:{port}/metrics")
+
+        @events.request.add_listener
+        def on_request(name, response_time, response=None, exception=None, **kwargs):
+            status = getattr(response, "status_code", 0) or 0
+            exporter.record(name, response_time / 1000, status, failed=exception is not None)
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        exporter = state.pop("exporter", None)
+        if exporter is not None:
+            exporter.close()
+        if _locust_events:
+            print(f"\n📋 其他事件 (pid {os.getpid()})")
+            for (event, name, detail), value in sorted(_locust_events.items()):
+                print(f"  {event:<20}{name:<20}{detail:<10}{value:>10}")
@@ -0,0 +1,326 @@
+"""
+本地内存版短链服务（mock），不依赖 .NET / MySQL / Redis
+
+接口与响应格式与 src/v3/ShortUrlController.cs 保持一致：
+  POST /create            {"url": "...", "expire": 60} -> {"alias", "url", "id"}
+  POST /create/batch      {"items": [{"url": "..."}, ...]} -> {"count", "items": [{"alias", "url", "id"}, ...]}
+  GET  /u/{alias}         302 + Location，不存在或已过期返回 404
+  GET  /health            {"status": "healthy", ...}
+  GET  /stats             与 v1 的 /stats 相同：{"totalEntries", "memoryUsageMB", "uptimeSeconds", "nextId"}
+  GET  /snowflake/config  {"workerId", "datacenterId", "lastTimestamp", "currentTimestamp", "isTimeRollback"}
+  POST /cache/flush       仅 mock：清空模拟缓存（--cache-capacity 开启时），用于冷启动测试
+
+id 由 Snowflake 生成，alias 为 12 位 Base62（与 v3 一致），数据保存在进程内 dict。
+基于 asyncio 原生流实现，支持 keep-alive 与 pipelining，可选注入固定延迟和抖动，
+用来测量压测端自身的上限，或在没有服务端环境的机器上回归测试压测脚本。
+
+--cache-capacity 开启模拟的 v3 读路径：LRU 缓存未命中时占用一个模拟 DB 连接（--db-connections）
+等待 --db-latency-ms 后回填缓存，与 v3 一样没有合并同一 alias 的并发回源，
+/stats 额外返回 cacheHits / cacheMisses / dbQueries，供 cache_warmup.py 观察冷启动。
+
+# python mock_server.py --port 10086
+# python mock_server.py --port 10086 --latency-ms 2 --jitter-ms 3
+# python mock_server.py --port 10086 --cache-capacity 100000 --db-latency-ms 5 --db-connections 32
+# locust -f v2_test.py --host=http://localhost:10086 -u 100 -r 100 --headless --run-time 1m
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from shortcode import V3_ALIAS_LENGTH, Base62Converter, SnowflakeIdGenerator
+
+try:
+    import resource  # 仅 Unix 可用，Windows 上 memoryUsageMB 报 0
+except ImportError:
+    resource = None
+
+MAX_BATCH_SIZE = 1000  # 与 ShortUrlController.MaxBatchSize 一致
+
+REASONS = {200: "OK", 302: "Found", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+
+
+def build_response(status, body=b"", content_type=None, headers=None, keep_alive=True):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+    if content_type:
+        lines.append(f"Content-Type: {content_type}")
+    if headers:
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+    if not keep_alive:
+        lines.append("Connection: close")
+    lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def json_response(status, payload, keep_alive=True):
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return build_response(status, body, "application/json; charset=utf-8", keep_alive=keep_alive)
+
+
+def text_response(status, text, keep_alive=True):
+    return build_response(status, text.encode("utf-8"), "text/plain; charset=utf-8", keep_alive=keep_alive)
+
+
+def utc_now_iso():
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class MockShortUrlService:
+    """内存存储 + 路由，不关心网络层"""
+
+    def __init__(self, worker_id=1, datacenter_id=1, alias_length=V3_ALIAS_LENGTH, cache_capacity=0,
+                 db_latency_ms=0.0, db_connections=32):
+        self.snowflake = SnowflakeIdGenerator(worker_id, datacenter_id)
+        self.base62 = Base62Converter(alias_length)
+        self.store = {}  # alias -> (url, 过期的 unix 时间，0 表示不过期)
+        self.start_time = time.time()
+        self.last_id = 0
+        self.create_count = 0
+        self.get_count = 0
+        # 模拟缓存：alias -> None，OrderedDict 按访问顺序做 LRU；None 表示不模拟缓存
+        self.cache = OrderedDict() if cache_capacity > 0 else None
+        self.cache_capacity = cache_capacity
+        self.db_latency_ms = db_latency_ms
+        self.db_slots = asyncio.Semaphore(db_connections)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.db_queries = 0
+
+    def cache_put(self, alias):
+        self.cache[alias] = None
+        self.cache.move_to_end(alias)
+        if len(self.cache) > self.cache_capacity:
+            self.cache.popitem(last=False)
+
+    async def read_through(self, alias):
+        """v3 的读路径：先查缓存，未命中时回源 DB 并回填（只有存在的 alias 才回填）"""
+        if alias in self.cache:
+            self.cache.move_to_end(alias)
+            self.cache_hits += 1
+            return
+        self.cache_misses += 1
+        async with self.db_slots:
+            self.db_queries += 1
+            if self.db_latency_ms > 0:
+                await asyncio.sleep(self.db_latency_ms / 1000)
+        if alias in self.store:
+            self.cache_put(alias)
+
+    def create(self, url, expire=None, cache=True):
+        link_id = self.snowflake.next_id()
+        alias = self.base62.encode(link_id)
+        self.store[alias] = (url, time.time() + expire if expire else 0)
+        self.last_id = link_id
+        self.create_count += 1
+        if cache and self.cache is not None:
+            # v3 创建后同时写入 Redis（批量接口带 cache=false 时不写）
+            self.cache_put(alias)
+        return link_id, alias
+
+    def lookup(self, alias):
+        entry = self.store.get(alias)
+        if entry is None:
+            return None
+        url, expire_at = entry
+        if expire_at and expire_at < time.time():
+            del self.store[alias]
+            return None
+        self.get_count += 1
+        return url
+
+    def handle_create(self, body, keep_alive):
+        try:
+            req = json.loads(body) if body else None
+        except ValueError:
+            return text_response(400, "Invalid JSON body", keep_alive)
+        if not isinstance(req, dict) or not isinstance(req.get("url"), str) or not req["url"].strip():
+            return text_response(400, "url is required", keep_alive)
+        expire = req.get("expire")
+        link_id, alias = self.create(req["url"], expire if isinstance(expire, int) and expire > 0 else None)
+        return json_response(200, {"alias": alias, "url": req["url"], "id": link_id}, keep_alive)
+
+    def handle_create_batch(self, body, keep_alive, cache=True):
+        try:
+            req = json.loads(body) if body else None
+        except ValueError:
+            return text_response(400, "Invalid JSON body", keep_alive)
+        items = req.get("items") if isinstance(req, dict) else None
+        if not isinstance(items, list) or not items:
+            return text_response(400, "items is required", keep_alive)
+        if len(items) > MAX_BATCH_SIZE:
+            return text_response(400, f"batch size must not exceed {MAX_BATCH_SIZE}", keep_alive)
+        if any(not isinstance(x, dict) or not isinstance(x.get("url"), str) or not x["url"].strip() for x in items):
+            return text_response(400, "url is required", keep_alive)
+        created = []
+        for item in items:
+            expire = item.get("expire")
+            link_id, alias = self.create(item["url"], expire if isinstance(expire, int) and expire > 0 else None,
+                                         cache)
+            created.append({"alias": alias, "url": item["url"], "id": link_id})
+        return json_response(200, {"count": len(created), "items": created}, keep_alive)
+
+    def handle_redirect(self, alias, keep_alive):
+        url = self.lookup(alias)
+        if url is None:
+            return NOT_FOUND if keep_alive else build_response(404, keep_alive=False)
+        return build_response(302, headers={"Location": url}, keep_alive=keep_alive)
+
+    def handle_health(self, keep_alive):
+        return json_response(200, {"status": "healthy", "timestamp": utc_now_iso(), "database": "connected",
+                                   "redis": "disabled", "version": "mock"}, keep_alive)
+
+    def handle_stats(self, keep_alive):
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 if resource else 0.0
+        stats = {"totalEntries": len(self.store), "memoryUsageMB": round(rss_mb, 2),
+                 "uptimeSeconds": round(time.time() - self.start_time, 1), "nextId": self.last_id}
+        if self.cache is not None:
+            stats.update(cacheEntries=len(self.cache), cacheHits=self.cache_hits, cacheMisses=self.cache_misses,
+                         dbQueries=self.db_queries)
+        return json_response(200, stats, keep_alive)
+
+    def handle_cache_flush(self, keep_alive):
+        if self.cache is None:
+            return text_response(400, "cache simulation is disabled (--cache-capacity)", keep_alive)
+        flushed = len(self.cache)
+        self.cache.clear()
+        return json_response(200, {"flushed": flushed}, keep_alive)
+
+    def handle_snowflake_config(self, keep_alive):
+        now_ms = time.time_ns() // 1_000_000
+        last = self.snowflake.last_timestamp
+        return json_response(200, {"workerId": self.snowflake.worker_id,
+                                   "datacenterId": self.snowflake.datacenter_id,
+                                   "lastTimestamp": last, "currentTimestamp": now_ms,
+                                   "isTimeRollback": last > now_ms}, keep_alive)
+
+    def dispatch(self, method, path, body, keep_alive=True):
+        path, _, query = path.partition("?")
+        if path.startswith("/u/"):
+            if method != "GET":
+                return build_response(405, keep_alive=keep_alive)
+            return self.handle_redirect(path[3:], keep_alive)
+        if path == "/create":
+            if method != "POST":
+                return build_response(405, keep_alive=keep_alive)
+            return self.handle_create(body, keep_alive)
+        if path == "/create/batch":
+            if method != "POST":
+                return build_response(405, keep_alive=keep_alive)
+            return self.handle_create_batch(body, keep_alive, "cache=false" not in query.lower())
+        if path == "/cache/flush" and method == "POST":
+            return self.handle_cache_flush(keep_alive)
+        if method == "GET":
+            if path == "/health":
+                return self.handle_health(keep_alive)
+            if path == "/stats":
+                return self.handle_stats(keep_alive)
+            if path == "/snowflake/config":
+                return self.handle_snowflake_config(keep_alive)
+        return build_response(404, keep_alive=keep_alive)
+
+
+class MockShortUrlServer:
+    """HTTP/1.1 网络层：keep-alive、pipelining、可选延迟注入"""
+
+    def __init__(self, service=None, latency_ms=0.0, jitter_ms=0.0):
+        self.service = service or MockShortUrlService()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.server = None
+        self.connections = 0
+
+    async def delay(self):
+        seconds = (self.latency_ms + random.random() * self.jitter_ms) / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        inject = self.latency_ms > 0 or self.jitter_ms > 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.split()
+                if len(parts) < 3:
+                    writer.write(build_response(400, keep_alive=False))
+                    break
+                method, path, version = (p.decode("latin-1") for p in parts[:3])
+                length = 0
+                connection = ""
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.partition(b":")
+                    name = name.strip().lower()
+                    if name == b"content-length":
+                        length = int(value)
+                    elif name == b"connection":
+                        connection = value.strip().lower().decode("latin-1")
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if inject:
+                    await self.delay()
+                if self.service.cache is not None and method == "GET" and path.startswith("/u/"):
+                    await self.service.read_through(path[3:].split("?", 1)[0])
+                writer.write(self.service.dispatch(method, path, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def start(self, host="0.0.0.0", port=10086):
+        self.server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096,
+                                                 reuse_address=True)
+        return self.server
+
+    async def serve_forever(self, host="0.0.0.0", port=10086):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="内存版短链 mock 服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=10086)
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求固定注入的延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="额外的随机抖动上限（毫秒，均匀分布）")
+    parser.add_argument("--worker-id", type=int, default=1, help="Snowflake WorkerId")
+    parser.add_argument("--datacenter-id", type=int, default=1, help="Snowflake DatacenterId")
+    parser.add_argument("--cache-capacity", type=int, default=0, help="模拟缓存的条数上限，0 表示不模拟缓存")
+    parser.add_argument("--db-latency-ms", type=float, default=2, help="缓存未命中时模拟的 DB 查询延迟（毫秒）")
+    parser.add_argument("--db-connections", type=int, default=32, help="模拟的 DB 连接池大小")
+    args = parser.parse_args()
+
+    mock = MockShortUrlServer(MockShortUrlService(args.worker_id, args.datacenter_id,
+                                                  cache_capacity=args.cache_capacity,
+                                                  db_latency_ms=args.db_latency_ms,
+                                                  db_connections=args.db_connections),
+                              args.latency_ms, args.jitter_ms)
+    cache = (f", 缓存 {args.cache_capacity} 条 / DB {args.db_latency_ms}ms x {args.db_connections} 连接"
+             if args.cache_capacity else "")
+    print(f"🧪 mock 短链服务监听 http://{args.host}:{args.port} "
+          f"(延迟 {args.latency_ms}ms + 抖动 {args.jitter_ms}ms{cache})")
+    try:
+        asyncio.run(mock.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
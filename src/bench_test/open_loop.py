@@ -0,0 +1,396 @@
+"""
+开环（固定到达率）压测驱动
+
+locustfile 都是 wait_time = between(0, 0) 的闭环模型：服务变慢时发压也跟着变慢，
+尾延迟被低估（coordinated omission）。这里按固定的到达时间表发请求，
+延迟从“计划发送时间”开始计算，服务端排队的时间也会算进延迟里。
+
+请求比例与 v2_test.py 相同（request_mix.py），读请求的 key 分布与 locustfile 共用 key_dist.py，
+创建请求的请求体与 locustfile 一样从 payload_pool.py 预生成（--url-length 控制长链接长度）。
+run_step() 按阶段发压，阶段结束时等完未完成的请求；fault_proxy.py、scenario.py 用 start() / rotate() 持续发压，
+到达过程不因切片中断，完成的请求按完成时刻分桶。
+
+# 固定 2000 RPS 跑 30 秒
+# python open_loop.py --host http://localhost:10086 --rps 2000 --duration 30
+# 泊松到达，从 1000 RPS 开始每步加 1000，直到 p99 超过 50ms 或错误率超过 1%
+# python open_loop.py --host http://localhost:10086 --arrival poisson --rps 1000 --rps-step 1000 --rps-max 20000 --step-duration 20 --slo-p99-ms 50
+"""
+
+import argparse
+import asyncio
+import csv
+import random
+from array import array
+
+import consistency
+import harness_profiler
+import key_dist
+import metrics_exporter
+import payload_pool
+import trace_sampler
+import traffic_trace
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from request_mix import CREATE_WEIGHT, READ_WEIGHT_BY_FILE, READ_WEIGHT, random_url
+
+OP_CREATE = "/create"
+OP_READ = "/u/[alias]"
+OP_READ_FILE = "/u/[alias]_file"
+OPS = (OP_CREATE, OP_READ, OP_READ_FILE)
+
+
+def percentile(sorted_values, q):
+    """q 取 0~100，输入需已排序"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))
+    return sorted_values[index]
+
+
+class StepResult:
+    """一个 RPS 阶段的统计"""
+
+    def __init__(self, target_rps, duration):
+        self.target_rps = target_rps
+        self.duration = duration
+        self.sent = 0
+        self.dropped = 0  # 未完成请求超过上限，没能按时发出
+        self.latencies = {op: array("d") for op in OPS}  # 毫秒
+        self.errors = {op: 0 for op in OPS}
+
+    @property
+    def completed(self):
+        return sum(len(v) for v in self.latencies.values())
+
+    @property
+    def succeeded(self):
+        return self.completed - sum(self.errors.values())
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values()) + self.dropped
+
+    @property
+    def error_rate(self):
+        # 分母是已完成（含丢弃）的请求：持续发压时按完成时刻分桶，桶内发出的和完成的不是同一批
+        total = self.completed + self.dropped
+        return self.error_count / total if total else 0.0
+
+    def all_latencies(self):
+        values = array("d")
+        for v in self.latencies.values():
+            values.extend(v)
+        return sorted(values)
+
+    def summary(self):
+        values = self.all_latencies()
+        return {
+            "target_rps": self.target_rps,
+            # 只算成功的请求：快速失败（连接被拒、5xx）不应被当成吞吐
+            "achieved_rps": round(self.succeeded / self.duration, 1),
+            "error_rps": round(self.error_count / self.duration, 1),
+            "sent": self.sent,
+            "errors": self.error_count,
+            "error_rate": round(self.error_rate * 100, 3),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p90_ms": round(percentile(values, 90), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "p999_ms": round(percentile(values, 99.9), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+
+
+class OpenLoopDriver:
+    def __init__(self, client, selector, file_aliases=None, max_outstanding=20000, seed=None, weights=None,
+                 checker=None, payloads=None):
+        self.client = client
+        self.selector = selector
+        self.file_aliases = file_aliases
+        self.max_outstanding = max_outstanding
+        self.rng = random.Random(seed)
+        self.created_aliases = []
+        self.outstanding = set()
+        self.checker = checker  # consistency.ConsistencyChecker，抽样校验 Location
+        self.payloads = payloads  # payload_pool.PayloadPool，不指定时逐请求生成随机长链接
+        self.set_weights(weights)
+        # 持续发压（start / rotate / stop）时的状态
+        self.rps = 0
+        self.arrival = "constant"
+        self.bucket = None
+        self.bucket_start = 0.0
+        self.next_time = 0.0
+        self.by_send_time = False
+        self._arrivals = None
+
+    def set_weights(self, weights=None):
+        """((操作, 权重), ...)，默认与 v2_test.py 相同；scenario.py 在阶段切换时调用"""
+        self.weights = weights or ((OP_CREATE, CREATE_WEIGHT), (OP_READ, READ_WEIGHT), (OP_READ_FILE, READ_WEIGHT_BY_FILE))
+        self.total_weight = sum(weight for _, weight in self.weights)
+
+    def choose_op(self):
+        r = self.rng.random() * self.total_weight
+        for op, weight in self.weights:
+            if r < weight:
+                return op
+            r -= weight
+        return OP_READ
+
+    async def fire(self, op, intended, result=None):
+        """result 为 None 时记入完成时刻的当前桶（持续发压）"""
+        loop = asyncio.get_running_loop()
+        ok = False
+        try:
+            if op == OP_READ_FILE and self.file_aliases:
+                alias = self.selector.pick(self.file_aliases)
+            else:
+                alias = self.selector.pick(self.created_aliases)
+                if op == OP_READ_FILE:
+                    op = OP_READ
+            if op == OP_CREATE or alias is None:
+                # 还没有可读的 alias 时先创建
+                op = OP_CREATE
+                if self.payloads is not None:
+                    url, body = self.payloads.take()
+                else:
+                    url = random_url(self.rng)
+                    body = {"url": url}
+                resp = await self.client.post_json("/create", body, name=op)
+                if resp.status == 200:
+                    alias = resp.json().get("alias")
+                    if alias:
+                        self.created_aliases.append(alias)
+                        ok = True
+                        if self.checker is not None:
+                            self.checker.on_create(alias, url)
+            else:
+                resp = await self.client.get(f"/u/{alias}", name=op)
+                ok = resp.status == 302
+                if self.checker is not None:
+                    self.checker.on_redirect(alias, resp.status, resp.headers.get("location"))
+        except Exception:
+            ok = False
+        if result is None:
+            result = self.bucket
+        # 从计划发送时间开始计算，包含了在客户端等待连接的排队时间
+        result.latencies[op].append((loop.time() - intended) * 1000)
+        if not ok:
+            result.errors[op] += 1
+
+    async def run_step(self, rps, duration, arrival="constant"):
+        loop = asyncio.get_running_loop()
+        result = StepResult(rps, duration)
+        start = loop.time()
+        end = start + duration
+        next_time = start
+
+        def gap():
+            if arrival == "poisson":
+                return self.rng.expovariate(rps)
+            return 1.0 / rps
+
+        while next_time < end:
+            now = loop.time()
+            if next_time > now:
+                await asyncio.sleep(next_time - now)
+                continue
+            # 把所有已经到期的请求一次发出，调度落后时不会丢失计划时间
+            while next_time <= now and next_time < end:
+                if len(self.outstanding) >= self.max_outstanding:
+                    result.dropped += 1
+                else:
+                    task = loop.create_task(self.fire(self.choose_op(), next_time, result))
+                    self.outstanding.add(task)
+                    task.add_done_callback(self.outstanding.discard)
+                    result.sent += 1
+                next_time += gap()
+
+        if self.outstanding:
+            await asyncio.wait(list(self.outstanding), timeout=self.client.timeout + 1)
+        return result
+
+    def gap(self):
+        if self.arrival == "poisson":
+            return self.rng.expovariate(self.rps)
+        return 1.0 / self.rps
+
+    def start(self, rps, arrival="constant", by_send_time=False):
+        """持续发压：到达过程不按阶段切断，也不等未完成的请求；
+        完成的请求按完成时刻记入当前桶，调用方定时 rotate() 取走，set_rate() 随时改到达率。
+        by_send_time 时改为记入计划发送时刻所在的桶，rotate() 返回的桶之后仍会收到结果，
+        调用方需要再等 timeout 秒才能得到完整的统计"""
+        loop = asyncio.get_running_loop()
+        self.rps = rps
+        self.arrival = arrival
+        self.by_send_time = by_send_time
+        self.bucket = StepResult(rps, 0)
+        self.bucket_start = self.next_time = loop.time()
+        self._arrivals = loop.create_task(self._arrive())
+
+    def set_rate(self, rps, arrival=None):
+        self.rps = rps
+        self.arrival = arrival or self.arrival
+        if rps > 0:
+            # 从低到达率切到高到达率时不必等完上一个间隔
+            self.next_time = min(self.next_time, asyncio.get_running_loop().time() + self.gap())
+
+    def rotate(self):
+        """结束当前桶并返回，duration 为桶的实际时长"""
+        now = asyncio.get_running_loop().time()
+        bucket = self.bucket
+        bucket.duration = now - self.bucket_start
+        self.bucket = StepResult(self.rps, 0)
+        self.bucket_start = now
+        return bucket
+
+    async def stop(self, drain=True):
+        """停止到达过程；drain 时等未完成的请求（最多 timeout + 1 秒），返回最后一个桶"""
+        if self._arrivals is not None:
+            self._arrivals.cancel()
+            await asyncio.gather(self._arrivals, return_exceptions=True)
+            self._arrivals = None
+        if drain and self.outstanding:
+            await asyncio.wait(list(self.outstanding), timeout=self.client.timeout + 1)
+        return self.rotate()
+
+    async def _arrive(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.rps <= 0:
+                await asyncio.sleep(0.05)
+                self.next_time = loop.time()
+                continue
+            if self.next_time > now:
+                # 分段睡，set_rate() 提前了下一次到达时能及时醒来
+                await asyncio.sleep(min(self.next_time - now, 0.05))
+                continue
+            while self.next_time <= now:
+                if len(self.outstanding) >= self.max_outstanding:
+                    self.bucket.dropped += 1
+                else:
+                    bucket = self.bucket if self.by_send_time else None
+                    task = loop.create_task(self.fire(self.choose_op(), self.next_time, bucket))
+                    self.outstanding.add(task)
+                    task.add_done_callback(self.outstanding.discard)
+                    self.bucket.sent += 1
+                self.next_time += self.gap()
+
+
+def slo_ok(summary, slo_p99_ms, slo_error_rate):
+    return summary["p99_ms"] <= slo_p99_ms and summary["error_rate"] <= slo_error_rate * 100
+
+
+def print_summary(summary, ok=None):
+    status = "" if ok is None else (" ✅" if ok else " ❌ SLO 不满足")
+    print(f"  目标 {summary['target_rps']:>8} RPS | 实际 {summary['achieved_rps']:>9} RPS | "
+          f"错误 {summary['error_rate']:>6}% | p50 {summary['p50_ms']:>8}ms p99 {summary['p99_ms']:>8}ms "
+          f"p99.9 {summary['p999_ms']:>8}ms max {summary['max_ms']:>8}ms{status}")
+
+
+def check_args(args):
+    if args.rps <= 0:
+        raise SystemExit("❌ --rps 必须大于 0")
+    if args.rps_max:
+        if args.rps_step <= 0:
+            raise SystemExit("❌ 阶梯模式下 --rps-step 必须大于 0")
+        if args.rps > args.rps_max:
+            raise SystemExit(f"❌ --rps {args.rps} 大于 --rps-max {args.rps_max}")
+
+
+async def main_async(args):
+    check_args(args)
+    tracer = trace_sampler.tracer_from_args(args)
+    recorder = traffic_trace.recorder_from_args(args, "open_loop")
+    metrics = metrics_exporter.exporter_from_args(args, "open_loop")
+    client = HttpClient(args.host, max_connections=args.connections, timeout=args.timeout, tracer=tracer,
+                        recorder=recorder, metrics=metrics)
+    file_aliases = AliasStore(args.alias_file)
+    selector = key_dist.get_selector(args.key_dist, args.key_seed)
+    checker = consistency.checker_from_args(args)
+    profiler = harness_profiler.profiler_from_args(args)
+    if profiler:
+        profiler.start()
+        profiler.watch_asyncio()
+    payloads = payload_pool.pool_from_args(args, seed=args.seed)
+    driver = OpenLoopDriver(client, selector, file_aliases, args.max_outstanding, args.seed, checker=checker,
+                            payloads=payloads)
+    if metrics:
+        metrics.set_gauge("users", lambda: len(driver.outstanding))
+
+    print(f"🚀 开环压测 {args.host} | 到达模型 {args.arrival} | 连接数上限 {args.connections} | "
+          f"文件 alias {len(file_aliases)} 条 | key 分布 {args.key_dist} | URL 长度 {args.url_length}")
+    summaries = []
+    rps = args.rps
+    rps_max = args.rps_max or args.rps
+    duration = args.step_duration or args.duration
+    try:
+        while rps <= rps_max:
+            result = await driver.run_step(rps, duration, args.arrival)
+            summary = result.summary()
+            ok = slo_ok(summary, args.slo_p99_ms, args.slo_error_rate)
+            summary["slo_ok"] = ok
+            summaries.append(summary)
+            print_summary(summary, ok if args.rps_max else None)
+            if not ok and args.rps_max:
+                break
+            rps += args.rps_step
+    finally:
+        await client.close()
+        if tracer:
+            tracer.close()
+            print(f"🔬 抽样 trace {tracer.written} 条已写入 {args.trace_file}")
+        if recorder:
+            recorder.close()
+            print(f"📼 已录制 {recorder.count} 条请求到 {args.record_file}")
+        if metrics:
+            metrics.close()
+    consistency.print_checker(checker)
+    if profiler:
+        profiler.stop()
+        profiler.print_report()
+
+    if args.rps_max:
+        passed = [s for s in summaries if s["slo_ok"]]
+        if passed:
+            print(f"🎯 满足 SLO 的最大到达率: {passed[-1]['target_rps']} RPS (p99 {passed[-1]['p99_ms']}ms)")
+        else:
+            print("⚠️  起始 RPS 已不满足 SLO")
+    if args.csv and summaries:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summaries[0].keys()))
+            writer.writeheader()
+            writer.writerows(summaries)
+        print(f"📄 结果已写入 {args.csv}")
+    return summaries
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="开环固定到达率压测")
+    parser.add_argument("--host", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--rps", type=int, default=1000, help="到达率（阶梯模式下为起始值）")
+    parser.add_argument("--duration", type=float, default=30, help="单阶段持续秒数")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="constant", help="到达模型")
+    parser.add_argument("--rps-step", type=int, default=1000, help="阶梯模式每步增加的 RPS")
+    parser.add_argument("--rps-max", type=int, default=0, help="阶梯模式最大 RPS，0 表示只跑一个阶段")
+    parser.add_argument("--step-duration", type=float, default=0, help="阶梯模式每步持续秒数，默认同 --duration")
+    parser.add_argument("--slo-p99-ms", type=float, default=100, help="SLO: p99 延迟上限（毫秒）")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="SLO: 错误率上限（0~1）")
+    parser.add_argument("--connections", type=int, default=1000, help="连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="未完成请求上限，超过的计为丢弃")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="二进制 alias 文件")
+    parser.add_argument("--key-dist", default=key_dist.DEFAULT_KEY_DIST, help="读请求 key 分布")
+    parser.add_argument("--key-seed", type=int, default=None, help="key 分布随机种子")
+    parser.add_argument("--seed", type=int, default=None, help="请求比例与到达间隔的随机种子")
+    parser.add_argument("--csv", default="", help="把每个阶段的结果写入 CSV")
+    trace_sampler.add_arguments(parser)
+    traffic_trace.add_arguments(parser)
+    metrics_exporter.add_arguments(parser)
+    consistency.add_arguments(parser)
+    harness_profiler.add_arguments(parser)
+    payload_pool.add_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(build_parser().parse_args()))
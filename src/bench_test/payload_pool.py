@@ -0,0 +1,259 @@
+"""
+创建请求的请求体池：预先生成、预先序列化好的 JSON 请求体，压测时按下标取用
+
+原来每个 create_short_url 都要 random.choices 拼一个随机 URL、再 json.dumps 一个新 dict，
+每秒几万次创建时这部分在压测端的 profile 里很显眼。这里按块（--payload-block 条）一次性生成：
+  - 请求体直接拼成 bytes（b'{"url":"..."}'），URL 只含字母数字和 - /，不需要转义
+  - 可选按 create_only_test.py 的比例带上 expire（10% 的请求随机取 60 ~ 86400 秒）
+  - 当前块用到一半时在后台（线程；locust 下 gevent 打过补丁，是 greenlet）生成下一块，
+    分小段生成、段间让出，不会长时间卡住事件循环；用完时下一块还没好才在当前请求里同步生成
+  - URL 形如 https://www.example.com/<前缀>-<十六进制序号>/<填充>：前缀区分 worker（locust 的 worker 编号
+    或进程号，加上每次启动随机的一段），序号在进程内递增，所以多个 worker、多次压测之间都不重复；
+    填充从一段预生成的随机字符里切片，长度由 --url-length 决定
+
+URL 长度分布（--url-length，指整个 URL 的字符数；比唯一部分还短时不再填充）：
+  fixed:N                  固定长度（默认 fixed:48）
+  uniform:MIN:MAX          [MIN, MAX] 均匀分布
+  lognormal:MEDIAN:SIGMA   对数正态，接近真实长链接的长尾，如 lognormal:80:0.8
+  mix:LEN:W:LEN:W...       按权重取几个固定长度，如 mix:48:0.9:2048:0.1
+长链接列是 TEXT，InnoDB 超过约 768 字节的部分放到溢出页，可以用 fixed:64 / fixed:2048 对比插入吞吐。
+每块最多 --payload-block 条、且总大小不超过 BLOCK_BYTES，URL 很长时块会自动变小。
+
+# locust -f create_only_test.py --host=http://localhost:10086 --url-length mix:48:0.9:2048:0.1
+# python open_loop.py --host http://localhost:10086 --rps 5000 --url-length fixed:2048
+# python payload_pool.py lognormal:80:0.8 -n 100000
+"""
+
+import itertools
+import math
+import os
+import random
+import threading
+import time
+
+from request_mix import URL_CHARS
+
+URL_BASE = "https://www.example.com/"
+DEFAULT_URL_LENGTH = "fixed:48"
+DEFAULT_BLOCK = 20000
+BLOCK_BYTES = 16 << 20
+MAX_URL_LENGTH = 65535  # TEXT 列上限
+CHUNK = 1024  # 后台生成时每段条数，段间让出
+EXPIRE_CHOICES = (60, 300, 3600, 7200, 86400)
+NOISE_LENGTH = MAX_URL_LENGTH * 2
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+JSON_HEADERS = {"Content-Type": "application/json"}  # locust 里 client.post(data=body, headers=JSON_HEADERS)
+
+
+def base36(n):
+    digits = []
+    while True:
+        n, r = divmod(n, 36)
+        digits.append(BASE36[r])
+        if n == 0:
+            return "".join(reversed(digits))
+
+
+class LengthDist:
+    """返回 URL 总长度"""
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def __call__(self, rng):
+        return max(len(URL_BASE), min(MAX_URL_LENGTH, int(self.sample(rng))))
+
+
+def parse_length_dist(spec):
+    """把 --url-length 字符串解析为 LengthDist"""
+    parts = (spec or DEFAULT_URL_LENGTH).strip().lower().split(":")
+    name, params = parts[0], [float(p) for p in parts[1:] if p]
+    if name == "fixed" and len(params) == 1:
+        return LengthDist(lambda rng: params[0])
+    if name == "uniform" and len(params) == 2:
+        low, high = int(params[0]), int(params[1])
+        return LengthDist(lambda rng: rng.randint(low, high))
+    if name == "lognormal" and len(params) == 2:
+        mu, sigma = math.log(params[0]), params[1]
+        return LengthDist(lambda rng: rng.lognormvariate(mu, sigma))
+    if name == "mix" and params and len(params) % 2 == 0:
+        lengths, weights = params[0::2], params[1::2]
+        cum_weights = list(itertools.accumulate(weights))
+        return LengthDist(lambda rng: rng.choices(lengths, cum_weights=cum_weights)[0])
+    raise ValueError(f"无效的 URL 长度分布: {spec}")
+
+
+def default_prefix(worker_index=None, rng=random):
+    """每次启动随机的 4 位加上 worker 编号（没有时用进程号），保证各 worker 的 URL 互不重复"""
+    token = "".join(rng.choices(BASE36, k=4))
+    return token + (f"w{base36(worker_index)}" if worker_index is not None else f"p{base36(os.getpid())}")
+
+
+class PayloadPool:
+    """按块预生成 (长链接, 请求体) 的池，take() 按下标顺序取用"""
+
+    def __init__(self, length_dist=DEFAULT_URL_LENGTH, prefix=None, block_size=DEFAULT_BLOCK, expire_ratio=0.0,
+                 expire_choices=EXPIRE_CHOICES, seed=None, background=True):
+        self.length_dist = parse_length_dist(length_dist) if isinstance(length_dist, str) else length_dist
+        self.rng = random.Random(seed)
+        self.prefix = URL_BASE + (prefix or default_prefix(rng=self.rng)) + "-"
+        self.block_size = max(1, block_size)
+        self.expire_ratio = expire_ratio
+        self.expire_choices = expire_choices
+        self.background = background
+        self.noise = "".join(self.rng.choices(URL_CHARS, k=NOISE_LENGTH))
+        self.next_seq = 0  # 只在持锁（或构造）时生成，不会重复
+        self.blocks = 0
+        self.sync_refills = 0
+        self._lock = threading.Lock()
+        self._next = None
+        self._filling = False
+        self.urls, self.bodies = self._build(yield_between_chunks=False)
+        self.index = 0
+
+    def _build(self, yield_between_chunks=True):
+        rng, noise, prefix, dist = self.rng, self.noise, self.prefix, self.length_dist
+        random_ = rng.random
+        urls, bodies = [], []
+        size = 0
+        while len(urls) < self.block_size and size < BLOCK_BYTES:
+            n = min(CHUNK, self.block_size - len(urls))
+            first = self.next_seq
+            self.next_seq += n
+            # 序号用十六进制：格式化在 C 里完成，比 base36 快
+            chunk = [f"{prefix}{seq:x}/" for seq in range(first, first + n)]
+            for i, url in enumerate(chunk):
+                pad = dist(rng) - len(url)
+                if pad > 0:
+                    start = int(random_() * (NOISE_LENGTH - pad))
+                    chunk[i] = url + noise[start:start + pad]
+            for url in chunk:
+                if self.expire_ratio and random_() < self.expire_ratio:
+                    bodies.append(f'{{"url":"{url}","expire":{rng.choice(self.expire_choices)}}}'.encode())
+                else:
+                    bodies.append(f'{{"url":"{url}"}}'.encode())
+                size += 2 * len(url)
+            urls.extend(chunk)
+            if yield_between_chunks:
+                time.sleep(0)  # 让出 GIL / gevent hub
+        self.blocks += 1
+        return urls, bodies
+
+    def _fill_next(self):
+        try:
+            with self._lock:
+                if self._next is None:
+                    self._next = self._build()
+        finally:
+            self._filling = False
+
+    def _swap(self):
+        with self._lock:  # 后台正在生成时等它完成
+            block = self._next
+            self._next = None
+            if block is None:
+                self.sync_refills += 1
+                block = self._build(yield_between_chunks=False)
+        self.urls, self.bodies = block
+
+    def take(self):
+        """返回 (长链接, JSON 请求体 bytes)"""
+        i = self.index
+        if i >= len(self.bodies):
+            self._swap()
+            i = 0
+        self.index = i + 1
+        if i == len(self.bodies) // 2 and self.background and not self._filling and self._next is None:
+            self._filling = True
+            threading.Thread(target=self._fill_next, daemon=True).start()
+        return self.urls[i], self.bodies[i]
+
+    def take_batch(self, n):
+        """n 条 {"url": ...} 拼成 /create/batch 的请求体"""
+        bodies = [self.take()[1] for _ in range(n)]
+        return b'{"items":[' + b",".join(bodies) + b"]}"
+
+
+_pools = {}
+_worker_prefix = None
+
+
+def get_shared_pool(length_dist=DEFAULT_URL_LENGTH, prefix=None, block_size=DEFAULT_BLOCK, expire_ratio=0.0):
+    """同一个进程内相同参数共用一个池，所有用户从同一个序号往下取"""
+    key = (length_dist, prefix, block_size, expire_ratio)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = PayloadPool(length_dist, prefix, block_size, expire_ratio)
+    return pool
+
+
+def add_arguments(parser):
+    parser.add_argument("--url-length", default=DEFAULT_URL_LENGTH,
+                        help="长链接长度分布: fixed:N | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA | mix:LEN:W:...")
+    parser.add_argument("--payload-block", type=int, default=DEFAULT_BLOCK, help="每块预生成的请求体条数")
+    parser.add_argument("--payload-prefix", default=None, help="URL 前缀，默认随机串加进程号")
+
+
+def pool_from_args(args, expire_ratio=0.0, seed=None):
+    return PayloadPool(args.url_length, args.payload_prefix, args.payload_block, expire_ratio, seed=seed)
+
+
+def install_locust_hooks(events):
+    """注册 --url-length / --payload-block / --payload-prefix"""
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--url-length", type=str, env_var="LOCUST_URL_LENGTH", default=DEFAULT_URL_LENGTH,
+                            help="长链接长度分布: fixed:N | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA | mix:LEN:W:...")
+        parser.add_argument("--payload-block", type=int, env_var="LOCUST_PAYLOAD_BLOCK", default=DEFAULT_BLOCK,
+                            help="每块预生成的请求体条数")
+        parser.add_argument("--payload-prefix", type=str, env_var="LOCUST_PAYLOAD_PREFIX", default=None,
+                            help="URL 前缀，默认随机串加 worker 编号")
+
+
+def pool_from_environment(environment, expire_ratio=0.0):
+    options = environment.parsed_options
+    if options is None:
+        return get_shared_pool(expire_ratio=expire_ratio)
+    global _worker_prefix
+    prefix = options.payload_prefix
+    if prefix is None:
+        if _worker_prefix is None:
+            # 分布式运行时 worker 编号由 master 分配，各 worker 不同
+            _worker_prefix = default_prefix(getattr(environment.runner, "worker_index", None))
+        prefix = _worker_prefix
+    return get_shared_pool(options.url_length, prefix, options.payload_block, expire_ratio)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import statistics
+
+    from request_mix import random_url
+
+    parser = argparse.ArgumentParser(description="预览 URL 长度分布，并对比预生成与逐请求生成的开销")
+    parser.add_argument("spec", nargs="?", default=DEFAULT_URL_LENGTH)
+    parser.add_argument("-n", type=int, default=100000, help="取用条数")
+    parser.add_argument("--block", type=int, default=DEFAULT_BLOCK)
+    parser.add_argument("--expire-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pool = PayloadPool(args.spec, block_size=args.block, expire_ratio=args.expire_ratio, seed=args.seed,
+                       background=False)
+    taken = [pool.take() for _ in range(args.n)]
+    pooled = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.n):
+        json.dumps({"url": random_url(k=12)}).encode()
+    inline = time.perf_counter() - start
+
+    lengths = [len(url) for url, _ in taken]
+    assert len(set(url for url, _ in taken)) == len(taken), "URL 重复"
+    print(f"分布 {args.spec}, {args.n} 条, 共 {pool.blocks} 块")
+    print(f"URL 长度: 最短 {min(lengths)} 中位 {statistics.median(lengths):.0f} 平均 {statistics.mean(lengths):.1f} "
+          f"最长 {max(lengths)}, 请求体共 {sum(len(b) for _, b in taken) / 1048576:.1f}MB")
+    print(f"预生成 {pooled / args.n * 1e6:.2f}us/条, 逐请求 random.choices + json.dumps {inline / args.n * 1e6:.2f}us/条")
+    print(f"示例: {taken[0][1][:120].decode()}")
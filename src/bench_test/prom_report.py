@@ -0,0 +1,353 @@
+"""
+把 Prometheus 里的服务端指标拉进压测报告，与压测端（客户端）的数据对照
+
+测试结束后按测试时间窗口并发发出所有 range / instant 查询，输出：
+  prom_report.json       窗口汇总：每个接口客户端 vs 服务端的 p50/p99 差值、缓存命中率、
+                         DB / Redis 耗时占比、各操作 p99、按类型的错误数，以及诊断提示
+  prom_timeseries.csv    每个 step 一行：服务端 RPS / p99、DB / Redis 耗时占比、缓存命中率、
+                         5xx 与各类错误的每秒速率、nginx / MySQL / Redis 吞吐，以及同一时刻的客户端 RPS / p99
+
+用来判断 p99 尖刺来自 MySQL、Redis、nginx 还是压测机本身：
+  客户端 p99 远大于服务端 p99  -> 时间花在服务外（nginx、网络、压测机 CPU 打满）
+  DB 耗时占比高 / DB p99 高     -> MySQL
+  Redis p99 高或缓存命中率低    -> Redis / 缓存策略
+
+# python prom_report.py report/20250101_120000 --prometheus-url http://192.168.1.3:9090
+# python prom_report.py report/20250101_120000 --start 2025-01-01T04:00:00 --end 2025-01-01T04:05:00 --step 5
+"""
+
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import math
+import os
+import time
+from urllib.parse import urlencode, urlsplit
+
+from async_http import HttpClient
+from latency_hist import HistogramSet
+from result_store import HISTORY_COLUMNS, iter_csv_rows
+from shortcode import parse_time
+
+DEFAULT_PROMETHEUS_URL = "http://localhost:9090"
+
+# 每个 step 一个值的时间序列，$W 替换为 rate 窗口
+SERIES_QUERIES = {
+    "server_rps": "sum(rate(http_requests_total[$W]))",
+    "server_p99_ms": "1000 * histogram_quantile(0.99, sum by (le) (rate(http_request_duration_seconds_bucket[$W])))",
+    "db_time_share": "sum(rate(database_operation_duration_seconds_sum[$W])) "
+                     "/ sum(rate(http_request_duration_seconds_sum[$W]))",
+    "cache_time_share": "sum(rate(cache_operation_duration_seconds_sum[$W])) "
+                        "/ sum(rate(http_request_duration_seconds_sum[$W]))",
+    "db_p99_ms": "1000 * histogram_quantile(0.99, sum by (le) (rate(database_operation_duration_seconds_bucket[$W])))",
+    "cache_p99_ms": "1000 * histogram_quantile(0.99, sum by (le) (rate(cache_operation_duration_seconds_bucket[$W])))",
+    "cache_hit_ratio": 'sum(rate(shorturl_queried_total{cache_hit="true"}[$W])) '
+                       "/ sum(rate(shorturl_queried_total[$W]))",
+    "http_5xx_rps": 'sum(rate(http_requests_total{status=~"5.."}[$W]))',
+    "nginx_rps": "sum(rate(nginx_http_requests_total[$W]))",
+    "mysql_qps": "sum(rate(mysql_global_status_queries[$W]))",
+    "redis_ops": "sum(rate(redis_commands_processed_total[$W]))",
+    "app_cpu_percent": "avg(cpu_usage_percent)",
+}
+
+# 带标签的时间序列，每个标签组合一列，列名为 前缀:标签值
+LABELED_SERIES_QUERIES = {
+    "errors": ("sum by (type, operation) (rate(errors_total[$W]))", ("type", "operation")),
+    "status": ("sum by (status) (rate(http_requests_total[$W]))", ("status",)),
+}
+
+# 整个窗口的汇总，$D 替换为窗口长度
+WINDOW_QUERIES = {
+    "endpoint_requests": ("sum by (endpoint) (increase(http_requests_total[$D]))", "endpoint"),
+    "endpoint_p50_ms": ("1000 * histogram_quantile(0.5, sum by (le, endpoint) "
+                        "(increase(http_request_duration_seconds_bucket[$D])))", "endpoint"),
+    "endpoint_p99_ms": ("1000 * histogram_quantile(0.99, sum by (le, endpoint) "
+                        "(increase(http_request_duration_seconds_bucket[$D])))", "endpoint"),
+    "db_p99_ms": ("1000 * histogram_quantile(0.99, sum by (le, operation) "
+                  "(increase(database_operation_duration_seconds_bucket[$D])))", "operation"),
+    "cache_p99_ms": ("1000 * histogram_quantile(0.99, sum by (le, operation) "
+                     "(increase(cache_operation_duration_seconds_bucket[$D])))", "operation"),
+    "db_seconds": ("sum(increase(database_operation_duration_seconds_sum[$D]))", None),
+    "cache_seconds": ("sum(increase(cache_operation_duration_seconds_sum[$D]))", None),
+    "http_seconds": ("sum(increase(http_request_duration_seconds_sum[$D]))", None),
+    "cache_hits": ('sum(increase(shorturl_queried_total{cache_hit="true"}[$D]))', None),
+    "queries": ("sum(increase(shorturl_queried_total[$D]))", None),
+    "errors": ("sum by (type, operation) (increase(errors_total[$D]))", ("type", "operation")),
+}
+
+
+def server_endpoint(client_name):
+    """客户端请求名 -> MonitoringMiddleware 归一化后的 endpoint 标签"""
+    if client_name.startswith("/create"):
+        return "/create"
+    if client_name.startswith("/u/"):
+        return "/redirect/{code}"
+    return client_name
+
+
+def to_float(value):
+    number = float(value)
+    return None if math.isnan(number) or math.isinf(number) else number
+
+
+class PrometheusClient:
+    """Prometheus HTTP API，所有查询复用同一个 keep-alive 连接池并发发出"""
+
+    def __init__(self, base_url=DEFAULT_PROMETHEUS_URL, max_connections=8, timeout=30.0):
+        self.prefix = urlsplit(base_url).path.rstrip("/")
+        self.client = HttpClient(base_url, max_connections=max_connections, timeout=timeout)
+
+    async def _get(self, api, params):
+        resp = await self.client.get(f"{self.prefix}/api/v1/{api}?{urlencode(params)}")
+        data = resp.json() if resp.body else {}
+        if resp.status != 200 or data.get("status") != "success":
+            raise RuntimeError(f"Prometheus 查询失败 HTTP {resp.status}: {data.get('error', resp.text[:200])}")
+        return data["data"]["result"]
+
+    async def query(self, expr, at):
+        return await self._get("query", {"query": expr, "time": f"{at:.3f}"})
+
+    async def query_range(self, expr, start, end, step):
+        return await self._get("query_range", {"query": expr, "start": f"{start:.3f}", "end": f"{end:.3f}",
+                                               "step": f"{step}s"})
+
+    async def close(self):
+        await self.client.close()
+
+
+async def gather_queries(prom, start, end, step, window):
+    """并发执行所有查询，单个查询失败（如没有部署对应 exporter）只记录错误"""
+    duration = f"{max(1, int(round(end - start)))}s"
+    jobs = {}
+    for key, expr in SERIES_QUERIES.items():
+        jobs[("series", key)] = prom.query_range(expr.replace("$W", window), start, end, step)
+    for key, (expr, _) in LABELED_SERIES_QUERIES.items():
+        jobs[("labeled", key)] = prom.query_range(expr.replace("$W", window), start, end, step)
+    for key, (expr, _) in WINDOW_QUERIES.items():
+        jobs[("window", key)] = prom.query(expr.replace("$D", duration), end)
+    results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+    data, errors = {}, {}
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            errors[job[1] if job[0] != "window" else f"window:{job[1]}"] = str(result)
+        else:
+            data[job] = result
+    return data, errors
+
+
+def label_value(metric, labels):
+    if isinstance(labels, str):
+        return metric.get(labels, "")
+    return "/".join(metric.get(label, "") for label in labels)
+
+
+def build_timeseries(data):
+    """range 查询结果 -> {时间戳: {列名: 值}}"""
+    rows = {}
+    for (kind, key), result in data.items():
+        if kind == "series":
+            for series in result:
+                for ts, value in series["values"]:
+                    rows.setdefault(int(ts), {})[key] = to_float(value)
+        elif kind == "labeled":
+            labels = LABELED_SERIES_QUERIES[key][1]
+            for series in result:
+                column = f"{key}:{label_value(series['metric'], labels)}"
+                for ts, value in series["values"]:
+                    rows.setdefault(int(ts), {})[column] = to_float(value)
+    return rows
+
+
+def build_window_summary(data):
+    summary = {}
+    for (kind, key), result in data.items():
+        if kind != "window":
+            continue
+        labels = WINDOW_QUERIES[key][1]
+        if labels is None:
+            summary[key] = to_float(result[0]["value"][1]) if result else None
+        else:
+            summary[key] = {label_value(s["metric"], labels): to_float(s["value"][1]) for s in result}
+    return summary
+
+
+def load_client_history(path, step):
+    """locust stats_history 的 Aggregated 行，按 step 对齐：{时间戳: (rps, p99_ms)}"""
+    history = {}
+    for record in iter_csv_rows(path, HISTORY_COLUMNS):
+        if record["name"] != "Aggregated" or record.get("ts") is None:
+            continue
+        bucket = int(record["ts"]) // step * step
+        history[bucket] = (record.get("rps"), record.get("p99_ms"))
+    return history
+
+
+def history_window(path):
+    """从 stats_history 流式读出测试的起止时间（秒）"""
+    start = end = None
+    for record in iter_csv_rows(path, {}):
+        ts = record.get("ts")
+        if ts is None:
+            continue
+        start = ts if start is None else min(start, ts)
+        end = ts if end is None else max(end, ts)
+    return start, end
+
+
+def compare_latency(client_hist, window):
+    """每个接口客户端与服务端的分位数差：差值 = 服务外（nginx、网络、压测机）消耗的时间"""
+    rows = {}
+    server_p50 = window.get("endpoint_p50_ms") or {}
+    server_p99 = window.get("endpoint_p99_ms") or {}
+    for name, hist in sorted(client_hist.histograms.items()):
+        s = hist.summary()
+        endpoint = server_endpoint(name)
+        row = {"endpoint": endpoint, "client_count": s["count"], "client_p50_ms": s["p50_ms"],
+               "client_p99_ms": s["p99_ms"], "server_p50_ms": server_p50.get(endpoint),
+               "server_p99_ms": server_p99.get(endpoint)}
+        if row["server_p99_ms"] is not None:
+            row["p50_gap_ms"] = round(s["p50_ms"] - (row["server_p50_ms"] or 0), 3)
+            row["p99_gap_ms"] = round(s["p99_ms"] - row["server_p99_ms"], 3)
+        rows[name] = row
+    return rows
+
+
+def ratio(numerator, denominator):
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+
+def diagnose(report):
+    """粗略的瓶颈判断，只给方向，不代替看曲线"""
+    hints = []
+    for name, row in report["latency"].items():
+        gap, client_p99 = row.get("p99_gap_ms"), row["client_p99_ms"]
+        if gap is not None and client_p99 and gap > 0.5 * client_p99:
+            hints.append(f"{name}: 客户端 p99 {client_p99:.1f}ms 中 {gap:.1f}ms 不在应用内，"
+                         f"检查 nginx、网络和压测机 CPU")
+    db_share, cache_share = report["db_time_share"], report["cache_time_share"]
+    if db_share is not None and db_share > 0.5:
+        hints.append(f"DB 操作占服务端耗时 {db_share * 100:.0f}%，瓶颈在 MySQL")
+    if cache_share is not None and cache_share > 0.3:
+        hints.append(f"Redis 操作占服务端耗时 {cache_share * 100:.0f}%，检查 Redis 延迟和连接数")
+    hit = report["cache_hit_ratio"]
+    if hit is not None and hit < 0.8:
+        hints.append(f"缓存命中率只有 {hit * 100:.1f}%，跳转请求大量落到 MySQL")
+    errors = {k: v for k, v in (report["window"].get("errors") or {}).items() if v}
+    if errors:
+        top = max(errors, key=errors.get)
+        hints.append(f"服务端错误 {sum(errors.values()):.0f} 次，最多的是 {top}（{errors[top]:.0f} 次）")
+    return hints
+
+
+async def build_report(prometheus_url, start, end, client_hist=None, history_path=None, step=5, window="1m"):
+    # 与客户端历史按 step 对齐
+    start = start // step * step
+    prom = PrometheusClient(prometheus_url)
+    try:
+        data, errors = await gather_queries(prom, start, end, step, window)
+    finally:
+        await prom.close()
+    summary = build_window_summary(data)
+    report = {
+        "prometheus_url": prometheus_url,
+        "start": start,
+        "end": end,
+        "step": step,
+        "rate_window": window,
+        "window": summary,
+        "db_time_share": ratio(summary.get("db_seconds"), summary.get("http_seconds")),
+        "cache_time_share": ratio(summary.get("cache_seconds"), summary.get("http_seconds")),
+        "cache_hit_ratio": ratio(summary.get("cache_hits"), summary.get("queries")),
+        "latency": compare_latency(client_hist, summary) if client_hist else {},
+        "query_errors": errors,
+    }
+    report["hints"] = diagnose(report)
+    timeseries = build_timeseries(data)
+    if history_path:
+        for ts, (rps, p99) in load_client_history(history_path, step).items():
+            if ts in timeseries:
+                timeseries[ts]["client_rps"] = rps
+                timeseries[ts]["client_p99_ms"] = p99
+    return report, timeseries
+
+
+def write_report(report, timeseries, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "prom_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    columns = ["client_rps", "client_p99_ms"] + list(SERIES_QUERIES)
+    columns += sorted({c for row in timeseries.values() for c in row} - set(columns))
+    with open(os.path.join(out_dir, "prom_timeseries.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp"] + columns)
+        for ts in sorted(timeseries):
+            row = timeseries[ts]
+            writer.writerow([ts] + ["" if row.get(c) is None else round(row[c], 4) for c in columns])
+
+
+def fmt(value, spec=".2f"):
+    return "-" if value is None else format(value, spec)
+
+
+def fmt_percent(value):
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def print_report(report):
+    print(f"\n📡 服务端指标（{time.strftime('%H:%M:%S', time.localtime(report['start']))} - "
+          f"{time.strftime('%H:%M:%S', time.localtime(report['end']))}）")
+    if report["latency"]:
+        print(f"{'接口':<20}{'客户端p50':>11}{'服务端p50':>11}{'客户端p99':>11}{'服务端p99':>11}{'p99差值':>10}  (ms)")
+        for name, row in report["latency"].items():
+            print(f"{name:<20}{fmt(row['client_p50_ms']):>11}{fmt(row['server_p50_ms']):>11}"
+                  f"{fmt(row['client_p99_ms']):>11}{fmt(row['server_p99_ms']):>11}{fmt(row.get('p99_gap_ms')):>10}")
+    print(f"缓存命中率 {fmt_percent(report['cache_hit_ratio'])}, DB 耗时占比 {fmt_percent(report['db_time_share'])}, "
+          f"Redis 耗时占比 {fmt_percent(report['cache_time_share'])}")
+    for key, title in (("db_p99_ms", "DB"), ("cache_p99_ms", "Redis")):
+        ops = report["window"].get(key) or {}
+        if ops:
+            print(f"{title} 各操作 p99: " + ", ".join(f"{op} {fmt(v)}ms" for op, v in sorted(ops.items())))
+    for hint in report["hints"]:
+        print(f"⚠️  {hint}")
+    if report["query_errors"]:
+        print(f"（{len(report['query_errors'])} 个查询失败，详见 prom_report.json 的 query_errors）")
+
+
+def report_run_dir(run_dir, prometheus_url=DEFAULT_PROMETHEUS_URL, start=None, end=None, step=5, window="1m"):
+    """对一个 report/<时间戳> 目录生成报告；时间窗口默认取 stats_history 的首尾"""
+    history = sorted(glob.glob(os.path.join(run_dir, "*_stats_history.csv")))
+    history_path = history[0] if history else None
+    if (start is None or end is None) and history_path:
+        first, last = history_window(history_path)
+        start = first if start is None else start
+        end = last if end is None else end
+    if start is None or end is None:
+        raise ValueError(f"{run_dir} 没有 stats_history，需要指定 --start / --end")
+    hist_files = sorted(glob.glob(os.path.join(run_dir, "*_latency_hist.json")))
+    client_hist = HistogramSet.load(hist_files[0]) if hist_files else None
+    report, timeseries = asyncio.run(build_report(prometheus_url, start, end, client_hist, history_path,
+                                                  step, window))
+    write_report(report, timeseries, run_dir)
+    print_report(report)
+    print(f"📄 已写入 {run_dir}/prom_report.json 和 prom_timeseries.csv")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成与 Prometheus 服务端指标对照的压测报告")
+    parser.add_argument("run_dir", help="report/<时间戳> 目录")
+    parser.add_argument("--prometheus-url", default=DEFAULT_PROMETHEUS_URL)
+    parser.add_argument("--start", help="窗口开始：unix 秒/毫秒 或 ISO（UTC），默认取 stats_history")
+    parser.add_argument("--end", help="窗口结束")
+    parser.add_argument("--step", type=int, default=5, help="时间序列步长（秒）")
+    parser.add_argument("--rate-window", default="1m", help="rate() 窗口，至少为抓取间隔的 2 倍")
+    args = parser.parse_args()
+
+    report_run_dir(args.run_dir, args.prometheus_url,
+                   parse_time(args.start) / 1000 if args.start else None,
+                   parse_time(args.end) / 1000 if args.end else None,
+                   args.step, args.rate_window)
@@ -0,0 +1,19 @@
+"""
+v2_test.py 与独立压测驱动（open_loop.py 等）共用的请求比例
+
+创建一个短链，可能对应从数据库中读取10个短链的操作，这个可能命中数据库，也可能命中redis缓存
+"""
+
+import random
+import string
+
+CREATE_WEIGHT = 1
+READ_WEIGHT_BY_FILE = 10
+READ_WEIGHT = 189
+
+URL_CHARS = string.ascii_letters + string.digits
+
+
+def random_url(rng=random, k=8):
+    """与 locustfile 相同格式的随机长链接"""
+    return "https://www.example.com" + ''.join(rng.choices(URL_CHARS, k=k))
@@ -0,0 +1,391 @@
+"""
+压测结果仓库：把每次 report/<时间戳>/ 下的结果导入本地 SQLite，做跨版本、跨提交的回归对比
+
+导入内容：
+  report_stats.csv          每个接口的汇总（runs_stats 表）
+  report_stats_history.csv  每秒一行的历史曲线（history 表），逐行流式读取、分批写入，千万行也不占内存
+  *_latency_hist.json       latency_hist 的直方图，保存原始编码和分位数（histograms 表）
+  run.json                  run_distributed.py 记录的运行参数（作为 config 存入 runs 表）和启动时的 git 提交
+
+每次运行按 服务版本（v1/v2/v3）、git 提交、配置 标记，对比命令发现吞吐下降或 p99 上升超过阈值时返回非 0，
+可以直接放进 CI 或脚本里。
+
+# python result_store.py ingest report/20250101_120000 --service v3
+# python result_store.py ingest report/* --service v2_mysql        # 已导入的目录会跳过
+# python result_store.py list --service v3
+# python result_store.py compare 20250101_120000 20250102_090000 --rps-drop 5 --p99-rise 10
+"""
+
+import argparse
+import base64
+import csv
+import glob
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from latency_hist import LatencyHistogram
+
+DEFAULT_DB = os.path.join("report", "results.db")
+HISTORY_BATCH = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    service TEXT,
+    git_commit TEXT,
+    label TEXT,
+    config TEXT,
+    started TEXT,
+    ingested TEXT
+);
+CREATE TABLE IF NOT EXISTS runs_stats (
+    run_id INTEGER NOT NULL,
+    type TEXT,
+    name TEXT NOT NULL,
+    requests INTEGER,
+    failures INTEGER,
+    rps REAL,
+    failures_s REAL,
+    avg_ms REAL,
+    min_ms REAL,
+    max_ms REAL,
+    p50_ms REAL,
+    p90_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    p999_ms REAL,
+    PRIMARY KEY (run_id, type, name)
+);
+CREATE TABLE IF NOT EXISTS history (
+    run_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    users INTEGER,
+    type TEXT,
+    name TEXT,
+    rps REAL,
+    failures_s REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    total_requests INTEGER,
+    total_failures INTEGER
+);
+CREATE INDEX IF NOT EXISTS history_run_name ON history (run_id, name, ts);
+CREATE TABLE IF NOT EXISTS histograms (
+    run_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER,
+    mean_ms REAL,
+    p50_ms REAL,
+    p90_ms REAL,
+    p99_ms REAL,
+    p999_ms REAL,
+    p9999_ms REAL,
+    max_ms REAL,
+    encoded BLOB,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+# locust CSV 列名 -> 表字段
+STATS_COLUMNS = {
+    "Request Count": "requests", "Failure Count": "failures", "Requests/s": "rps", "Failures/s": "failures_s",
+    "Average Response Time": "avg_ms", "Min Response Time": "min_ms", "Max Response Time": "max_ms",
+    "50%": "p50_ms", "90%": "p90_ms", "95%": "p95_ms", "99%": "p99_ms", "99.9%": "p999_ms",
+}
+HISTORY_COLUMNS = {
+    "User Count": "users", "Requests/s": "rps", "Failures/s": "failures_s",
+    "50%": "p50_ms", "95%": "p95_ms", "99%": "p99_ms",
+    "Total Request Count": "total_requests", "Total Failure Count": "total_failures",
+}
+
+
+def connect(path=DEFAULT_DB):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def to_number(value):
+    """locust 用 N/A 和空串表示没有数据"""
+    if value in (None, "", "N/A"):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def find_file(run_dir, pattern):
+    matches = sorted(glob.glob(os.path.join(run_dir, pattern)))
+    return matches[0] if matches else None
+
+
+def read_run_config(run_dir):
+    path = os.path.join(run_dir, "run.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def current_commit(cwd=None):
+    """当前仓库 HEAD（默认取本脚本所在仓库），不在 git 仓库中时返回 None"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=cwd or os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def iter_csv_rows(path, columns):
+    """逐行读取 locust CSV，只保留需要的列"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        index = {name: i for i, name in enumerate(header)}
+        picked = [(index[src], dst) for src, dst in columns.items() if src in index]
+        type_i, name_i, ts_i = index.get("Type"), index.get("Name"), index.get("Timestamp")
+        for row in reader:
+            if not row:
+                continue
+            record = {dst: to_number(row[i]) for i, dst in picked}
+            record["type"] = row[type_i] if type_i is not None else ""
+            record["name"] = row[name_i] if name_i is not None else ""
+            if ts_i is not None:
+                record["ts"] = to_number(row[ts_i])
+            yield record
+
+
+def ingest_stats(conn, run_id, path):
+    fields = ["type", "name"] + list(STATS_COLUMNS.values())
+    sql = f"INSERT OR REPLACE INTO runs_stats (run_id, {', '.join(fields)}) VALUES ({', '.join('?' * (len(fields) + 1))})"
+    rows = [(run_id, *(r.get(k) for k in fields)) for r in iter_csv_rows(path, STATS_COLUMNS)]
+    conn.executemany(sql, rows)
+    return len(rows)
+
+
+def ingest_history(conn, run_id, path, batch=HISTORY_BATCH):
+    fields = ["ts", "type", "name"] + list(HISTORY_COLUMNS.values())
+    sql = f"INSERT INTO history (run_id, {', '.join(fields)}) VALUES ({', '.join('?' * (len(fields) + 1))})"
+    total = 0
+    pending = []
+    for record in iter_csv_rows(path, HISTORY_COLUMNS):
+        pending.append((run_id, *(record.get(k) for k in fields)))
+        if len(pending) >= batch:
+            conn.executemany(sql, pending)
+            total += len(pending)
+            pending.clear()
+    if pending:
+        conn.executemany(sql, pending)
+        total += len(pending)
+    return total
+
+
+def ingest_histograms(conn, run_id, path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)["histograms"]
+    for name, blob in data.items():
+        encoded = base64.b64decode(blob)
+        s = LatencyHistogram.decode(encoded).summary()
+        conn.execute("INSERT OR REPLACE INTO histograms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (run_id, name, s["count"], s["mean_ms"], s["p50_ms"], s["p90_ms"], s["p99_ms"],
+                      s["p99.9_ms"], s["p99.99_ms"], s["max_ms"], encoded))
+    return len(data)
+
+
+def ingest_run(conn, run_dir, service=None, commit=None, label=None, name=None, replace=False):
+    """导入一个报告目录，返回 run_id；已存在且未指定 replace 时返回 None"""
+    run_dir = os.path.normpath(run_dir)
+    name = name or os.path.basename(run_dir)
+    existing = conn.execute("SELECT id FROM runs WHERE name = ?", (name,)).fetchone()
+    if existing:
+        if not replace:
+            return None
+        delete_run(conn, existing[0])
+
+    config = read_run_config(run_dir)
+    stats_path = find_file(run_dir, "*_stats.csv")
+    history_path = find_file(run_dir, "*_stats_history.csv")
+    hist_path = find_file(run_dir, "*_latency_hist.json")
+    if not (stats_path or history_path or hist_path):
+        raise FileNotFoundError(f"{run_dir} 下没有 locust CSV 或延迟直方图")
+
+    if commit == "HEAD":
+        commit = current_commit()
+        print(f"⚠️  {name} 使用导入时的 HEAD {commit or '?'} 作为被测提交，历史目录可能与实际代码不符")
+    elif not commit:
+        # 旧目录的 run.json 里没有提交号时记为 NULL，不拿导入时的 HEAD 猜
+        commit = config.get("git_commit")
+        if not commit:
+            print(f"⚠️  {name} 的 run.json 没有记录 git 提交，提交记为未知（可用 --commit 指定）")
+
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (name, path, service, git_commit, label, config, started, ingested) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, os.path.abspath(run_dir), service, commit, label,
+             json.dumps(config, ensure_ascii=False) if config else None, config.get("started"),
+             time.strftime("%Y-%m-%d %H:%M:%S")))
+        run_id = cur.lastrowid
+        counts = {
+            "stats": ingest_stats(conn, run_id, stats_path) if stats_path else 0,
+            "history": ingest_history(conn, run_id, history_path) if history_path else 0,
+            "histograms": ingest_histograms(conn, run_id, hist_path) if hist_path else 0,
+        }
+    print(f"✅ 导入 {name} (run {run_id}): 汇总 {counts['stats']} 行, 历史 {counts['history']} 行, "
+          f"直方图 {counts['histograms']} 个")
+    if not service:
+        # 同一个 locustfile 会压 v2 / v2_mysql / v3，无法从文件名推断，宁可记为未知
+        print(f"⚠️  {name} 未指定 --service，服务版本记为未知，按版本对比时不会被选中")
+    return run_id
+
+
+def delete_run(conn, run_id):
+    with conn:
+        for table in ("runs_stats", "history", "histograms"):
+            conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+
+def resolve_run(conn, key):
+    """按名称、id 或 'latest[:service]' 查找 run"""
+    if key.startswith("latest"):
+        _, _, service = key.partition(":")
+        sql = "SELECT * FROM runs" + (" WHERE service = ?" if service else "") + " ORDER BY id DESC LIMIT 1"
+        cur = conn.execute(sql, (service,) if service else ())
+    else:
+        cur = conn.execute("SELECT * FROM runs WHERE name = ? OR CAST(id AS TEXT) = ?", (key, key))
+    row = cur.fetchone()
+    if row is None:
+        raise KeyError(f"找不到运行记录: {key}")
+    return dict(zip([c[0] for c in cur.description], row))
+
+
+def endpoint_metrics(conn, run_id):
+    """每个接口的吞吐和延迟；p99 优先用直方图（精确），没有时用 locust 的近似值"""
+    metrics = {}
+    for name, rps, requests, failures, p99 in conn.execute(
+            "SELECT name, rps, requests, failures, p99_ms FROM runs_stats WHERE run_id = ?", (run_id,)):
+        metrics[name] = {"rps": rps, "requests": requests, "failures": failures, "p99_ms": p99}
+    for name, count, p99 in conn.execute("SELECT name, count, p99_ms FROM histograms WHERE run_id = ?", (run_id,)):
+        entry = metrics.setdefault(name, {"rps": None, "requests": count, "failures": None})
+        entry["p99_ms"] = p99
+    # 稳定阶段的吞吐：history 里去掉首尾 10% 的时间后取平均，在 SQL 里聚合，不把历史读进内存
+    for name, steady in conn.execute(
+            "SELECT h.name, AVG(h.rps) FROM history h "
+            "JOIN (SELECT name, MIN(ts) AS t0, MAX(ts) AS t1 FROM history WHERE run_id = ? GROUP BY name) r "
+            "ON h.name = r.name "
+            "WHERE h.run_id = ? AND h.ts BETWEEN r.t0 + (r.t1 - r.t0) * 0.1 AND r.t1 - (r.t1 - r.t0) * 0.1 "
+            "GROUP BY h.name", (run_id, run_id)):
+        if name in metrics and steady is not None:
+            metrics[name]["steady_rps"] = steady
+    return metrics
+
+
+def pct_change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare_runs(conn, base_key, new_key, rps_drop=5.0, p99_rise=10.0):
+    """返回 (报告行, 是否有回归)"""
+    base, new = resolve_run(conn, base_key), resolve_run(conn, new_key)
+    base_m, new_m = endpoint_metrics(conn, base["id"]), endpoint_metrics(conn, new["id"])
+    rows = []
+    regressed = False
+    for name in sorted(set(base_m) & set(new_m)):
+        b, n = base_m[name], new_m[name]
+        # 有 history 时用稳定阶段吞吐，避免爬坡阶段影响
+        b_rps, n_rps = b.get("steady_rps", b["rps"]), n.get("steady_rps", n["rps"])
+        rps_delta = pct_change(b_rps, n_rps)
+        p99_delta = pct_change(b.get("p99_ms"), n.get("p99_ms"))
+        flags = []
+        if rps_delta is not None and rps_delta < -rps_drop:
+            flags.append("吞吐下降")
+        if p99_delta is not None and p99_delta > p99_rise:
+            flags.append("p99 上升")
+        regressed = regressed or bool(flags)
+        rows.append((name, b_rps, n_rps, rps_delta, b.get("p99_ms"), n.get("p99_ms"), p99_delta, flags))
+    return base, new, rows, regressed
+
+
+def fmt(value, spec=".1f"):
+    return "-" if value is None else format(value, spec)
+
+
+def print_comparison(base, new, rows):
+    print(f"基准 {base['name']} ({base['service'] or '?'} @ {base['git_commit'] or '?'})  ->  "
+          f"对比 {new['name']} ({new['service'] or '?'} @ {new['git_commit'] or '?'})")
+    print(f"{'接口':<24}{'RPS 基准':>12}{'RPS 对比':>12}{'变化%':>9}{'p99 基准':>12}{'p99 对比':>12}{'变化%':>9}  结论")
+    for name, b_rps, n_rps, rps_delta, b_p99, n_p99, p99_delta, flags in rows:
+        verdict = "❌ " + "、".join(flags) if flags else "✅"
+        print(f"{name:<24}{fmt(b_rps):>12}{fmt(n_rps):>12}{fmt(rps_delta, '+.1f'):>9}"
+              f"{fmt(b_p99, '.2f'):>12}{fmt(n_p99, '.2f'):>12}{fmt(p99_delta, '+.1f'):>9}  {verdict}")
+
+
+def list_runs(conn, service=None, limit=20):
+    sql = ("SELECT r.id, r.name, r.service, r.git_commit, r.label, s.rps, s.p99_ms FROM runs r "
+           "LEFT JOIN runs_stats s ON s.run_id = r.id AND s.name = 'Aggregated'")
+    params = ()
+    if service:
+        sql += " WHERE r.service = ?"
+        params = (service,)
+    sql += " ORDER BY r.id DESC LIMIT ?"
+    print(f"{'id':>5}  {'名称':<20}{'服务':<6}{'提交':<10}{'RPS':>10}{'p99(ms)':>10}  标签")
+    for run_id, name, svc, commit, label, rps, p99 in conn.execute(sql, params + (limit,)):
+        print(f"{run_id:>5}  {name:<20}{svc or '-':<6}{commit or '-':<10}{fmt(rps):>10}{fmt(p99):>10}  {label or ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="压测结果仓库")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite 文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="导入报告目录")
+    p_ingest.add_argument("dirs", nargs="+")
+    p_ingest.add_argument("--service", help="服务版本 v1/v2/v2_mysql/v3，不指定则记为未知")
+    p_ingest.add_argument("--commit", help="被测代码的 git 提交，默认取 run.json 中启动时记录的提交；"
+                                             "HEAD 表示用导入时的仓库 HEAD")
+    p_ingest.add_argument("--label", help="备注，如配置说明")
+    p_ingest.add_argument("--replace", action="store_true", help="已导入的目录重新导入")
+    p_list = sub.add_parser("list", help="列出已导入的运行")
+    p_list.add_argument("--service")
+    p_list.add_argument("--limit", type=int, default=20)
+    p_compare = sub.add_parser("compare", help="对比两次运行，有回归时退出码为 1")
+    p_compare.add_argument("base", help="基准运行：名称、id 或 latest[:service]")
+    p_compare.add_argument("new", help="对比运行")
+    p_compare.add_argument("--rps-drop", type=float, default=5.0, help="吞吐下降超过该百分比视为回归")
+    p_compare.add_argument("--p99-rise", type=float, default=10.0, help="p99 上升超过该百分比视为回归")
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    if args.command == "ingest":
+        for run_dir in args.dirs:
+            if not os.path.isdir(run_dir):
+                continue
+            try:
+                if ingest_run(db, run_dir, args.service, args.commit, args.label, replace=args.replace) is None:
+                    print(f"⏭️  {run_dir} 已导入，跳过（--replace 重新导入）")
+            except FileNotFoundError as e:
+                print(f"⚠️  {e}")
+    elif args.command == "list":
+        list_runs(db, args.service, args.limit)
+    else:
+        base_run, new_run, result, has_regression = compare_runs(db, args.base, args.new, args.rps_drop,
+                                                                 args.p99_rise)
+        print_comparison(base_run, new_run, result)
+        sys.exit(1 if has_regression else 0)
@@ -0,0 +1,164 @@
+"""
+分布式 locust 启动器（Linux，替代 startbatch_4_worker.bat）
+
+- 启动 1 个 master + N 个 worker，N 默认等于 CPU 核数
+- 每个 worker 绑定到一个 CPU（sched_setaffinity），单个 locust 进程受 GIL 限制只能用满一个核
+- 不再 sleep 等待：先探测 master 端口可连接，再启动 worker，master 用 --expect-workers 等所有 worker 就绪
+- 每次运行写到 report/<时间戳>/ 目录：locust CSV、延迟直方图、各进程日志、运行参数和当前 git 提交
+- 指定 --prometheus-url 时，结束后拉取同一时间窗口的服务端指标写入报告目录（见 prom_report.py）
+
+# python run_distributed.py -f v1_test.py --host http://192.168.1.3:10086 -u 400 -r 100 --run-time 2m
+# python run_distributed.py -f v2_test.py --host http://192.168.1.3:10086 -u 1000 -r 500 --run-time 5m --workers 16 -- --key-dist zipf:1.1
+# 另一台压测机只启动 worker，连到已有 master：
+# python run_distributed.py -f v2_test.py --workers-only --master-host 192.168.1.10
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import prom_report
+from result_store import current_commit
+
+MASTER_PORT = 5557
+
+
+def make_report_dir(root="report"):
+    path = os.path.join(root, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def wait_for_port(host, port, timeout=30.0):
+    """等待 master 端口可以连接"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def pin_to_cpu(cpu):
+    """返回在子进程 exec 前绑定 CPU 的函数"""
+    def _pin():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {cpu})
+    return _pin
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def start_workers(args, extra, report_dir):
+    cpus = available_cpus()
+    workers = []
+    for i in range(args.workers):
+        cmd = ["locust", "-f", args.locustfile, "--worker",
+               "--master-host", args.master_host, "--master-port", str(args.master_port)] + extra
+        log = open(os.path.join(report_dir, f"worker_{i}.log"), "w", encoding="utf-8")
+        preexec = pin_to_cpu(cpus[i % len(cpus)]) if args.pin else None
+        workers.append((subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, preexec_fn=preexec), log))
+    return workers
+
+
+def stop_all(processes):
+    for proc, _ in processes:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + 10
+    for proc, log in processes:
+        try:
+            proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if log:
+            log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式 locust 启动器", epilog="-- 之后的参数原样传给 locust")
+    parser.add_argument("-f", "--locustfile", default="v1_test.py")
+    parser.add_argument("--host", default="http://localhost:10086", help="被测服务地址")
+    parser.add_argument("-u", "--users", type=int, default=400)
+    parser.add_argument("-r", "--spawn-rate", type=float, default=100)
+    parser.add_argument("--run-time", default="2m")
+    parser.add_argument("--workers", type=int, default=len(available_cpus()), help="worker 数量，默认等于 CPU 核数")
+    parser.add_argument("--no-pin", dest="pin", action="store_false", help="不绑定 CPU")
+    parser.add_argument("--master-host", default="127.0.0.1", help="worker 连接的 master 地址")
+    parser.add_argument("--master-port", type=int, default=MASTER_PORT)
+    parser.add_argument("--workers-only", action="store_true", help="只启动 worker，连接到已有的 master")
+    parser.add_argument("--report-root", default="report")
+    parser.add_argument("--prometheus-url", default="", help="结束后拉取服务端指标生成对照报告，留空则跳过")
+    parser.add_argument("--scrape-wait", type=float, default=15, help="生成报告前等待 Prometheus 抓取最后数据的秒数")
+    args, extra = parser.parse_known_args()
+    if extra and extra[0] == "--":
+        extra = extra[1:]
+
+    report_dir = make_report_dir(args.report_root)
+    with open(os.path.join(report_dir, "run.json"), "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "extra": extra, "started": datetime.now().isoformat(),
+                   "git_commit": current_commit()}, f, indent=2)
+
+    processes = []
+    try:
+        if args.workers_only:
+            processes = start_workers(args, extra, report_dir)
+            print(f"🚀 已启动 {args.workers} 个 worker -> {args.master_host}:{args.master_port}，日志在 {report_dir}")
+            for proc, _ in processes:
+                proc.wait()
+            return 0
+
+        master_cmd = ["locust", "-f", args.locustfile, "--master", "--headless",
+                      "--master-bind-port", str(args.master_port),
+                      "--expect-workers", str(args.workers),
+                      "-u", str(args.users), "-r", str(args.spawn_rate), "--run-time", args.run_time,
+                      "--host", args.host, "--csv", os.path.join(report_dir, "report")] + extra
+        master_log = open(os.path.join(report_dir, "master.log"), "w", encoding="utf-8")
+        master = subprocess.Popen(master_cmd, stdout=master_log, stderr=subprocess.STDOUT)
+        processes.append((master, master_log))
+        print(f"🚀 master 启动中: {' '.join(master_cmd)}")
+
+        if not wait_for_port("127.0.0.1", args.master_port):
+            print(f"❌ master 未在 {args.master_port} 端口就绪，查看 {report_dir}/master.log")
+            return 1
+        processes.extend(start_workers(args, extra, report_dir))
+        print(f"✅ 已启动 {args.workers} 个 worker（{'绑定 CPU' if args.pin else '未绑定 CPU'}），"
+              f"报告目录 {report_dir}")
+
+        warned = set()
+        while master.poll() is None:
+            time.sleep(1)
+            for i, (proc, _) in enumerate(processes[1:]):
+                if proc.poll() is not None and i not in warned:
+                    warned.add(i)
+                    print(f"⚠️  worker {i} 提前退出（退出码 {proc.returncode}），查看 {report_dir}/worker_{i}.log")
+        code = master.returncode
+        print(f"🎉 测试结束，master 退出码 {code}，结果在 {report_dir}")
+        if args.prometheus_url:
+            time.sleep(args.scrape_wait)
+            try:
+                prom_report.report_run_dir(report_dir, args.prometheus_url)
+            except Exception as e:
+                print(f"⚠️  服务端指标报告生成失败: {e}")
+        return code
+    except KeyboardInterrupt:
+        print("\n⏹️  收到中断，停止所有进程")
+        return 130
+    finally:
+        stop_all(processes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
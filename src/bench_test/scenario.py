@@ -0,0 +1,566 @@
+"""
+按场景文件分阶段压测：爬升、长时间浸泡、突刺、昼夜周期
+
+locust 的 -u/-r/--run-time 只能描述一条平线，而线上的问题往往出在昼夜波动、突发流量和持续压力之后
+（docker-distributed/性能排查.md 里的连接池、缓冲区问题都是压了一段时间才出现）。
+场景文件（JSON）按顺序列出阶段，每个阶段可以指定：
+  name        阶段名，所有指标都带上它
+  duration    时长，数字（秒）或 "90s" / "30m" / "12h" / "1d"
+  rps         目标到达率（独立运行，开环，见 open_loop.py）
+  users       并发用户数（locust；独立运行时没有 rps 则按闭环 users 个循环发请求）
+  spawn_rate  locust 每秒启动 / 停止的用户数
+  mix         请求比例 {"create": 1, "read": 189, "read_file": 10}，没写的操作为 0；默认同 request_mix.py
+  key_dist    读请求 key 分布，见 key_dist.py
+  arrival     开环到达模型 constant / poisson
+rps 和 users 的取值：
+  5000                                        固定值
+  [1000, 8000]                                阶段内从 1000 线性变到 8000（爬升 / 下降）
+  {"min": 1000, "max": 8000, "period": "24h"} 余弦昼夜曲线，从 min 开始，period / 2 处到达 max；
+                                              可加 "offset": "6h" 平移起点
+"defaults" 里的字段是所有阶段的默认值，"repeat": N 把整组阶段重复 N 次（阶段名加 #2、#3 ...）。
+示例见 scenarios/ 目录。
+
+两种执行方式：
+  - 独立运行（本文件）：开环的到达过程（或闭环的用户循环）整场不中断，每 --slice 秒按片中点的目标值
+    调整到达率（或用户数），爬升和昼夜曲线变成台阶；完成的请求按完成时刻分片统计，切片边界不会停下来等慢请求。每片写一行时间线 CSV（边跑边写，12 小时的浸泡中途也能看），
+    结束时按阶段汇总，并对比阶段首尾切片，连接池泄漏、缓存膨胀之类的慢性问题会表现为同一阶段内延迟越来越高
+  - locust：再加一个 locustfile scenario_shape.py，由 master 按阶段调节用户数，并把阶段
+    （名称、请求比例、key 分布）发给各 worker：请求比例通过替换用户类的任务列表实现，
+    key 分布通过 key_dist.PhaseSelector 切换；结束时 master 按阶段输出请求数、RPS、分位数
+开启 --metrics-port 时请求指标带 phase 标签（见 metrics_exporter.py），Grafana 里可以按阶段对比。
+
+# python scenario.py --host http://localhost:10086 --scenario scenarios/diurnal_soak.json --csv report/soak
+# locust -f v2_test.py,scenario_shape.py --headless --host=http://192.168.1.3:10086 --scenario scenarios/diurnal_soak.json --csv report/soak
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import time
+
+import key_dist
+import metrics_exporter
+import payload_pool
+import trace_sampler
+from alias_store import ALIAS_STORE_FILE, AliasStore
+from async_http import HttpClient
+from latency_hist import LatencyHistogram
+from open_loop import OP_CREATE, OP_READ, OP_READ_FILE, OpenLoopDriver
+from request_mix import CREATE_WEIGHT, READ_WEIGHT, READ_WEIGHT_BY_FILE
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+DEFAULT_MIX = {"create": CREATE_WEIGHT, "read": READ_WEIGHT, "read_file": READ_WEIGHT_BY_FILE}
+MIX_OPS = {"create": OP_CREATE, "read": OP_READ, "read_file": OP_READ_FILE}
+DEFAULT_SPAWN_RATE = 100
+DEFAULT_SLICE = 10.0
+PHASE_MESSAGE = "scenario_phase"
+PHASE_RESEND = 10.0  # master 定期重发当前阶段，中途加入的 worker 也能收到
+TASK_SLOTS = 1000  # locust 任务列表按权重展开的总长度
+# locustfile 中各类请求对应的任务函数名，缺少 read_file 时（v1_test.py）算作 read
+LOCUST_TASKS = {"create": "create_short_url", "read": "visit_short_url", "read_file": "visit_short_url_from_file"}
+
+
+def parse_duration(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+class Target:
+    """阶段内随时间变化的目标值（RPS 或用户数）"""
+
+    def __init__(self, kind, start, end=None, period=None, offset=0.0):
+        self.kind = kind
+        self.start = start
+        self.end = start if end is None else end
+        self.period = period
+        self.offset = offset
+
+    def value_at(self, t, duration):
+        if self.kind == "ramp":
+            return self.start + (self.end - self.start) * min(1.0, t / duration if duration else 1.0)
+        if self.kind == "diurnal":
+            angle = 2 * math.pi * (t + self.offset) / self.period
+            return self.start + (self.end - self.start) * (1 - math.cos(angle)) / 2
+        return self.start
+
+    def describe(self):
+        if self.kind == "ramp":
+            return f"{self.start:g} → {self.end:g}"
+        if self.kind == "diurnal":
+            return f"{self.start:g} ~ {self.end:g} / {self.period:g}s"
+        return f"{self.start:g}"
+
+
+def parse_target(value, where):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return Target("constant", float(value))
+    if isinstance(value, list) and len(value) == 2:
+        return Target("ramp", float(value[0]), float(value[1]))
+    if isinstance(value, dict) and {"min", "max", "period"} <= set(value):
+        return Target("diurnal", float(value["min"]), float(value["max"]), parse_duration(value["period"]),
+                      parse_duration(value.get("offset", 0)))
+    raise ValueError(f"{where} 无效: {value!r}")
+
+
+class Phase:
+    def __init__(self, spec, defaults, index):
+        spec = dict(defaults, **spec)
+        self.name = str(spec.get("name") or f"phase{index + 1}")
+        if "duration" not in spec:
+            raise ValueError(f"阶段 {self.name} 缺少 duration")
+        self.duration = parse_duration(spec["duration"])
+        self.rps = parse_target(spec.get("rps"), f"阶段 {self.name} 的 rps")
+        self.users = parse_target(spec.get("users"), f"阶段 {self.name} 的 users")
+        if self.rps is None and self.users is None:
+            raise ValueError(f"阶段 {self.name} 需要 rps 或 users")
+        self.spawn_rate = float(spec.get("spawn_rate", DEFAULT_SPAWN_RATE))
+        # 指定了 mix 时没写的操作权重为 0
+        self.mix = dict(dict.fromkeys(MIX_OPS, 0), **spec["mix"]) if "mix" in spec else dict(DEFAULT_MIX)
+        unknown = set(self.mix) - set(MIX_OPS)
+        if unknown:
+            raise ValueError(f"阶段 {self.name} 的 mix 有未知操作: {sorted(unknown)}")
+        self.key_dist = spec.get("key_dist", key_dist.DEFAULT_KEY_DIST)
+        key_dist.parse_key_dist(self.key_dist)  # 提前校验
+        self.arrival = spec.get("arrival", "poisson")
+
+    def weights(self):
+        return tuple((MIX_OPS[name], weight) for name, weight in self.mix.items() if weight > 0)
+
+    def describe(self):
+        target = " | ".join(f"{name} {value.describe()}" for name, value in (("rps", self.rps), ("users", self.users))
+                            if value is not None)
+        mix = ":".join(f"{self.mix[k]:g}" for k in MIX_OPS)
+        return f"{self.name} {self.duration:g}s {target} | 比例 {mix} | key {self.key_dist}"
+
+    def to_message(self):
+        """发给 locust worker 的阶段信息"""
+        return {"name": self.name, "mix": self.mix, "key_dist": self.key_dist}
+
+
+class Scenario:
+    def __init__(self, spec, name=""):
+        self.name = spec.get("name") or name
+        defaults = spec.get("defaults", {})
+        specs = spec.get("phases") or []
+        if not specs:
+            raise ValueError("场景文件没有阶段")
+        self.phases = []
+        for cycle in range(int(spec.get("repeat", 1))):
+            for i, phase_spec in enumerate(specs):
+                phase = Phase(phase_spec, defaults, i)
+                if cycle:
+                    phase.name = f"{phase.name}#{cycle + 1}"
+                self.phases.append(phase)
+        self.duration = sum(p.duration for p in self.phases)
+
+    def phase_at(self, elapsed):
+        """返回 (阶段下标, 阶段, 阶段内已过秒数)，全部结束返回 None"""
+        for i, phase in enumerate(self.phases):
+            if elapsed < phase.duration:
+                return i, phase, elapsed
+            elapsed -= phase.duration
+        return None
+
+    def print_plan(self):
+        print(f"📋 场景 {self.name}: {len(self.phases)} 个阶段，共 {format_duration(self.duration)}")
+        for phase in self.phases:
+            print(f"   {phase.describe()}")
+
+
+def load_scenario(path):
+    with open(path, encoding="utf-8") as f:
+        return Scenario(json.load(f), os.path.splitext(os.path.basename(path))[0])
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+class PhaseStats:
+    """一个阶段所有切片的合并结果，延迟用直方图累计，长时间运行内存不增长"""
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.hist = LatencyHistogram()
+        self.duration = 0.0
+        self.sent = 0
+        self.succeeded = 0
+        self.finished = 0  # 完成（含丢弃）的请求，错误率的分母
+        self.errors = 0
+        self.slices = 0
+        self.first = self.last = None  # 首尾切片的 summary
+
+    def add(self, result, summary):
+        self.duration += result.duration
+        self.sent += result.sent + result.dropped
+        self.succeeded += result.succeeded
+        self.finished += result.completed + result.dropped
+        self.errors += result.error_count
+        for values in result.latencies.values():
+            for value in values:
+                self.hist.record(int(value * 1000))
+        self.slices += 1
+        self.first = self.first or summary
+        self.last = summary
+
+    def summary(self):
+        lat = self.hist.summary()
+        first, last = self.first or {}, self.last or {}
+        return {
+            "phase": self.phase.name,
+            "duration_s": round(self.duration, 1),
+            "sent": self.sent,
+            "achieved_rps": round(self.succeeded / self.duration, 1) if self.duration else 0.0,
+            "error_rate": round(self.errors / self.finished * 100, 3) if self.finished else 0.0,
+            "p50_ms": round(lat["p50_ms"], 2),
+            "p99_ms": round(lat["p99_ms"], 2),
+            "p999_ms": round(lat["p99.9_ms"], 2),
+            "max_ms": round(lat["max_ms"], 2),
+            # 阶段首尾切片，浸泡阶段里看延迟 / 吞吐是否随时间劣化
+            "first_p99_ms": first.get("p99_ms"),
+            "last_p99_ms": last.get("p99_ms"),
+            "first_rps": first.get("achieved_rps"),
+            "last_rps": last.get("achieved_rps"),
+        }
+
+
+def print_phase_table(rows):
+    print(f"\n{'阶段':<16}{'时长':>10}{'请求':>12}{'RPS':>10}{'错误%':>8}{'p50':>9}{'p99':>9}{'p99.9':>9}"
+          f"{'首片p99':>10}{'末片p99':>10}  (ms)")
+    for r in rows:
+        print(f"{r['phase']:<16}{format_duration(r['duration_s']):>10}{r['sent']:>12}{r['achieved_rps']:>10}"
+              f"{r['error_rate']:>8}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['p999_ms']:>9}"
+              f"{r['first_p99_ms'] if r['first_p99_ms'] is not None else '-':>10}"
+              f"{r['last_p99_ms'] if r['last_p99_ms'] is not None else '-':>10}")
+
+
+TIMELINE_FIELDS = ["time", "elapsed_s", "phase", "mode", "target", "achieved_rps", "sent", "errors", "error_rate",
+                   "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms"]
+
+
+class ClosedUsers:
+    """闭环用户：每个循环发完一个再发下一个，人数随时可调；请求记入驱动的当前桶"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.target = 0
+        self.tasks = []
+
+    def set_users(self, users):
+        loop = asyncio.get_running_loop()
+        self.target = users
+        for i in range(users):
+            if i >= len(self.tasks):
+                self.tasks.append(loop.create_task(self.user(i)))
+            elif self.tasks[i].done():
+                self.tasks[i] = loop.create_task(self.user(i))
+
+    async def user(self, index):
+        loop = asyncio.get_running_loop()
+        driver = self.driver
+        # 人数减少时，编号超出的用户发完手上的请求再退出
+        while index < self.target:
+            driver.bucket.sent += 1
+            await driver.fire(driver.choose_op(), loop.time())
+
+    async def stop(self):
+        self.target = 0
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+
+def print_slice(name, mode, target, summary):
+    unit = "RPS" if mode == "rps" else "用户"
+    print(f"  {name:<12}目标 {target:>7} {unit:<4}| 实际 {summary['achieved_rps']:>9} RPS | "
+          f"错误 {summary['error_rate']:>6}% | p50 {summary['p50_ms']:>8}ms p99 {summary['p99_ms']:>8}ms "
+          f"p99.9 {summary['p999_ms']:>8}ms max {summary['max_ms']:>8}ms")
+
+
+async def run_scenario(scenario, driver, args, all_stats, metrics=None, timeline=None):
+    """逐阶段运行，每个阶段的 PhaseStats 追加到 all_stats（中断时已完成的部分仍然保留）"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    current = {"target": 0}
+    if metrics:
+        metrics.set_gauge("users", lambda: current["target"])
+    users = ClosedUsers(driver)
+    # 到达过程整场只启动一次，切片只调整到达率 / 用户数并取走这段时间完成的请求
+    driver.start(0)
+    try:
+        for phase in scenario.phases:
+            stats = PhaseStats(phase)
+            all_stats.append(stats)
+            driver.set_weights(phase.weights())
+            driver.selector = key_dist.get_selector(phase.key_dist, args.key_seed)
+            if metrics:
+                metrics.set_phase(phase.name)
+            print(f"\n▶️  [{format_duration(loop.time() - start)}] 阶段 {phase.describe()}")
+            phase_start = loop.time()
+            while True:
+                t = loop.time() - phase_start
+                if t >= phase.duration - 0.05:
+                    break
+                length = min(args.slice, phase.duration - t)
+                mid = t + length / 2
+                if phase.rps is not None:
+                    mode, target = "rps", max(1, int(phase.rps.value_at(mid, phase.duration)))
+                    users.set_users(0)
+                    driver.set_rate(target, phase.arrival)
+                else:
+                    mode, target = "users", max(1, int(phase.users.value_at(mid, phase.duration)))
+                    driver.set_rate(0)
+                    users.set_users(target)
+                current["target"] = target
+                await asyncio.sleep(max(0.0, phase_start + t + length - loop.time()))
+                result = driver.rotate()
+                result.target_rps = target if mode == "rps" else 0
+                summary = result.summary()
+                stats.add(result, summary)
+                print_slice(phase.name, mode, target, summary)
+                if timeline is not None:
+                    timeline.writerow(dict(summary, time=time.strftime("%Y-%m-%d %H:%M:%S"), phase=phase.name,
+                                           elapsed_s=round(loop.time() - start, 1), mode=mode, target=target))
+    finally:
+        # 场景结束后才完成的请求不再统计
+        await users.stop()
+        await driver.stop(drain=False)
+
+
+async def main_async(args):
+    scenario = load_scenario(args.scenario)
+    scenario.print_plan()
+    tracer = trace_sampler.tracer_from_args(args)
+    metrics = metrics_exporter.exporter_from_args(args, "scenario")
+    client = HttpClient(args.host, max_connections=args.connections, timeout=args.timeout, tracer=tracer,
+                        metrics=metrics)
+    file_aliases = AliasStore(args.alias_file)
+    driver = OpenLoopDriver(client, key_dist.get_selector(), file_aliases, args.max_outstanding, args.seed,
+                            payloads=payload_pool.pool_from_args(args, seed=args.seed))
+    timeline_file = timeline = None
+    if args.csv:
+        os.makedirs(os.path.dirname(os.path.abspath(args.csv)), exist_ok=True)
+        timeline_file = open(f"{args.csv}_timeline.csv", "w", newline="", encoding="utf-8", buffering=1)
+        timeline = csv.DictWriter(timeline_file, fieldnames=TIMELINE_FIELDS, extrasaction="ignore")
+        timeline.writeheader()
+    all_stats = []
+    try:
+        await run_scenario(scenario, driver, args, all_stats, metrics, timeline)
+    except asyncio.CancelledError:
+        # Ctrl+C：输出已完成的部分
+        print("\n⏹️  场景被中断")
+    finally:
+        await client.close()
+        if tracer:
+            tracer.close()
+        if metrics:
+            metrics.close()
+        if timeline_file:
+            timeline_file.close()
+    rows = [s.summary() for s in all_stats if s.slices]
+    print_phase_table(rows)
+    if args.csv:
+        with open(f"{args.csv}_phases.json", "w", encoding="utf-8") as f:
+            json.dump({"scenario": scenario.name, "file": args.scenario, "host": args.host,
+                       "finished": time.strftime("%Y-%m-%d %H:%M:%S"), "phases": rows}, f, indent=2,
+                      ensure_ascii=False)
+        print(f"📄 结果已写入 {args.csv}_timeline.csv 和 {args.csv}_phases.json")
+    return rows
+
+
+# ---------------------------------------------------------------- locust
+
+_locust_run = None
+
+
+class LocustScenario:
+    """在 master（或单机 locust）上由 scenario_shape.ScenarioShape.tick() 驱动"""
+
+    def __init__(self, environment, scenario):
+        for phase in scenario.phases:
+            if phase.users is None:
+                raise ValueError(f"locust 下阶段 {phase.name} 需要 users")
+        self.environment = environment
+        self.scenario = scenario
+        self.index = None
+        self.sent_at = 0.0  # 上次发送阶段信息的时间
+        self.phase_started = None
+        self.snapshot = None
+        self.rows = []
+
+    def tick(self, run_time):
+        found = self.scenario.phase_at(run_time)
+        if found is None:
+            self.finish_phase()
+            return None
+        index, phase, t = found
+        now = time.monotonic()
+        changed = index != self.index
+        if changed:
+            self.finish_phase()
+            self.index = index
+            self.phase_started = now
+            self.snapshot = self.take_snapshot()
+            print(f"\n▶️  [{format_duration(run_time)}] 阶段 {phase.describe()}")
+        if changed or now - self.sent_at >= PHASE_RESEND:
+            self.sent_at = now
+            self.environment.runner.send_message(PHASE_MESSAGE, phase.to_message())
+        return max(0, round(phase.users.value_at(t, phase.duration))), phase.spawn_rate
+
+    def take_snapshot(self):
+        total = self.environment.stats.total
+        return total.num_requests, total.num_failures, dict(total.response_times)
+
+    def finish_phase(self):
+        """阶段结束：与阶段开始时的快照相减，得到本阶段的请求数和响应时间分布"""
+        if self.index is None or self.snapshot is None:
+            return
+        phase = self.scenario.phases[self.index]
+        requests, failures, times = self.snapshot
+        total = self.environment.stats.total
+        duration = time.monotonic() - self.phase_started
+        delta = {ms: count - times.get(ms, 0) for ms, count in total.response_times.items()}
+        count = total.num_requests - requests
+        self.rows.append({
+            "phase": phase.name,
+            "duration_s": round(duration, 1),
+            "requests": count,
+            "rps": round(count / duration, 1) if duration else 0.0,
+            "failure_rate": round((total.num_failures - failures) / count * 100, 3) if count else 0.0,
+            "p50_ms": delta_percentile(delta, 0.5),
+            "p99_ms": delta_percentile(delta, 0.99),
+            "p999_ms": delta_percentile(delta, 0.999),
+        })
+        self.snapshot = None
+
+    def print_rows(self):
+        print(f"\n{'阶段':<16}{'时长':>10}{'请求':>12}{'RPS':>10}{'失败%':>8}{'p50':>9}{'p99':>9}{'p99.9':>9}  (ms)")
+        for r in self.rows:
+            print(f"{r['phase']:<16}{format_duration(r['duration_s']):>10}{r['requests']:>12}{r['rps']:>10}"
+                  f"{r['failure_rate']:>8}{r['p50_ms']:>9}{r['p99_ms']:>9}{r['p999_ms']:>9}")
+
+
+def delta_percentile(times, q):
+    """locust 的 response_times 是 {取整后的毫秒: 次数}"""
+    total = sum(times.values())
+    if total <= 0:
+        return 0
+    rank = q * total
+    seen = 0
+    for ms in sorted(times):
+        seen += times[ms]
+        if seen >= rank:
+            return ms
+    return max(times)
+
+
+def locust_tick(environment, run_time):
+    global _locust_run
+    if _locust_run is None:
+        options = environment.parsed_options
+        if options is None or not options.scenario:
+            raise ValueError("使用 scenario_shape.py 时需要指定 --scenario")
+        scenario = load_scenario(options.scenario)
+        scenario.print_plan()
+        _locust_run = LocustScenario(environment, scenario)
+    return _locust_run.tick(run_time)
+
+
+def apply_mix(user_classes, mix):
+    """按比例重建用户类的任务列表，locust 每次从 user.tasks 中随机选下一个任务"""
+    total = sum(w for w in mix.values() if w > 0)
+    for user_class in user_classes:
+        functions = {op: getattr(user_class, name, None) for op, name in LOCUST_TASKS.items()}
+        if functions["read_file"] is None:
+            functions["read_file"] = functions["read"]
+        if functions["create"] is None and functions["read"] is None:
+            continue  # create_only_test.py / batch_create_test.py 只有一种请求
+        tasks = []
+        for op, weight in mix.items():
+            if weight > 0 and functions.get(op) is not None:
+                tasks += [functions[op]] * max(1, round(weight / total * TASK_SLOTS))
+        if tasks:
+            user_class.tasks = tasks
+
+
+_applied_phase = None
+
+
+def apply_phase(environment, data):
+    """worker（或单机 locust）收到阶段信息"""
+    global _applied_phase
+    metrics_exporter.set_phase(data["name"])
+    if _applied_phase == data:
+        return
+    _applied_phase = data
+    options = environment.parsed_options
+    key_dist.switch_phase(data["key_dist"], options.key_seed if options is not None else None)
+    apply_mix(environment.user_classes, data["mix"])
+    print(f"🔀 (pid {os.getpid()}) 进入阶段 {data['name']}")
+
+
+def install_locust_hooks(events):
+    """注册 --scenario；worker 接收阶段信息，master 结束时按阶段输出"""
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--scenario", type=str, env_var="LOCUST_SCENARIO", default="",
+                            help="场景文件（JSON，见 scenario.py），按阶段调节用户数、请求比例和 key 分布")
+
+    @events.init.add_listener
+    def on_init(environment, **kwargs):
+        from locust.runners import MasterRunner
+        if environment.runner is None or isinstance(environment.runner, MasterRunner):
+            return
+        environment.runner.register_message(
+            PHASE_MESSAGE, lambda msg, **kw: apply_phase(environment, msg.data))
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        if _locust_run is None:
+            return
+        _locust_run.finish_phase()
+        _locust_run.print_rows()
+        prefix = getattr(environment.parsed_options, "csv_prefix", None)
+        if prefix and _locust_run.rows:
+            with open(f"{prefix}_phases.csv", "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(_locust_run.rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(_locust_run.rows)
+            print(f"📄 阶段汇总已写入 {prefix}_phases.csv")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="按场景文件分阶段压测（爬升 / 浸泡 / 突刺 / 昼夜周期）")
+    parser.add_argument("--scenario", required=True, help="场景文件（JSON）")
+    parser.add_argument("--host", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--slice", type=float, default=DEFAULT_SLICE, help="切片秒数，变化的目标值按切片取台阶")
+    parser.add_argument("--connections", type=int, default=1000, help="连接池上限")
+    parser.add_argument("--max-outstanding", type=int, default=20000, help="未完成请求上限，超过的计为丢弃")
+    parser.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    parser.add_argument("--alias-file", default=ALIAS_STORE_FILE, help="二进制 alias 文件")
+    parser.add_argument("--key-seed", type=int, default=None, help="key 分布随机种子")
+    parser.add_argument("--seed", type=int, default=None, help="请求比例与到达间隔的随机种子")
+    parser.add_argument("--csv", default="", help="输出文件前缀，写入 <前缀>_timeline.csv 和 <前缀>_phases.json")
+    trace_sampler.add_arguments(parser)
+    metrics_exporter.add_arguments(parser)
+    payload_pool.add_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main_async(build_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,18 @@
+from locust import LoadTestShape, events
+import scenario
+
+# 按场景文件分阶段调节 locust 用户数（场景格式见 scenario.py），与任意一个 locustfile 一起加载：
+# locust -f v2_test.py,scenario_shape.py --headless --host=http://localhost:10086 --scenario scenarios/diurnal_soak.json
+# 分布式运行时 master 和 worker 都要加载本文件，master 按阶段调节用户数并把阶段信息发给 worker：
+# locust -f v2_test.py,scenario_shape.py --master --headless --host=http://192.168.1.3:10086 --scenario scenarios/diurnal_soak.json --csv report/soak
+# locust -f v2_test.py,scenario_shape.py --worker --master-host=192.168.1.3
+# 有场景时 -u / -r 不生效，所有阶段结束后自动停止；--run-time 仍然会提前结束测试，
+# 用 run_distributed.py 时要设成不短于场景总时长：
+# python run_distributed.py -f v2_test.py,scenario_shape.py --host http://192.168.1.3:10086 --run-time 13h -- --scenario scenarios/diurnal_soak.json
+
+scenario.install_locust_hooks(events)
+
+
+class ScenarioShape(LoadTestShape):
+    def tick(self):
+        return scenario.locust_tick(self.runner.environment, self.get_run_time())
@@ -0,0 +1,203 @@
+"""
+读压测前的批量预灌数据工具
+
+按固定的并发上限持续调用 /create（或 --batch-size > 0 时调用 /create/batch），
+把得到的 alias 以 alias_store 的二进制格式追加到文件，locustfile 直接使用。
+
+- 断点续跑：alias 文件本身就是进度（记录数 = 已完成数），另写一份 checkpoint json 记录参数和统计；
+  中断后用相同命令重跑会从已完成的数量继续
+- 长链接按序号确定生成，续跑时从 checkpoint 的序号之后继续，尽量不与已写入的记录重复
+- 批量模式默认带 cache=false，不把 Redis 填满，读压测时缓存从冷开始
+
+# 单条创建 1000 万
+# python seed_data.py --base-url http://192.168.1.3:10086 --total 10000000 --concurrency 500
+# 走批量接口，每批 500 条
+# python seed_data.py --base-url http://192.168.1.3:10086 --total 100000000 --batch-size 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from alias_store import ALIAS_STORE_FILE, RECORD_SIZE, AliasStore, AliasWriter
+from async_http import HttpClient
+from shortcode import Base62Converter
+
+MAX_BATCH_SIZE = 1000  # 与 ShortUrlController.MaxBatchSize 一致，超过会被服务端 400 拒绝
+
+_base62 = Base62Converter()
+
+
+def seed_url(prefix, index):
+    """第 index 条预灌数据的长链接"""
+    return f"https://www.example.com/seed/{prefix}/{_base62.encode(index)}"
+
+
+def repair_alias_file(path):
+    """去掉上次中断时写了一半的记录，返回完整记录数"""
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    if size % RECORD_SIZE:
+        with open(path, "r+b") as f:
+            f.truncate(size - size % RECORD_SIZE)
+    return len(AliasStore(path))
+
+
+class Seeder:
+    def __init__(self, args):
+        self.args = args
+        self.client = None
+        self.writer = AliasWriter(args.output, buffer_records=4096)
+        self.completed = repair_alias_file(args.output)
+        self.resumed_from = self.completed
+        self.failed = 0
+        self.retried = 0
+        self.in_flight = 0
+        self.started = time.time()
+        self.checkpoint_path = args.checkpoint or args.output + ".checkpoint.json"
+        self.next_index = self.completed  # 下一个要分配的序号
+        previous = load_checkpoint(self.checkpoint_path)
+        if previous:
+            # 上次的失败会让序号多于记录数；checkpoint 之后新写入的记录也要跳过
+            self.next_index = max(self.completed,
+                                  previous.get("next_index", 0) + self.completed - previous.get("completed", 0))
+
+    def take(self, size):
+        """分配一段序号；失败放弃的条数由后续序号补齐，保证最终记录数达到 --total"""
+        remaining = self.args.total - self.completed - self.in_flight
+        end = self.next_index + min(size, max(0, remaining))
+        indexes = range(self.next_index, end)
+        self.next_index = end
+        self.in_flight += len(indexes)
+        return indexes
+
+    async def send(self, indexes):
+        urls = [seed_url(self.args.prefix, i) for i in indexes]
+        if self.args.batch_size:
+            path = "/create/batch" if self.args.cache else "/create/batch?cache=false"
+            resp = await self.client.post_json(path, {"items": [{"url": u} for u in urls]})
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {resp.text[:200]}")
+            return [item["alias"] for item in resp.json()["items"]]
+        resp = await self.client.post_json("/create", {"url": urls[0]})
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {resp.text[:200]}")
+        return [resp.json()["alias"]]
+
+    async def worker(self):
+        size = self.args.batch_size or 1
+        while self.completed < self.args.total:
+            if self.failed > self.args.max_failures:
+                return
+            indexes = self.take(size)
+            if not indexes:
+                # 剩余的都在其他协程手里，等它们完成（失败时这里会补发）
+                await asyncio.sleep(0.05)
+                continue
+            aliases = []
+            for attempt in range(self.args.retries + 1):
+                try:
+                    aliases = await self.send(indexes)
+                    break
+                except Exception as e:
+                    if attempt == self.args.retries:
+                        self.failed += len(indexes)
+                        print(f"⚠️  放弃 {len(indexes)} 条（序号 {indexes.start}）: {e}")
+                    else:
+                        self.retried += 1
+                        await asyncio.sleep(min(5.0, 0.2 * 2 ** attempt))
+            self.in_flight -= len(indexes)
+            for alias in aliases:
+                self.writer.append(alias)
+            self.completed += len(aliases)
+
+    def save_checkpoint(self):
+        self.writer.flush()
+        data = {
+            "base_url": self.args.base_url,
+            "total": self.args.total,
+            "batch_size": self.args.batch_size,
+            "prefix": self.args.prefix,
+            "completed": self.completed,
+            "next_index": self.next_index,
+            "failed": self.failed,
+            "retried": self.retried,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    async def report(self):
+        last_done, last_time = self.completed, time.time()
+        while True:
+            await asyncio.sleep(self.args.checkpoint_interval)
+            self.save_checkpoint()
+            now = time.time()
+            rate = (self.completed - last_done) / (now - last_time)
+            remaining = self.args.total - self.completed
+            eta = remaining / rate if rate > 0 else float("inf")
+            print(f"  ... {self.completed}/{self.args.total} ({self.completed / self.args.total * 100:.2f}%) "
+                  f"{rate:.0f} 条/秒, 失败 {self.failed}, 重试 {self.retried}, 预计剩余 {eta / 60:.1f} 分钟")
+            last_done, last_time = self.completed, now
+
+    async def run(self):
+        if self.completed >= self.args.total:
+            print(f"✅ {self.args.output} 已有 {self.completed} 条，无需预灌")
+            return
+        print(f"🚀 预灌 {self.args.base_url}: 目标 {self.args.total} 条, 已有 {self.completed} 条, "
+              f"并发 {self.args.concurrency}, {'批量 ' + str(self.args.batch_size) if self.args.batch_size else '单条'}")
+        self.client = HttpClient(self.args.base_url, max_connections=self.args.concurrency, timeout=self.args.timeout)
+        reporter = asyncio.get_running_loop().create_task(self.report())
+        try:
+            await asyncio.gather(*(self.worker() for _ in range(self.args.concurrency)))
+        finally:
+            reporter.cancel()
+            self.save_checkpoint()
+            self.writer.close()
+            await self.client.close()
+        elapsed = time.time() - self.started
+        done = self.completed - self.resumed_from
+        if self.failed > self.args.max_failures:
+            print(f"❌ 失败 {self.failed} 条超过上限 {self.args.max_failures}，已停止，可修复后用相同命令续跑")
+        print(f"🎉 完成 {self.completed} 条（本次 {done} 条, {done / elapsed:.0f} 条/秒），失败 {self.failed}，"
+              f"alias 写入 {self.args.output}")
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量预灌短链数据")
+    parser.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    parser.add_argument("--total", type=int, required=True, help="目标总条数（包含之前已完成的）")
+    parser.add_argument("--concurrency", type=int, default=200, help="同时在途的请求数上限")
+    parser.add_argument("--batch-size", type=int, default=0, help=f"每批条数（1-{MAX_BATCH_SIZE}），0 表示逐条调用 /create")
+    parser.add_argument("--cache", action="store_true", help="批量模式下同时写入 Redis（默认不写）")
+    parser.add_argument("--output", default=ALIAS_STORE_FILE, help="alias 二进制输出文件")
+    parser.add_argument("--checkpoint", default="", help="checkpoint 文件，默认 <output>.checkpoint.json")
+    parser.add_argument("--checkpoint-interval", type=float, default=5, help="checkpoint 与进度输出间隔（秒）")
+    parser.add_argument("--prefix", default="", help="长链接前缀，默认从 checkpoint 读取或按当前时间生成")
+    parser.add_argument("--retries", type=int, default=3, help="单个请求失败的重试次数")
+    parser.add_argument("--max-failures", type=int, default=10000, help="累计放弃条数超过该值时停止")
+    parser.add_argument("--timeout", type=float, default=30, help="单请求超时（秒）")
+    args = parser.parse_args()
+    if not 0 <= args.batch_size <= MAX_BATCH_SIZE:
+        raise SystemExit(f"❌ --batch-size 必须在 0-{MAX_BATCH_SIZE} 之间（服务端 MaxBatchSize={MAX_BATCH_SIZE}）")
+
+    if not args.prefix:
+        previous = load_checkpoint(args.checkpoint or args.output + ".checkpoint.json") or {}
+        args.prefix = previous.get("prefix") or time.strftime("%Y%m%d%H%M%S")
+    asyncio.run(Seeder(args).run())
+
+
+if __name__ == "__main__":
+    main()
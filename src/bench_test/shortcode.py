@@ -0,0 +1,286 @@
+"""
+src/common 中 Base62Converter 与 SnowflakeIdGenerator 的 Python 移植
+
+与 C# 版本保持相同的字符表、位布局和起始时间，生成的 id / alias 与服务端一致：
+  v1: 自增 id + Base62Converter(6)
+  v3: Snowflake id + Base62Converter(12)
+
+v3 的 alias 就是 Snowflake id 的 Base62 编码，因此可以：
+  - 把任意 alias 解码回 id、时间戳、数据中心、机器号和序列号
+  - 根据 /snowflake/config 给出的节点配置，枚举某个时间窗口内所有“可能存在”的 alias，
+    读压测不必先把 alias 列表分发到每台 worker（PredictedAliasPool）
+  - 检查每个节点返回的 id 是否单调递增（MonotonicityChecker）
+
+# python shortcode.py decode 02Vzh0P4RQS8
+# python shortcode.py config --base-url http://localhost:10086
+# python shortcode.py enumerate --start 1735689600 --end 1735693200 --nodes 1:1,1:2 --max-sequence 3 --output created_aliases.bin
+"""
+
+import argparse
+import bisect
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+BASE62_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(BASE62_CHARS)
+_CHAR_INDEX = {c: i for i, c in enumerate(BASE62_CHARS)}
+
+# Snowflake 位布局（与 SnowflakeIdGenerator.cs 相同）
+TWEPOCH = 1288834974657
+WORKER_ID_BITS = 5
+DATACENTER_ID_BITS = 5
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_DATACENTER_ID = (1 << DATACENTER_ID_BITS) - 1
+WORKER_ID_SHIFT = SEQUENCE_BITS
+DATACENTER_ID_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS
+TIMESTAMP_LEFT_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS + DATACENTER_ID_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+V3_ALIAS_LENGTH = 12
+
+
+class Base62Converter:
+    def __init__(self, fixed_length=0):
+        if fixed_length < 0:
+            raise ValueError("Fixed length must be non-negative.")
+        self.fixed_length = fixed_length
+        self.max_value = BASE ** fixed_length - 1 if fixed_length else None
+
+    def encode(self, number):
+        if number < 0:
+            raise ValueError("Number must be non-negative.")
+        if self.max_value is not None and number > self.max_value:
+            raise ValueError(f"Number {number} exceeds maximum value {self.max_value} "
+                             f"for fixed length {self.fixed_length}.")
+        chars = []
+        while number > 0:
+            number, rem = divmod(number, BASE)
+            chars.append(BASE62_CHARS[rem])
+        result = "".join(reversed(chars)) or BASE62_CHARS[0]
+        return result.rjust(self.fixed_length, BASE62_CHARS[0]) if self.fixed_length else result
+
+    def decode(self, code):
+        if not code or not code.strip():
+            raise ValueError("code is empty")
+        number = 0
+        for c in code:
+            index = _CHAR_INDEX.get(c)
+            if index is None:
+                raise ValueError("Invalid character in Base62 string.")
+            number = number * BASE + index
+        return number
+
+
+class SnowflakeIdGenerator:
+    def __init__(self, worker_id, datacenter_id, clock=None):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"workerId must be between 0 and {MAX_WORKER_ID}")
+        if not 0 <= datacenter_id <= MAX_DATACENTER_ID:
+            raise ValueError(f"datacenterId must be between 0 and {MAX_DATACENTER_ID}")
+        self.worker_id = worker_id
+        self.datacenter_id = datacenter_id
+        self.last_timestamp = 0
+        self._sequence = 0
+        self._clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            timestamp = self._clock()
+            if timestamp < self.last_timestamp:
+                raise RuntimeError(f"Clock moved backwards. Refusing to generate id for "
+                                   f"{self.last_timestamp - timestamp} milliseconds")
+            if timestamp == self.last_timestamp:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    while timestamp <= self.last_timestamp:
+                        timestamp = self._clock()
+            else:
+                self._sequence = 0
+            self.last_timestamp = timestamp
+            return ((timestamp - TWEPOCH) << TIMESTAMP_LEFT_SHIFT) | \
+                (self.datacenter_id << DATACENTER_ID_SHIFT) | \
+                (self.worker_id << WORKER_ID_SHIFT) | \
+                self._sequence
+
+
+def decode_snowflake(snowflake_id):
+    """拆分 Snowflake id 的各个字段"""
+    timestamp_ms = (snowflake_id >> TIMESTAMP_LEFT_SHIFT) + TWEPOCH
+    return {
+        "id": snowflake_id,
+        "timestamp_ms": timestamp_ms,
+        "time": datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc).isoformat(),
+        "datacenter_id": (snowflake_id >> DATACENTER_ID_SHIFT) & MAX_DATACENTER_ID,
+        "worker_id": (snowflake_id >> WORKER_ID_SHIFT) & MAX_WORKER_ID,
+        "sequence": snowflake_id & SEQUENCE_MASK,
+    }
+
+
+def make_snowflake_id(timestamp_ms, datacenter_id, worker_id, sequence=0):
+    return ((timestamp_ms - TWEPOCH) << TIMESTAMP_LEFT_SHIFT) | \
+        (datacenter_id << DATACENTER_ID_SHIFT) | \
+        (worker_id << WORKER_ID_SHIFT) | \
+        sequence
+
+
+_v3_base62 = Base62Converter(V3_ALIAS_LENGTH)
+
+
+def decode_alias(alias):
+    """v3 alias -> Snowflake 字段"""
+    return decode_snowflake(_v3_base62.decode(alias))
+
+
+def fetch_snowflake_config(base_url, timeout=5):
+    with urllib.request.urlopen(f"{base_url.rstrip('/')}/snowflake/config", timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def discover_nodes(base_url, attempts=20, timeout=5):
+    """多次请求 /snowflake/config，收集负载均衡后面所有节点的 (datacenterId, workerId)"""
+    nodes = set()
+    for _ in range(attempts):
+        config = fetch_snowflake_config(base_url, timeout)
+        nodes.add((config["datacenterId"], config["workerId"]))
+    return sorted(nodes)
+
+
+def parse_nodes(text):
+    """'1:1,1:2' -> [(1, 1), (1, 2)]，格式为 datacenterId:workerId"""
+    nodes = []
+    for item in text.split(","):
+        if item.strip():
+            dc, worker = item.split(":")
+            nodes.append((int(dc), int(worker)))
+    return nodes
+
+
+class PredictedAliasPool:
+    """时间窗口内所有可能 alias 组成的虚拟序列，按下标即时计算，不占内存
+
+    下标越小时间越早，可以直接交给 key_dist 的 selector.pick() 使用。
+    命中率取决于窗口内每个节点每毫秒实际创建的数量，max_sequence 应接近预灌数据时的单节点每毫秒创建数。
+    """
+
+    def __init__(self, start_ms, end_ms, nodes, max_sequence=0, alias_length=V3_ALIAS_LENGTH):
+        if end_ms <= start_ms:
+            raise ValueError("时间窗口为空")
+        if not nodes:
+            raise ValueError("至少需要一个节点")
+        self.start_ms = start_ms
+        self.span_ms = end_ms - start_ms
+        self.nodes = list(nodes)
+        self.sequences = max_sequence + 1
+        self.base62 = Base62Converter(alias_length)
+        self._per_ms = len(self.nodes) * self.sequences
+
+    def __len__(self):
+        return self.span_ms * self._per_ms
+
+    def id_at(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        ms, rest = divmod(index, self._per_ms)
+        node, sequence = divmod(rest, self.sequences)
+        datacenter_id, worker_id = self.nodes[node]
+        return make_snowflake_id(self.start_ms + ms, datacenter_id, worker_id, sequence)
+
+    def __getitem__(self, index):
+        return self.base62.encode(self.id_at(index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class MonotonicityChecker:
+    """检查每个节点的 id 是否单调递增
+
+    只比较有先后关系的请求：请求 B 发出时请求 A 已经收到响应，且两者来自同一节点，则 B 的 id 必须大于 A。
+    并发中的请求乱序返回不算违规。窗口外的历史会被裁剪，内存有上限。
+    """
+
+    def __init__(self, window_seconds=60.0):
+        self.window = window_seconds
+        self._nodes = {}  # (dc, worker) -> ([收到时间], [截至该时间的最大 id])
+        self.checked = 0
+        self.violations = []
+
+    def observe(self, snowflake_id, sent_at, received_at):
+        fields = decode_snowflake(snowflake_id)
+        key = (fields["datacenter_id"], fields["worker_id"])
+        times, max_ids = self._nodes.setdefault(key, ([], []))
+        pos = bisect.bisect_left(times, sent_at)
+        if pos > 0 and snowflake_id <= max_ids[pos - 1]:
+            self.violations.append((key, max_ids[pos - 1], snowflake_id))
+        self.checked += 1
+        if times and received_at < times[-1]:
+            received_at = times[-1]
+        times.append(received_at)
+        max_ids.append(max(snowflake_id, max_ids[-1]) if max_ids else snowflake_id)
+        if len(times) > 4096 and times[0] < received_at - self.window:
+            cut = bisect.bisect_left(times, received_at - self.window)
+            del times[:cut]
+            del max_ids[:cut]
+        return key
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+
+def parse_time(value):
+    """unix 秒 / 毫秒 或 ISO 时间 -> 毫秒"""
+    try:
+        number = float(value)
+        return int(number if number > 1e11 else number * 1000)
+    except ValueError:
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snowflake / Base62 alias 工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_decode = sub.add_parser("decode", help="把 alias 解码为 id、时间和节点")
+    p_decode.add_argument("aliases", nargs="+")
+    p_config = sub.add_parser("config", help="查询服务的 Snowflake 节点配置")
+    p_config.add_argument("--base-url", default="http://localhost:10086")
+    p_config.add_argument("--attempts", type=int, default=20, help="请求次数，用于发现负载均衡后的所有节点")
+    p_enum = sub.add_parser("enumerate", help="枚举时间窗口内可能存在的 alias")
+    p_enum.add_argument("--start", required=True, help="开始时间：unix 秒/毫秒 或 ISO 格式（UTC）")
+    p_enum.add_argument("--end", required=True, help="结束时间")
+    p_enum.add_argument("--nodes", default="", help="datacenterId:workerId 列表，留空则从 --base-url 发现")
+    p_enum.add_argument("--base-url", default="http://localhost:10086")
+    p_enum.add_argument("--max-sequence", type=int, default=0, help="每毫秒枚举的最大序列号")
+    p_enum.add_argument("--limit", type=int, default=0, help="最多输出条数，0 表示全部")
+    p_enum.add_argument("--output", default="", help="写入二进制 alias 文件（alias_store 格式），否则逐行打印")
+    args = parser.parse_args()
+
+    if args.command == "decode":
+        for alias in args.aliases:
+            print(alias, json.dumps(decode_alias(alias), ensure_ascii=False))
+    elif args.command == "config":
+        print(json.dumps(fetch_snowflake_config(args.base_url), ensure_ascii=False))
+        print("nodes:", ",".join(f"{dc}:{w}" for dc, w in discover_nodes(args.base_url, args.attempts)))
+    elif args.command == "enumerate":
+        nodes = parse_nodes(args.nodes) if args.nodes else discover_nodes(args.base_url)
+        pool = PredictedAliasPool(parse_time(args.start), parse_time(args.end), nodes, args.max_sequence)
+        count = min(len(pool), args.limit) if args.limit else len(pool)
+        if args.output:
+            from alias_store import AliasWriter
+            writer = AliasWriter(args.output, buffer_records=65536)
+            for i in range(count):
+                writer.append(pool[i])
+            writer.close()
+            print(f"写入 {count} 条 alias -> {args.output}")
+        else:
+            for i in range(count):
+                print(pool[i])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 压测脚本都是平铺模块，直接把 bench_test 目录加入 import 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
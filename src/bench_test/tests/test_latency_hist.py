@@ -0,0 +1,112 @@
+import math
+import random
+
+import pytest
+
+from latency_hist import HistogramSet, LatencyHistogram
+
+
+def sample_values():
+    values = list(range(0, 2048)) + [2 ** k + d for k in range(11, 36) for d in (-1, 0, 1)]
+    rng = random.Random(42)
+    values += [rng.randrange(1, 2 ** 36) for _ in range(2000)]
+    return values
+
+
+def test_small_values_are_exact():
+    hist = LatencyHistogram()
+    for value in range(hist.sub_count):
+        assert hist.index_for(value) == value
+        assert hist.bucket_range(value) == (value, value)
+
+
+def test_bucket_round_trip_within_error_bound():
+    hist = LatencyHistogram()
+    for value in sample_values():
+        index = hist.index_for(value)
+        low, high = hist.bucket_range(index)
+        assert low <= value <= high
+        assert high - low <= low / 512
+
+
+def test_bucket_ranges_are_contiguous():
+    hist = LatencyHistogram()
+    previous_high = -1
+    for index in range(hist.bucket_count):
+        low, high = hist.bucket_range(index)
+        assert low == previous_high + 1
+        assert hist.index_for(low) == index
+        assert hist.index_for(high) == index
+        previous_high = high
+
+
+def test_overflow_goes_to_last_bucket():
+    hist = LatencyHistogram()
+    hist.record(2 ** 40)
+    assert hist.counts[hist.bucket_count - 1] == 1
+    assert hist.value_at_percentile(100) == 2 ** 40
+
+
+def test_percentile_never_underestimates():
+    hist = LatencyHistogram()
+    values = sorted(sample_values())
+    for value in values:
+        hist.record(value)
+    for q in (50, 90, 99, 99.9, 100):
+        exact = values[max(1, math.ceil(len(values) * q / 100)) - 1]
+        reported = hist.value_at_percentile(q)
+        assert exact <= reported <= exact * (1 + 1 / 512)
+
+
+def test_merge_matches_single_histogram():
+    values = sample_values()
+    whole, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (left if i % 2 else right).record(value)
+    left.merge(right)
+    assert left.counts == whole.counts
+    assert (left.total, left.sum_us, left.min_us, left.max_us) == \
+        (whole.total, whole.sum_us, whole.min_us, whole.max_us)
+
+
+def test_merge_into_empty_keeps_min():
+    empty, other = LatencyHistogram(), LatencyHistogram()
+    other.record(500)
+    other.record(900)
+    empty.merge(other)
+    assert (empty.min_us, empty.max_us, empty.total) == (500, 900, 2)
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram().merge(LatencyHistogram(sub_bits=8))
+
+
+def test_encode_decode_round_trip():
+    hist = LatencyHistogram()
+    for value in sample_values():
+        hist.record(value, count=value % 7 + 1)
+    decoded = LatencyHistogram.decode(hist.encode())
+    assert decoded.counts == hist.counts
+    assert (decoded.total, decoded.sum_us, decoded.min_us, decoded.max_us) == \
+        (hist.total, hist.sum_us, hist.min_us, hist.max_us)
+    assert decoded.summary() == hist.summary()
+
+
+def test_encode_decode_empty():
+    decoded = LatencyHistogram.decode(LatencyHistogram().encode())
+    assert decoded.total == 0
+    assert decoded.value_at_percentile(99) == 0
+
+
+def test_histogram_set_dict_round_trip():
+    hs = HistogramSet()
+    for value in (1.5, 12.0, 250.0):
+        hs.record_ms("create", value)
+    hs.record_ms("read", 0.8)
+    restored = HistogramSet.from_dict(hs.to_dict())
+    assert set(restored.histograms) == {"create", "read"}
+    for name, hist in hs.histograms.items():
+        assert restored.histograms[name].counts == hist.counts
+        assert restored.histograms[name].summary() == hist.summary()
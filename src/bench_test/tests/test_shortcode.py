@@ -0,0 +1,83 @@
+import pytest
+
+from shortcode import (TWEPOCH, V3_ALIAS_LENGTH, Base62Converter, SnowflakeIdGenerator, decode_alias,
+                       decode_snowflake, make_snowflake_id)
+
+
+# 期望值取自 src/Tests/Base62ConverterTests.cs
+@pytest.mark.parametrize("number, expected", [(0, "0"), (1, "1"), (61, "z"), (62, "10"), (72, "1A")])
+def test_base62_matches_csharp(number, expected):
+    converter = Base62Converter()
+    assert converter.encode(number) == expected
+    assert converter.decode(expected) == number
+
+
+@pytest.mark.parametrize("number", [0, 1, 61, 62, 123, 3844, 123456, 999999999, 2 ** 63 - 1])
+def test_base62_round_trip(number):
+    converter = Base62Converter()
+    assert converter.decode(converter.encode(number)) == number
+
+
+def test_base62_fixed_length_matches_csharp():
+    converter = Base62Converter(6)
+    assert converter.encode(0) == "000000"
+    assert converter.encode(62 ** 6 - 1) == "zzzzzz"
+    assert converter.encode(123).startswith("00")
+    assert converter.decode(converter.encode(238327)) == 238327
+    with pytest.raises(ValueError):
+        converter.encode(62 ** 6)
+
+
+@pytest.mark.parametrize("code", ["", "   ", "abc-"])
+def test_base62_rejects_invalid_input(code):
+    with pytest.raises(ValueError):
+        Base62Converter().decode(code)
+
+
+def test_base62_rejects_negative():
+    with pytest.raises(ValueError):
+        Base62Converter().encode(-1)
+    with pytest.raises(ValueError):
+        Base62Converter(-1)
+
+
+def test_snowflake_layout_matches_csharp():
+    # SnowflakeIdGenerator.cs: (timestamp - Twepoch) << 22 | datacenter << 17 | worker << 12 | sequence
+    clock = iter([TWEPOCH + 1000, TWEPOCH + 1000, TWEPOCH + 1001])
+    gen = SnowflakeIdGenerator(worker_id=3, datacenter_id=1, clock=lambda: next(clock))
+    assert gen.next_id() == (1000 << 22) | (1 << 17) | (3 << 12) | 0
+    assert gen.next_id() == (1000 << 22) | (1 << 17) | (3 << 12) | 1
+    assert gen.next_id() == (1001 << 22) | (1 << 17) | (3 << 12) | 0
+    assert make_snowflake_id(TWEPOCH + 1000, 1, 3, 1) == (1000 << 22) | (1 << 17) | (3 << 12) | 1
+
+
+def test_snowflake_rejects_bad_node_and_clock_rollback():
+    with pytest.raises(ValueError):
+        SnowflakeIdGenerator(32, 0)
+    with pytest.raises(ValueError):
+        SnowflakeIdGenerator(0, -1)
+    clock = iter([TWEPOCH + 10, TWEPOCH + 9])
+    gen = SnowflakeIdGenerator(0, 0, clock=lambda: next(clock))
+    gen.next_id()
+    with pytest.raises(RuntimeError):
+        gen.next_id()
+
+
+def test_snowflake_sequence_overflow_waits_next_millisecond():
+    ticks = [TWEPOCH + 5] * 4097 + [TWEPOCH + 6]
+    clock = iter(ticks)
+    gen = SnowflakeIdGenerator(0, 0, clock=lambda: next(clock))
+    ids = [gen.next_id() for _ in range(4097)]
+    assert ids[-1] == 6 << 22
+    assert len(set(ids)) == len(ids)
+
+
+def test_v3_alias_decodes_back_to_fields():
+    timestamp_ms = 1735689600123
+    snowflake_id = make_snowflake_id(timestamp_ms, 2, 7, 42)
+    alias = Base62Converter(V3_ALIAS_LENGTH).encode(snowflake_id)
+    assert len(alias) == V3_ALIAS_LENGTH
+    fields = decode_alias(alias)
+    assert fields == decode_snowflake(snowflake_id)
+    assert (fields["timestamp_ms"], fields["datacenter_id"], fields["worker_id"], fields["sequence"]) == \
+        (timestamp_ms, 2, 7, 42)
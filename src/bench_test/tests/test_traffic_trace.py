@@ -0,0 +1,32 @@
+import zlib
+
+from traffic_trace import RecentMap, partition
+
+
+def test_recent_map_expires_by_offset():
+    m = RecentMap(horizon_us=100)
+    m.put("a", 1, 0)
+    m.put("b", 2, 50)
+    m.expire(120)
+    assert "a" not in m and m.get("b") == 2
+    assert m.pop("b") == 2 and len(m) == 0
+
+
+def test_partition_routes_created_reads_with_their_create():
+    url = "https://www.example.com/x"
+    records = [(0, "create", url, 40), (10, "alias", f"AAA {url}", 0), (20, "read", "AAA", 0)]
+    workers = 4
+    owner = zlib.crc32(url.encode()) % workers
+    for worker in range(workers):
+        got = [(record[1], key) for _, key, record in partition(iter(records), worker, workers)]
+        assert got == ([("create", url), ("alias", "AAA"), ("read", "AAA")] if worker == owner else [])
+
+
+def test_partition_forgets_aliases_older_than_horizon():
+    url = "https://www.example.com/x"
+    records = [(0, "alias", f"AAA {url}", 0), (2_000_000, "read", "AAA", 0)]
+    workers = 4
+    owner = zlib.crc32(b"AAA") % workers
+    routed = [w for w in range(workers) for _, _, r in partition(iter(records), w, workers, horizon_us=1_000_000)
+              if r[1] == "read"]
+    assert routed == [owner]
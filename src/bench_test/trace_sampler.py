@@ -0,0 +1,248 @@
+"""
+按比例抽样的请求分阶段计时（async_http 的可选 tracer）
+
+被抽中的请求用 perf_counter_ns 记录各阶段耗时（微秒）：
+  queue    等待连接池空闲连接 / 连接数配额
+  dns      域名解析（只在新建连接时）
+  connect  TCP 建连（只在新建连接时）
+  tls      TLS 握手（只在 https 新建连接时）
+  write    写请求并 drain
+  ttfb     请求写完到收到响应首字节（服务端 + nginx 排队 + 网络往返）
+  body     首字节到响应读完
+连接复用时 dns/connect/tls 为 0，标记位里记录复用与失败。
+
+记录是 40 字节的定长结构，先写进预分配的 bytearray 环形缓冲区，满了整块追加到二进制 trace 文件，
+热路径上只有一次 struct.pack_into，没被抽中的请求只多一次随机数比较。
+
+文件格式：8 字节魔数 + 若干块，每块 1 字节类型 + 4 字节长度 + 内容
+  H  JSON 头（抽样率、开始时间）
+  N  1 字节操作 id + UTF-8 操作名
+  R  若干条定长记录
+
+# python open_loop.py --host http://localhost:10086 --rps 2000 --trace-file trace.bin --trace-rate 0.01
+# python trace_sampler.py show trace.bin
+# python trace_sampler.py dump trace.bin --csv trace.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import struct
+import time
+
+MAGIC = b"SUTRACE1"
+CHUNK = struct.Struct("<cI")
+# 开始时间偏移(ns), queue, dns, connect, tls, write, ttfb, body (us), 状态码, 操作 id, 标记
+RECORD = struct.Struct("<q7IHBB")
+PHASES = ("queue", "dns", "connect", "tls", "write", "ttfb", "body")
+FLAG_REUSED = 1
+FLAG_ERROR = 2
+MAX_US = 0xFFFFFFFF
+
+
+class TraceSample:
+    """单个被抽中请求的时间点（perf_counter_ns），由 HttpClient 填写"""
+    __slots__ = ("start", "acquired", "dns", "connected", "tls", "written", "first_byte", "done", "reused")
+
+    def __init__(self, start):
+        self.start = start
+        self.acquired = self.dns = self.connected = self.tls = 0
+        self.written = self.first_byte = self.done = 0
+        self.reused = False
+
+
+class Tracer:
+    def __init__(self, path, sample_rate=0.01, capacity=4096, seed=None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.buffer = bytearray(RECORD.size * capacity)
+        self.count = 0  # 缓冲区内的记录数
+        self.written = 0
+        self.op_ids = {}
+        self._new_ops = []
+        self.start_ns = time.perf_counter_ns()
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        header = json.dumps({"sample_rate": sample_rate, "start_unix_ns": time.time_ns(),
+                             "phases": PHASES, "pid": os.getpid()}).encode("utf-8")
+        self._write_chunk(b"H", header)
+
+    def _write_chunk(self, kind, payload):
+        self.file.write(CHUNK.pack(kind, len(payload)))
+        self.file.write(payload)
+
+    def should_sample(self):
+        return self.rng.random() < self.sample_rate
+
+    def begin(self):
+        return TraceSample(time.perf_counter_ns())
+
+    def op_id(self, name):
+        op = self.op_ids.get(name)
+        if op is None:
+            if len(self.op_ids) >= 255:
+                return 255
+            op = self.op_ids[name] = len(self.op_ids)
+            self._new_ops.append((op, name))
+        return op
+
+    def finish(self, sample, name, status=0, error=False):
+        """请求结束时调用：把时间点换算成各阶段耗时写入环形缓冲区"""
+        done = sample.done or time.perf_counter_ns()
+        acquired = sample.acquired or sample.start
+        # 新建连接时各阶段依次相接；复用连接时 connected 等于 acquired
+        dns_end = sample.dns or acquired
+        connected = sample.connected or dns_end
+        tls_end = sample.tls or connected
+        written = sample.written or tls_end
+        first_byte = sample.first_byte or (written if error else done)
+        flags = (FLAG_REUSED if sample.reused else 0) | (FLAG_ERROR if error else 0)
+
+        def us(a, b):
+            return min(MAX_US, max(0, (b - a) // 1000))
+
+        RECORD.pack_into(self.buffer, self.count * RECORD.size, sample.start - self.start_ns,
+                         us(sample.start, acquired), us(acquired, dns_end), us(dns_end, connected),
+                         us(connected, tls_end), us(tls_end, written), us(written, first_byte),
+                         us(first_byte, done), status, self.op_id(name), flags)
+        self.count += 1
+        if self.count == self.capacity:
+            self.flush()
+
+    def flush(self):
+        for op, name in self._new_ops:
+            self._write_chunk(b"N", bytes((op,)) + name.encode("utf-8"))
+        self._new_ops.clear()
+        if self.count:
+            self._write_chunk(b"R", memoryview(self.buffer)[:self.count * RECORD.size])
+            self.written += self.count
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_trace(path):
+    """返回 (头, 操作名表, 记录生成器)；记录为 (偏移ns, 各阶段us..., 状态码, 操作 id, 标记)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} 不是 trace 文件")
+    header, names, blocks = {}, {}, []
+    pos = len(MAGIC)
+    while pos + CHUNK.size <= len(data):
+        kind, length = CHUNK.unpack_from(data, pos)
+        pos += CHUNK.size
+        payload = data[pos:pos + length]
+        pos += length
+        if kind == b"H":
+            header = json.loads(payload)
+        elif kind == b"N":
+            names[payload[0]] = payload[1:].decode("utf-8")
+        elif kind == b"R":
+            blocks.append(payload)
+
+    def records():
+        for block in blocks:
+            yield from RECORD.iter_unpack(block[:len(block) - len(block) % RECORD.size])
+
+    return header, names, records()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def summarize(path):
+    """每个操作、每个阶段的 p50 / p99（毫秒），以及连接复用率和失败数"""
+    header, names, records = read_trace(path)
+    by_op = {}
+    for record in records:
+        op = by_op.setdefault(record[9], {"phases": [[] for _ in PHASES], "total": [], "reused": 0, "errors": 0,
+                                          "new_conn": [[] for _ in range(3)]})
+        durations = record[1:8]
+        for i, value in enumerate(durations):
+            op["phases"][i].append(value)
+        op["total"].append(sum(durations))
+        if record[10] & FLAG_REUSED:
+            op["reused"] += 1
+        else:
+            for i in range(3):
+                op["new_conn"][i].append(durations[1 + i])
+        if record[10] & FLAG_ERROR:
+            op["errors"] += 1
+    result = {}
+    for op_id, op in by_op.items():
+        count = len(op["total"])
+        phases = {}
+        for name, values in zip(PHASES, op["phases"]):
+            values.sort()
+            phases[name] = (percentile(values, 50) / 1000, percentile(values, 99) / 1000)
+        # dns / connect / tls 只在新建连接的请求里统计，否则 p50 永远是 0
+        for i, name in enumerate(("dns", "connect", "tls")):
+            values = sorted(op["new_conn"][i])
+            phases[name] = (percentile(values, 50) / 1000, percentile(values, 99) / 1000)
+        op["total"].sort()
+        result[names.get(op_id, f"op{op_id}")] = {
+            "count": count, "reused_ratio": op["reused"] / count if count else 0, "errors": op["errors"],
+            "phases": phases,
+            "total": (percentile(op["total"], 50) / 1000, percentile(op["total"], 99) / 1000),
+        }
+    return header, result
+
+
+def print_summary(path):
+    header, result = summarize(path)
+    print(f"trace {path}: 抽样率 {header.get('sample_rate')}，"
+          f"{sum(r['count'] for r in result.values())} 条样本  (ms, p50 / p99；dns/connect/tls 只统计新建连接)")
+    print(f"{'操作':<20}{'样本':>8}{'复用率':>8}{'失败':>6}" + "".join(f"{p:>16}" for p in PHASES + ("total",)))
+    for name, r in sorted(result.items()):
+        cells = [r["phases"][p] for p in PHASES] + [r["total"]]
+        print(f"{name:<20}{r['count']:>8}{r['reused_ratio'] * 100:>7.1f}%{r['errors']:>6}"
+              + "".join(f"{a:>7.2f} /{b:>7.2f}" for a, b in cells))
+
+
+def dump_csv(path, output):
+    header, names, records = read_trace(path)
+    start_unix_ns = header.get("start_unix_ns", 0)
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["unix_ms", "op", "status", "reused", "error"] + [f"{p}_us" for p in PHASES])
+        for r in records:
+            writer.writerow([round((start_unix_ns + r[0]) / 1e6, 3), names.get(r[9], r[9]), r[8],
+                             int(bool(r[10] & FLAG_REUSED)), int(bool(r[10] & FLAG_ERROR))] + list(r[1:8]))
+
+
+def add_arguments(parser):
+    parser.add_argument("--trace-file", default="", help="抽样请求的分阶段计时写入该二进制文件，留空不抽样")
+    parser.add_argument("--trace-rate", type=float, default=0.01, help="抽样比例（0~1）")
+
+
+def tracer_from_args(args):
+    return Tracer(args.trace_file, args.trace_rate) if args.trace_file else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="请求分阶段 trace 文件工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_show = sub.add_parser("show", help="按操作打印各阶段 p50 / p99")
+    p_show.add_argument("file")
+    p_dump = sub.add_parser("dump", help="导出为 CSV")
+    p_dump.add_argument("file")
+    p_dump.add_argument("--csv", required=True)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print_summary(args.file)
+    else:
+        dump_csv(args.file, args.csv)
+        print(f"已导出 {args.csv}")
@@ -0,0 +1,645 @@
+"""
+流量录制与确定性回放
+
+locustfile 里的随机数没有固定种子，每次压测发出的流量都不一样，回归问题很难复现。
+这里把流量录成轨迹文件，之后可以按原速、加速或不限速原样回放。
+
+轨迹格式：UTF-8 文本，每行一条，制表符分隔，文件名以 .gz 结尾时自动 gzip
+  #sutraffic v1 {"source": ..., "start_unix": ...}     头部，start_unix 为偏移 0 对应的 unix 时间
+  偏移微秒  操作  key  请求体字节数
+操作与 key：
+  read    GET /u/{alias}             key 为 alias
+  create  POST /create               key 为长链接；为空时（locust 录制、nginx 导入）回放时按序号生成
+  batch   POST /create/batch         key 为批大小，长链接回放时生成，总大小接近录制时的请求体
+  other   其他请求                   key 为 "方法 路径"
+  alias   不是请求：录制的创建请求返回的 alias，key 为 "alias 长链接"，记录在响应返回的时刻
+
+来源：
+  - 压测端录制：open_loop.py / capacity_search.py 加 --record-file；locustfile 加 --record-file
+    （分布式运行时每个 worker 写 <文件名>.<pid>，用 merge 按时间合并）
+  - nginx 访问日志导入：docker-distributed/nginx/nginx.conf 里的 main 格式（时间只精确到秒，
+    同一秒内的请求均匀摊开）或 replay 格式（$msec，毫秒精度，带请求体大小）
+
+回放是一条生成器流水线：逐行读文件 -> 解析 -> 按操作过滤 -> 按 key 分区 -> 按倍速换算计划时间，
+未完成请求数到上限时暂停读取，内存占用与轨迹长度无关。
+多 worker 时每个进程各自流式读取同一个文件，只处理 crc32(key) % workers 落在自己分区的记录，
+同一个 key 总在同一个进程里；进程内同一个 key 的请求等上一个完成后才发出，保持录制时的顺序。
+延迟从实际发出时算起，实际发出比计划时间晚多少单独统计为“调度滞后”。
+
+录制期间新建的 alias 由服务端分配，回放时同一个创建请求会得到不同的 alias。压测端（HttpClient）录制时
+把每个创建请求返回的 alias 记成 alias 行，回放时读这些 alias 的请求按长链接与对应的创建请求分到同一个进程、
+排在它之后，并改读回放时创建得到的新 alias。映射只保留轨迹时间最近 --alias-horizon 秒内创建的 alias
+（分区时只存 alias -> 分区号），内存与创建速率成正比、与轨迹长度无关；更早创建的 alias 按录制值读取。
+locust 录制和 nginx 导入拿不到请求体 / 响应，没有 alias 行，读录制期间新建的 alias 会 404，
+这时回放需要与录制开始时相同的数据集（同一份库快照，或先用 seed_data.py 预灌同一份 alias 文件再录制）；
+读请求 404 较多时回放结束会给出提示。
+
+# python open_loop.py --host http://localhost:10086 --rps 2000 --duration 60 --record-file run1.trace.gz
+# python traffic_trace.py import-nginx access.log -o prod.trace.gz
+# python traffic_trace.py show prod.trace.gz
+# python traffic_trace.py replay prod.trace.gz --base-url http://localhost:10086 --speed 10 --workers 4
+# python traffic_trace.py replay prod.trace.gz --base-url http://localhost:10086 --speed 0 --max-outstanding 2000
+# python traffic_trace.py merge all.trace.gz run.trace.gz.*
+"""
+
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import multiprocessing
+import os
+import re
+import socket
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from async_http import HttpClient
+from latency_hist import HistogramSet, LatencyHistogram
+
+HEADER_PREFIX = "#sutraffic v1"
+OPS = ("read", "create", "batch", "other", "alias")
+READ_PREFIX = "/u/"
+ALIAS_HORIZON = 300  # 录制 alias 映射默认保留的轨迹时间（秒）
+
+# docker-distributed/nginx/nginx.conf 里的两种日志格式
+NGINX_MAIN = re.compile(r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<uri>\S+)[^"]*" (?P<status>\d{3}) ')
+NGINX_REPLAY = re.compile(r'^(?P<msec>\d+\.\d+) (?P<method>[A-Z]+) (?P<uri>\S+) (?P<status>\d{3}) (?P<length>\d+|-)')
+
+
+def open_trace(path, mode="r"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="\n")
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+def clean_key(key):
+    return key.replace("\t", " ").replace("\n", " ").replace("\r", " ")
+
+
+def classify(method, path, body=None):
+    """请求 -> (操作, key, 请求体字节数)"""
+    size = len(body) if body else 0
+    route = path.split("?", 1)[0]
+    if method == "GET" and route.startswith(READ_PREFIX):
+        return "read", route[len(READ_PREFIX):], size
+    if method == "POST" and route == "/create":
+        url = ""
+        if body:
+            try:
+                url = json.loads(body).get("url") or ""
+            except (ValueError, AttributeError):
+                pass
+        return "create", url, size
+    if method == "POST" and route == "/create/batch":
+        count = 0
+        if body:
+            try:
+                count = len(json.loads(body).get("items") or [])
+            except (ValueError, AttributeError):
+                pass
+        return "batch", str(count), size
+    return "other", f"{method} {path}", size
+
+
+class TraceWriter:
+    def __init__(self, path, source="harness", start_unix=None):
+        self.path = path
+        self.file = open_trace(path, "w")
+        self.start_unix = time.time() if start_unix is None else start_unix
+        # 录制时用单调时钟计算偏移，不受系统时间调整影响
+        self.start = time.perf_counter() - (time.time() - self.start_unix)
+        self.count = 0
+        header = {"source": source, "start_unix": self.start_unix, "host": socket.gethostname(), "pid": os.getpid()}
+        self.file.write(f"{HEADER_PREFIX} {json.dumps(header)}\n")
+
+    def write(self, offset_us, op, key, size):
+        self.file.write(f"{max(0, round(offset_us))}\t{op}\t{clean_key(key)}\t{size}\n")
+        self.count += 1
+
+    def record(self, op, key, size, at_unix=None):
+        if at_unix is None:
+            offset = time.perf_counter() - self.start
+        else:
+            offset = at_unix - self.start_unix
+        self.write(offset * 1_000_000, op, key, size)
+
+    def record_request(self, method, path, body=None):
+        """HttpClient 的 recorder 接口，每个请求发出前调用；创建请求返回长链接，响应回来后传给 record_response"""
+        op, key, size = classify(method, path, body)
+        self.record(op, key, size)
+        return key if op == "create" and key else None
+
+    def record_response(self, url, resp):
+        """创建成功时记一条 alias 行，回放时把读这个 alias 的请求映射到回放时新建的 alias"""
+        if resp.status != 200:
+            return
+        try:
+            alias = resp.json().get("alias")
+        except (ValueError, AttributeError):
+            return
+        if alias:
+            self.record("alias", f"{alias} {url}", 0)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_header(path):
+    with open_trace(path) as f:
+        line = f.readline()
+    if not line.startswith(HEADER_PREFIX):
+        raise ValueError(f"{path} 不是流量轨迹文件")
+    return json.loads(line[len(HEADER_PREFIX):] or "{}")
+
+
+def is_trace_file(path):
+    try:
+        read_header(path)
+        return True
+    except (ValueError, OSError, UnicodeDecodeError, EOFError):
+        return False
+
+
+def iter_records(path):
+    """逐行读取，产出 (偏移微秒, 操作, key, 请求体字节数)"""
+    with open_trace(path) as f:
+        if not f.readline().startswith(HEADER_PREFIX):
+            raise ValueError(f"{path} 不是流量轨迹文件")
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 4:
+                yield int(parts[0]), parts[1], parts[2], int(parts[3])
+
+
+def select_ops(records, ops):
+    for record in records:
+        if record[1] in ops or record[1] == "alias":
+            yield record
+
+
+def take_until(records, limit=0, max_offset_us=0):
+    count = 0
+    for record in records:
+        if (limit and count >= limit) or (max_offset_us and record[0] > max_offset_us):
+            return
+        if record[1] != "alias":
+            count += 1
+        yield record
+
+
+def order_key(record):
+    """需要保持顺序的 key；生成长链接的创建请求之间没有顺序要求，返回 None"""
+    op, key = record[1], record[2]
+    if op == "read" or (op == "create" and key):
+        return key
+    return None
+
+
+class RecentMap:
+    """按轨迹偏移淘汰的映射：只保留最近 horizon_us 内写入的条目，大小与轨迹长度无关"""
+
+    def __init__(self, horizon_us):
+        self.horizon_us = horizon_us
+        self.items = OrderedDict()  # key -> (写入时的偏移, 值)，写入顺序即偏移顺序
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def put(self, key, value, offset):
+        self.items.pop(key, None)
+        self.items[key] = (offset, value)
+
+    def get(self, key):
+        item = self.items.get(key)
+        return item[1] if item else None
+
+    def pop(self, key):
+        item = self.items.pop(key, None)
+        return item[1] if item else None
+
+    def expire(self, offset):
+        cutoff = offset - self.horizon_us
+        while self.items and next(iter(self.items.values()))[0] < cutoff:
+            self.items.popitem(last=False)
+
+
+def partition(records, worker, workers, horizon_us=ALIAS_HORIZON * 1_000_000):
+    """同一个 key 总分到同一个 worker；没有 key 的按序号轮流分配。
+    alias 行和读录制期间新建的 alias 的请求按创建请求的长链接分区，与创建请求同一个 worker、排在它之后"""
+    created = RecentMap(horizon_us)  # 录制时的 alias -> 对应创建请求的分区号
+    for seq, record in enumerate(records):
+        created.expire(record[0])
+        key = order_key(record)
+        if record[1] == "alias":
+            key, _, url = record[2].partition(" ")
+            bucket = zlib.crc32(url.encode())
+            created.put(key, bucket, record[0])
+        elif record[1] == "read" and key in created:
+            bucket = created.get(key)
+        else:
+            bucket = zlib.crc32(key.encode()) if key is not None else seq
+        if bucket % workers == worker:
+            yield seq, key, record
+
+
+def schedule(items, start, speed):
+    """换算成计划发出的单调时间，speed 为 0 时不限速（计划时间为 None）"""
+    for seq, key, record in items:
+        yield (start + record[0] / 1e6 / speed if speed > 0 else None), seq, key, record
+
+
+def replay_url(seq, length=0):
+    """回放时生成的长链接，只由序号决定；length 为录制时的长度，补齐到相同长度"""
+    url = f"https://www.example.com/replay/{seq}"
+    if length > len(url) + 1:
+        url += "/" + "x" * (length - len(url) - 1)
+    return url
+
+
+def build_request(seq, record, alias=None):
+    """(方法, 路径, JSON 请求体或 None, 统计名)；alias 为映射后的读请求 alias"""
+    _, op, key, size = record
+    if op == "read":
+        return "GET", READ_PREFIX + (alias or key), None, "read"
+    if op == "create":
+        # {"url":"..."} 比长链接本身多 10 个字节
+        return "POST", "/create", {"url": key or replay_url(seq, size - 10)}, "create"
+    if op == "batch":
+        count = max(1, int(key or 1))
+        per_item = (size - 12) // count - 10 if size else 0
+        items = [{"url": replay_url(seq * 1000 + i, per_item)} for i in range(count)]
+        return "POST", "/create/batch", {"items": items}, f"batch[{count}]"
+    method, _, path = key.partition(" ")
+    return method, path or "/", None, "other"
+
+
+class Replayer:
+    """单个进程内的回放：按计划时间发出，未完成请求到上限时暂停读取"""
+
+    def __init__(self, client, max_outstanding=1000, ok_status=(200, 302), horizon_us=ALIAS_HORIZON * 1_000_000):
+        self.client = client
+        self.max_outstanding = max_outstanding
+        self.ok_status = ok_status
+        self.outstanding = set()
+        self.key_tails = {}  # key -> 该 key 最后一个未完成的请求，只保留在途的，大小不超过 max_outstanding
+        self.latency = HistogramSet()
+        self.lag = LatencyHistogram()
+        self.status = {}
+        self.errors = 0
+        self.sent = 0
+        self.read_missing = 0
+        # 长链接 -> 回放时创建得到的 alias，只在创建完成到对应 alias 行处理之间存在
+        self.created = RecentMap(horizon_us)
+        self.remap = RecentMap(horizon_us)  # 录制时的 alias -> 回放时的 alias
+
+    async def link_alias(self, record, previous):
+        """alias 行：等对应的创建请求完成后，记下录制 alias 到回放 alias 的映射"""
+        if previous is not None:
+            await asyncio.wait([previous])
+        recorded, _, url = record[2].partition(" ")
+        alias = self.created.pop(url)
+        if alias:
+            self.remap.put(recorded, alias, record[0])
+
+    async def send(self, seq, record, key, deadline, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        loop = asyncio.get_running_loop()
+        sent = loop.time()
+        if deadline is not None:
+            self.lag.record(int(max(0.0, sent - deadline) * 1_000_000))
+        op = record[1]
+        alias = self.remap.get(key) if op == "read" else None
+        method, path, payload, name = build_request(seq, record, alias)
+        try:
+            if payload is None:
+                resp = await self.client.request(method, path, name=name)
+            else:
+                resp = await self.client.post_json(path, payload, name=name)
+            status = resp.status
+            if op == "create" and status == 200 and key is not None:
+                created = resp.json().get("alias")
+                if created:
+                    self.created.put(key, created, record[0])
+        except Exception:
+            status = 0
+        self.latency.get(name).record(int((loop.time() - sent) * 1_000_000))
+        self.status[status] = self.status.get(status, 0) + 1
+        if op == "read" and status == 404:
+            self.read_missing += 1
+        if status not in self.ok_status:
+            self.errors += 1
+
+    def _forget(self, key, task):
+        if self.key_tails.get(key) is task:
+            del self.key_tails[key]
+
+    async def run(self, scheduled):
+        loop = asyncio.get_running_loop()
+        for deadline, seq, key, record in scheduled:
+            if deadline is not None:
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            while len(self.outstanding) >= self.max_outstanding:
+                await asyncio.wait(self.outstanding, return_when=asyncio.FIRST_COMPLETED)
+            self.created.expire(record[0])
+            self.remap.expire(record[0])
+            if record[1] == "alias":
+                # 排在创建请求（key 为长链接）之后，读这个 alias 的请求（key 为录制 alias）再排在它之后
+                previous = self.key_tails.get(record[2].partition(" ")[2])
+                task = loop.create_task(self.link_alias(record, previous))
+            else:
+                previous = self.key_tails.get(key) if key is not None else None
+                task = loop.create_task(self.send(seq, record, key, deadline, previous))
+                self.sent += 1
+            self.outstanding.add(task)
+            task.add_done_callback(self.outstanding.discard)
+            if key is not None:
+                self.key_tails[key] = task
+                task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        if self.outstanding:
+            await asyncio.wait(self.outstanding)
+
+    def result(self):
+        return {"sent": self.sent, "errors": self.errors, "read_missing": self.read_missing, "status": self.status,
+                "latency": self.latency.to_dict(), "lag": self.lag.encode()}
+
+
+def replay_pipeline(args, worker, start):
+    records = iter_records(args.trace)
+    if args.ops:
+        records = select_ops(records, set(args.ops.split(",")))
+    records = take_until(records, args.limit, int(args.max_offset * 1_000_000))
+    return schedule(partition(records, worker, args.workers, int(args.alias_horizon * 1_000_000)), start, args.speed)
+
+
+async def replay_worker_async(args, worker, barrier=None):
+    client = HttpClient(args.base_url, max_connections=args.connections, timeout=args.timeout)
+    replayer = Replayer(client, args.max_outstanding, tuple(int(s) for s in args.ok_status.split(",")),
+                        int(args.alias_horizon * 1_000_000))
+    loop = asyncio.get_running_loop()
+    if barrier is not None:
+        # 所有进程都启动完成后同时开始，进程启动耗时不计入调度滞后
+        await loop.run_in_executor(None, barrier.wait)
+    start = loop.time()
+    try:
+        await replayer.run(replay_pipeline(args, worker, start))
+    finally:
+        await client.close()
+    return replayer.result()
+
+
+def replay_worker(args, worker, barrier=None, results=None):
+    result = asyncio.run(replay_worker_async(args, worker, barrier))
+    if results is None:
+        return result
+    results.put(result)
+
+
+def merge_results(results):
+    latency, lag = HistogramSet(), LatencyHistogram()
+    status, sent, errors, read_missing = {}, 0, 0, 0
+    for r in results:
+        latency.merge(HistogramSet.from_dict(r["latency"]))
+        lag.merge(LatencyHistogram.decode(r["lag"]))
+        for code, count in r["status"].items():
+            status[code] = status.get(code, 0) + count
+        sent += r["sent"]
+        errors += r["errors"]
+        read_missing += r["read_missing"]
+    return {"sent": sent, "errors": errors, "read_missing": read_missing, "status": status, "latency": latency,
+            "lag": lag}
+
+
+def replay(args):
+    header = read_header(args.trace)
+    speed = "不限速" if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"▶️  回放 {args.trace}（来源 {header.get('source', '?')}）-> {args.base_url}，{speed}，"
+          f"{args.workers} 个 worker，每个 worker 在途上限 {args.max_outstanding}")
+    if args.workers == 1:
+        began = time.monotonic()
+        results = [replay_worker(args, 0)]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        barrier, queue = ctx.Barrier(args.workers + 1), ctx.Queue()
+        processes = [ctx.Process(target=replay_worker, args=(args, i, barrier, queue)) for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        began = time.monotonic()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    elapsed = time.monotonic() - began
+    merged = merge_results(results)
+    print(f"\n🎉 发出 {merged['sent']} 个请求，用时 {elapsed:.1f}s（{merged['sent'] / max(elapsed, 1e-9):.0f} RPS），"
+          f"错误 {merged['errors']}，状态码 {dict(sorted(merged['status'].items()))}")
+    if merged["read_missing"]:
+        print(f"⚠️  {merged['read_missing']} 个读请求返回 404：录制期间新建的 alias 没能映射（轨迹里没有 alias 行，"
+              f"--ops 不含 create，或创建早于 --alias-horizon），回放需要与录制开始时相同的数据集（见文件开头说明）")
+    if args.speed > 0:
+        lag = merged["lag"].summary()
+        print(f"⏱️  调度滞后 p50 {lag['p50_ms']:.2f}ms p99 {lag['p99_ms']:.2f}ms max {lag['max_ms']:.2f}ms"
+              + ("（回放跟不上计划速率，可增加 --workers / --max-outstanding）" if lag["p99_ms"] > 100 else ""))
+    merged["latency"].print_table()
+    if args.hist_file:
+        merged["latency"].save(args.hist_file, trace=args.trace, speed=args.speed, workers=args.workers)
+        print(f"📄 延迟直方图已写入 {args.hist_file}")
+    return merged
+
+
+def parse_nginx_line(line):
+    """返回 (unix 秒或 None, 秒内是否有精确时间, 方法, uri, 请求体字节数) 或 None"""
+    m = NGINX_REPLAY.match(line)
+    if m:
+        length = m["length"]
+        return float(m["msec"]), True, m["method"], m["uri"], int(length) if length != "-" else 0
+    m = NGINX_MAIN.search(line)
+    if m:
+        return datetime.fromisoformat(m["time"]).timestamp(), False, m["method"], m["uri"], 0
+    return None
+
+
+def nginx_requests(paths):
+    """逐行解析 nginx 日志，main 格式同一秒内的请求按出现顺序在这一秒内均匀摊开"""
+    pending, pending_second = [], None
+
+    def spread():
+        step = 1.0 / len(pending)
+        for i, (method, uri, size) in enumerate(pending):
+            yield pending_second + i * step, method, uri, size
+
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parsed = parse_nginx_line(line)
+                if parsed is None:
+                    continue
+                at, precise, method, uri, size = parsed
+                if precise:
+                    yield at, method, uri, size
+                    continue
+                if at != pending_second and pending:
+                    yield from spread()
+                    pending = []
+                pending_second = at
+                pending.append((method, uri, size))
+    if pending:
+        yield from spread()
+
+
+def import_nginx(paths, output, include_other=False):
+    writer = None
+    skipped = 0
+    for at, method, uri, size in nginx_requests(paths):
+        op, key, _ = classify(method, uri)
+        if op == "other" and not include_other:
+            skipped += 1
+            continue
+        if op == "create":
+            key = ""  # 日志里没有请求体，回放时生成同样长度的长链接
+        if writer is None:
+            writer = TraceWriter(output, source="nginx:" + ",".join(os.path.basename(p) for p in paths),
+                                 start_unix=at)
+        writer.record(op, key, size, at_unix=at)
+    if writer is None:
+        print("⚠️  没有解析到任何请求，检查日志格式（见 docker-distributed/nginx/nginx.conf）")
+        return 0
+    writer.close()
+    print(f"📼 导入 {writer.count} 条请求到 {output}（跳过其他接口 {skipped} 条）")
+    return writer.count
+
+
+def merge_traces(output, paths):
+    """按 start_unix 对齐后多路归并，每个输入文件只保持一行在内存里"""
+    headers = [read_header(p) for p in paths]
+    base = min(h.get("start_unix", 0) for h in headers)
+
+    def shifted(path, header):
+        shift = int((header.get("start_unix", base) - base) * 1_000_000)
+        for offset, op, key, size in iter_records(path):
+            yield offset + shift, op, key, size
+
+    writer = TraceWriter(output, source="merge:" + ",".join(os.path.basename(p) for p in paths), start_unix=base)
+    for record in heapq.merge(*(shifted(p, h) for p, h in zip(paths, headers)), key=lambda r: r[0]):
+        writer.write(*record)
+    writer.close()
+    print(f"📼 合并 {len(paths)} 个文件共 {writer.count} 条到 {output}")
+
+
+def show(path):
+    header = read_header(path)
+    counts, sizes = {}, {}
+    first = last = None
+    for offset, op, key, size in iter_records(path):
+        counts[op] = counts.get(op, 0) + 1
+        sizes[op] = sizes.get(op, 0) + size
+        first = offset if first is None else first
+        last = offset
+    total = sum(n for op, n in counts.items() if op != "alias")
+    duration = (last - first) / 1e6 if total > 1 else 0.0
+    started = datetime.fromtimestamp(header.get("start_unix", 0)).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"轨迹 {path}: 来源 {header.get('source')}，开始于 {started}，{total} 条，时长 {duration:.1f}s，"
+          f"平均 {total / duration if duration else 0:.0f} RPS")
+    for op in sorted(counts, key=OPS.index):
+        print(f"  {op:<8}{counts[op]:>12}  平均请求体 {sizes[op] / counts[op]:.0f}B")
+
+
+class LocustRecorder:
+    """locust 的 request 事件拿不到请求体：创建请求只记录操作，回放时按序号生成长链接"""
+
+    def __init__(self, path):
+        self.writer = TraceWriter(path, source="locust")
+
+    def on_request(self, request_type, url=None, name=None, start_time=None, **kwargs):
+        path = urlsplit(url).path if url else (name or "")
+        op, key, size = classify(request_type, path)
+        # start_time 是发出请求时的 unix 时间；完成顺序与发出顺序不同，回放时稍早的计划时间会立即发出
+        self.writer.record(op, key, size, at_unix=start_time)
+
+
+def install_locust_hooks(events):
+    """在 locustfile 中注册 --record-file：把本进程发出的请求录成轨迹"""
+    state = {}
+
+    @events.init_command_line_parser.add_listener
+    def on_init_parser(parser):
+        parser.add_argument("--record-file", type=str, env_var="LOCUST_RECORD_FILE", default="",
+                            help="把发出的请求录制为流量轨迹文件（见 traffic_trace.py），worker 写 <文件名>.<pid>")
+
+    @events.test_start.add_listener
+    def on_test_start(environment, **kwargs):
+        from locust.runners import MasterRunner, WorkerRunner
+        options = environment.parsed_options
+        path = getattr(options, "record_file", "") if options else ""
+        if not path or isinstance(environment.runner, MasterRunner) or "recorder" in state:
+            return
+        if isinstance(environment.runner, WorkerRunner):
+            path = f"{path}.{os.getpid()}"
+        state["recorder"] = recorder = LocustRecorder(path)
+        events.request.add_listener(recorder.on_request)
+        print(f"📼 流量录制到 {path}")
+
+    @events.quitting.add_listener
+    def on_quitting(environment, **kwargs):
+        recorder = state.get("recorder")
+        if recorder is not None:
+            recorder.writer.close()
+            print(f"📼 已录制 {recorder.writer.count} 条请求到 {recorder.writer.path}")
+
+
+def add_arguments(parser):
+    parser.add_argument("--record-file", default="", help="把发出的请求录制为流量轨迹文件（见 traffic_trace.py）")
+
+
+def recorder_from_args(args, source):
+    return TraceWriter(args.record_file, source=source) if args.record_file else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="流量轨迹录制 / 导入 / 回放工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_replay = sub.add_parser("replay", help="回放轨迹")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--base-url", default="http://localhost:10086", help="服务基础URL")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="回放倍速，0 表示不限速")
+    p_replay.add_argument("--workers", type=int, default=1, help="回放进程数，按 key 分区")
+    p_replay.add_argument("--max-outstanding", type=int, default=1000, help="每个进程的未完成请求上限")
+    p_replay.add_argument("--connections", type=int, default=500, help="每个进程的连接池上限")
+    p_replay.add_argument("--timeout", type=float, default=10, help="单请求超时（秒）")
+    p_replay.add_argument("--ops", default="", help="只回放这些操作，逗号分隔，如 read,create")
+    p_replay.add_argument("--limit", type=int, default=0, help="最多回放多少条（分区前计数），0 表示全部")
+    p_replay.add_argument("--max-offset", type=float, default=0, help="只回放轨迹前多少秒，0 表示全部")
+    p_replay.add_argument("--ok-status", default="200,302", help="视为成功的状态码")
+    p_replay.add_argument("--alias-horizon", type=float, default=ALIAS_HORIZON,
+                          help="录制期间新建的 alias 映射保留多少秒轨迹时间，更早创建的 alias 按录制值读取")
+    p_replay.add_argument("--hist-file", default="", help="延迟直方图输出文件（latency_hist.py 格式）")
+    p_import = sub.add_parser("import-nginx", help="从 nginx 访问日志导入")
+    p_import.add_argument("logs", nargs="+")
+    p_import.add_argument("-o", "--output", required=True)
+    p_import.add_argument("--include-other", action="store_true", help="同时导入 /u/ 与 /create 以外的请求")
+    p_merge = sub.add_parser("merge", help="按时间合并多个轨迹（如分布式 locust 的各 worker 录制）")
+    p_merge.add_argument("output")
+    p_merge.add_argument("inputs", nargs="+")
+    p_show = sub.add_parser("show", help="统计轨迹")
+    p_show.add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        replay(args)
+    elif args.command == "import-nginx":
+        import_nginx(args.logs, args.output, args.include_other)
+    elif args.command == "merge":
+        merge_traces(args.output, args.inputs)
+    else:
+        show(args.trace)
@@ -1,8 +1,13 @@
-from locust import HttpUser, task, between, FastHttpUser
-import random
-import string
+from locust import HttpUser, task, between, FastHttpUser, events
 from collections import deque
 import threading
+import consistency
+import key_dist
+import harness_profiler
+import latency_hist
+import metrics_exporter
+import payload_pool
+import traffic_trace
 
 # locust -f v1_test.py --host=http://localhost:10086
 # locust -f v1_test.py --host=http://192.168.1.3:10086 -u 100 -r 100 --headless --csv=report --run-time 1m
@@ -12,10 +17,26 @@ import threading
 # locust -f v1_test.py --master --headless --run-time 5m -u 1000 -r 500 --host=http://192.168.1.3:10086
 # 工作节点 (Worker): 负责执行任务，只需要知道主节点的地址
 # locust -f v1_test.py --worker --master-host=192.168.1.3
+# 热点分布（见 key_dist.py）：--key-dist zipf:1.1
 
 CREATE_WEIGHT = 1
 READ_WEIGHT = 100
 
+
+@events.init_command_line_parser.add_listener
+def on_init_parser(parser):
+    key_dist.add_arguments(parser)
+
+
+# 每个接口的微秒级延迟直方图，分布式运行时由 master 合并，结束时写到 --csv 目录下
+latency_hist.install_locust_hooks(events)
+traffic_trace.install_locust_hooks(events)
+metrics_exporter.install_locust_hooks(events)
+harness_profiler.install_locust_hooks(events)
+payload_pool.install_locust_hooks(events)
+consistency.install_locust_hooks(events)
+
+
 class ShortUrlUser(FastHttpUser):
     wait_time = between(0, 0)
 
@@ -23,6 +44,8 @@ class ShortUrlUser(FastHttpUser):
         super().__init__(*args, **kwargs)
         self.created_aliases = []
         self.aliases_lock = threading.Lock()
+        self.key_selector = key_dist.selector_from_environment(self.environment)
+        self.payloads = payload_pool.pool_from_environment(self.environment)
 
     def on_start(self):
         # 每个用户预先创建10个短链
@@ -31,20 +54,16 @@ class ShortUrlUser(FastHttpUser):
 
     @task(CREATE_WEIGHT)
     def create_short_url(self):
-        url = "https://www.example.com" + ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        data = {"url": url}
-        
-        # expire = random.choice([None, 60, 3600, 86400])
-        # if expire:
-        #     data["expire"] = expire
-            
-        resp = self.client.post("/create", json=data)
+        # 预生成的请求体（见 payload_pool.py），不在每个请求里拼随机字符串和序列化
+        url, body = self.payloads.take()
+        resp = self.client.post("/create", data=body, headers=payload_pool.JSON_HEADERS)
         if resp.status_code == 200:
             try:
                 alias = resp.json().get("alias")
                 if alias:
                     with self.aliases_lock:
                         self.created_aliases.append(alias)
+                    consistency.on_create(alias, url)
 
                         
             except Exception:
@@ -52,19 +71,18 @@ class ShortUrlUser(FastHttpUser):
 
     @task(READ_WEIGHT)
     def visit_short_url(self):
+        # 只在选 alias 时持锁，HTTP 请求期间不占锁
         with self.aliases_lock:
-            alias = random.choice(self.created_aliases)
-            resp = self.client.get(f"/u/{alias}", allow_redirects=False, name="/u/[alias]")
+            if not self.created_aliases:
+                return
+            alias = self.key_selector.pick(self.created_aliases)
+        with self.client.get(f"/u/{alias}", allow_redirects=False, name="/u/[alias]",
+                             catch_response=True) as resp:
             # 302为成功，404为失败
             if resp.status_code == 302:
-                pass  # 成功
+                resp.success()
             elif resp.status_code == 404:
-                self.environment.events.request_failure.fire(
-                    request_type="GET",
-                    name="/u/[alias]",
-                    response_time=resp.elapsed.total_seconds() * 1000,
-                    response=resp,
-                    exception=Exception(f"404 Not Found for alias: {alias}")
-                )
+                resp.failure(f"404 Not Found for alias: {alias}")
             else:
-                print(f"Unexpected status code: {resp.status_code} for alias: {alias}")
\ No newline at end of file
+                metrics_exporter.count_event("unexpected_status", "/u/[alias]", resp.status_code)
+        consistency.on_redirect(alias, resp.status_code, resp.headers.get("Location"))
@@ -1,9 +1,16 @@
-from locust import HttpUser, task, between, FastHttpUser
-import random
-import string
-from collections import deque
+from locust import task, between, FastHttpUser, events
 import threading
-import os
+import time
+import consistency
+import key_dist
+import harness_profiler
+import latency_hist
+import metrics_exporter
+import payload_pool
+import traffic_trace
+from alias_store import get_shared_store, get_shared_writer, flush_shared_writers
+from request_mix import CREATE_WEIGHT, READ_WEIGHT_BY_FILE, READ_WEIGHT
+from shortcode import MonotonicityChecker, PredictedAliasPool, discover_nodes, parse_nodes, parse_time
 
 # locust -f v1_test.py --host=http://localhost:10086
 # locust -f v1_test.py --host=http://192.168.1.3:10086 -u 100 -r 100 --headless --csv=report --run-time 1m
@@ -14,16 +21,64 @@ import os
 # locust -f v2_test.py --master --host=http://192.168.1.3:10086 --master-bind-host=0.0.0.0
 # 工作节点 (Worker): 负责执行任务，只需要知道主节点的地址
 # locust -f v1_test.py --worker --master-host=192.168.1.3
+# 热点分布（见 key_dist.py）：--key-dist zipf:1.1
+# 录制发出的流量，之后用 traffic_trace.py replay 确定性回放：--record-file run.trace.gz
 
-CREATE_WEIGHT = 1
-READ_WEIGHT_BY_FILE = 10
-READ_WEIGHT = 189
-
-ALIAS_FILE = "created_aliases.txt"
-ALIAS_FILE_LOCK = threading.Lock()
+# alias 使用定长二进制文件保存（见 alias_store.py），旧的 created_aliases.txt 可用
+# python alias_store.py import created_aliases.txt 转换
+# 针对已预灌数据的库，也可以不分发 alias 文件，直接按 Snowflake 规则推算时间窗口内的 alias（见 shortcode.py）：
+# locust -f v2_test.py --host=http://192.168.1.3:10086 --predict-start 2025-01-01T00:00:00 --predict-end 2025-01-01T01:00:00 --predict-max-sequence 3
 
 # 测试用例说明
 # 创建一个短链，可能对应从数据库中读取10个短链的操作，这个可能命中数据库，也可能命中redis缓存
+# 请求比例定义在 request_mix.py，开环压测 open_loop.py 使用同一比例
+
+
+@events.init_command_line_parser.add_listener
+def on_init_parser(parser):
+    key_dist.add_arguments(parser)
+    parser.add_argument("--predict-start", type=str, default="", help="推算 alias 的时间窗口起点（unix 秒/毫秒 或 ISO，UTC）")
+    parser.add_argument("--predict-end", type=str, default="", help="推算 alias 的时间窗口终点")
+    parser.add_argument("--predict-nodes", type=str, default="", help="datacenterId:workerId 列表，留空则通过 /snowflake/config 发现")
+    parser.add_argument("--predict-max-sequence", type=int, default=0, help="每个节点每毫秒推算的最大序列号")
+
+
+_predicted_pool = None
+# 检查每个 Snowflake 节点返回的 id 是否单调递增
+id_checker = MonotonicityChecker()
+
+
+def get_predicted_pool(environment):
+    """指定了 --predict-start/--predict-end 时，用推算的 alias 代替 alias 文件（每个进程只构建一次）"""
+    global _predicted_pool
+    options = environment.parsed_options
+    if options is None or not options.predict_start or not options.predict_end:
+        return None
+    if _predicted_pool is None:
+        nodes = parse_nodes(options.predict_nodes) if options.predict_nodes else discover_nodes(environment.host)
+        _predicted_pool = PredictedAliasPool(parse_time(options.predict_start), parse_time(options.predict_end),
+                                             nodes, options.predict_max_sequence)
+    return _predicted_pool
+
+
+# 每个接口的微秒级延迟直方图，分布式运行时由 master 合并，结束时写到 --csv 目录下
+latency_hist.install_locust_hooks(events)
+traffic_trace.install_locust_hooks(events)
+metrics_exporter.install_locust_hooks(events)
+harness_profiler.install_locust_hooks(events)
+payload_pool.install_locust_hooks(events)
+consistency.install_locust_hooks(events)
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    # 测试结束时把缓冲中的 alias 写入文件
+    flush_shared_writers()
+    if id_checker.checked:
+        print(f"Snowflake 单调性检查: {id_checker.checked} 个 id, 节点 {id_checker.nodes}, "
+              f"违规 {len(id_checker.violations)}")
+        for node, previous, current in id_checker.violations[:10]:
+            print(f"  节点 {node}: {current} <= {previous}")
 
 
 class ShortUrlUser(FastHttpUser):
@@ -33,7 +88,9 @@ class ShortUrlUser(FastHttpUser):
         super().__init__(*args, **kwargs)
         self.created_aliases = []
         self.aliases_lock = threading.Lock()
-        self.file_aliases = []
+        self.file_aliases = None
+        self.key_selector = key_dist.selector_from_environment(self.environment)
+        self.payloads = payload_pool.pool_from_environment(self.environment)
 
     def on_start(self):
         # 每个用户预先创建10个短链
@@ -41,31 +98,30 @@ class ShortUrlUser(FastHttpUser):
         self.create_short_url()
 
     def load_aliases_from_file(self):
-        """读取 alias 文件，写入 file_aliases 列表"""
-        if os.path.exists(ALIAS_FILE):
-            with ALIAS_FILE_LOCK:
-                with open(ALIAS_FILE, "r", encoding="utf-8") as f:
-                    self.file_aliases = [line.strip() for line in f if line.strip()]
-                    if len(self.file_aliases) > 0:
-                        self.created_aliases.append(self.file_aliases[0])
+        """使用进程内共享的 mmap alias 存储（或推算的 alias 空间），不再为每个用户拷贝一份列表"""
+        self.file_aliases = get_predicted_pool(self.environment) or get_shared_store()
+        if len(self.file_aliases) > 0:
+            self.created_aliases.append(self.file_aliases[0])
 
     def save_alias_to_file(self, alias):
-        """将 alias 写入文件，带锁防止并发冲突"""
-        with ALIAS_FILE_LOCK:
-            with open(ALIAS_FILE, "a", encoding="utf-8") as f:
-                f.write(alias + "\n")
+        """将 alias 追加到进程内缓冲，攒满一批后整块写入文件，无需加锁"""
+        get_shared_writer().append(alias)
 
     @task(CREATE_WEIGHT)
     def create_short_url(self):
-        url = "https://www.example.com" + ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-        data = {"url": url}
-        resp = self.client.post("/create", json=data)
+        url, body = self.payloads.take()
+        sent_at = time.perf_counter()
+        resp = self.client.post("/create", data=body, headers=payload_pool.JSON_HEADERS)
         if resp.status_code == 200:
             try:
-                alias = resp.json().get("alias")
+                result = resp.json()
+                alias = result.get("alias")
+                if result.get("id"):
+                    id_checker.observe(result["id"], sent_at, time.perf_counter())
                 if alias:
                     with self.aliases_lock:
                         self.created_aliases.append(alias)
+                    consistency.on_create(alias, url)
                     self.save_alias_to_file(alias)
             except Exception:
                 pass
@@ -75,25 +131,29 @@ class ShortUrlUser(FastHttpUser):
         with self.aliases_lock:
             if not self.created_aliases:
                 return
-            alias = random.choice(self.created_aliases)
+            alias = self.key_selector.pick(self.created_aliases)
         resp = self.client.get(f"/u/{alias}", allow_redirects=False, name="/u/[alias]")
         if resp.status_code == 302:
             pass  # 成功
         elif resp.status_code == 404:
             pass  # 失败
         else:
-            print(f"Unexpected status code: {resp.status_code} for alias: {alias}")
+            metrics_exporter.count_event("unexpected_status", "/u/[alias]", resp.status_code)
+        consistency.on_redirect(alias, resp.status_code, resp.headers.get("Location"))
 
     @task(READ_WEIGHT_BY_FILE)
     def visit_short_url_from_file(self):
         """从文件读取的 alias 列表中访问短链"""
+        refresh = getattr(self.file_aliases, "maybe_refresh", None)
+        if refresh:
+            refresh()  # 推算的 alias 空间不需要刷新
         if not self.file_aliases:
             return
-        alias = random.choice(self.file_aliases)
+        alias = self.key_selector.pick(self.file_aliases)
         resp = self.client.get(f"/u/{alias}", allow_redirects=False, name="/u/[alias]_file")
         if resp.status_code == 302:
             pass
         elif resp.status_code == 404:
             pass
         else:
-            print(f"Unexpected status code: {resp.status_code} for alias: {alias}")
\ No newline at end of file
+            metrics_exporter.count_event("unexpected_status", "/u/[alias]_file", resp.status_code)
\ No newline at end of file
@@ -11,6 +11,7 @@ namespace v2
         private readonly CacheService? _cacheService;
         private readonly MonitoringService _monitoringService;
         private static readonly ShortUrlStats stats = new(() => 0);
+        private const int MaxBatchSize = 1000;
 
         public ShortUrlController(DbRepository dbRepository, MonitoringService monitoringService, CacheService? cacheService = null)
         {
@@ -78,6 +79,76 @@ namespace v2
             }
         }
 
+        // 批量创建短链接，走 DbRepository.CreateShortLinksBatchAsync
+        // cache=false 时不写入Redis，用于预灌大量数据而不把缓存填满
+        [HttpPost("/create/batch")]
+        public async Task<IActionResult> CreateBatch([FromBody] CreateBatchRequest req, [FromQuery] bool cache = true)
+        {
+            var sw = Stopwatch.StartNew();
+            try
+            {
+                if (req?.items == null || req.items.Count == 0)
+                {
+                    return BadRequest("items is required");
+                }
+                if (req.items.Count > MaxBatchSize)
+                {
+                    return BadRequest($"batch size must not exceed {MaxBatchSize}");
+                }
+                if (req.items.Any(x => x == null || string.IsNullOrWhiteSpace(x.url)))
+                {
+                    return BadRequest("url is required");
+                }
+
+                var requests = req.items.Select(x => (x.url, x.expire)).ToList();
+                var created = await _monitoringService.MeasureDatabaseOperation("create_shorturl_batch",
+                    async () => await _dbRepository.CreateShortLinksBatchAsync(requests));
+
+                if (_cacheService != null && cache)
+                {
+                    await _monitoringService.MeasureCacheOperation<bool>("set_shorturl_batch",
+                        async () => {
+                            for (int i = 0; i < created.Count; i++)
+                            {
+                                var item = req.items[i];
+                                var expireTime = item.expire.HasValue ? DateTime.UtcNow.AddSeconds(item.expire.Value).Ticks : 0;
+                                await _cacheService.SetShortLinkAsync(created[i].alias, created[i].id, item.url, expireTime);
+                            }
+                            return true;
+                        });
+                }
+
+                var elapsed = sw.Elapsed.TotalSeconds;
+                var items = new List<object>(created.Count);
+                for (int i = 0; i < created.Count; i++)
+                {
+                    stats.IncCreate();
+                    _monitoringService.RecordShortUrlCreated(elapsed);
+                    items.Add(new { alias = created[i].alias, url = req.items[i].url, id = created[i].id });
+                }
+
+                return Ok(new { count = items.Count, items });
+            }
+            catch (System.Text.Json.JsonException ex)
+            {
+                _monitoringService.RecordError("json_parse_error", "create_batch");
+                Console.WriteLine($"JSON parsing error in CreateBatch: {ex.Message}");
+                return BadRequest("Invalid JSON body");
+            }
+            catch (System.OperationCanceledException ex)
+            {
+                _monitoringService.RecordError("request_cancelled", "create_batch");
+                Console.WriteLine($"Request cancelled in CreateBatch: {ex.Message}");
+                return StatusCode(499, "Request cancelled"); // 499 Client Closed Request
+            }
+            catch (System.Exception ex)
+            {
+                _monitoringService.RecordError("unhandled_exception", "create_batch");
+                Console.WriteLine($"ERROR: Unhandled exception in CreateBatch: {ex.Message}");
+                return StatusCode(500, ex.Message);
+            }
+        }
+
         [HttpGet("/u/{alias}")]
         public async Task<IActionResult> RedirectToUrl(string alias)
         {
@@ -240,5 +311,10 @@ namespace v2
             public required string url { get; set; }
             public int? expire { get; set; }
         }
+
+        public class CreateBatchRequest
+        {
+            public List<CreateRequest> items { get; set; } = new();
+        }
     }
 }
\ No newline at end of file